@@ -0,0 +1,155 @@
+"""Exact, incrementally maintained statistics of a chunk collection."""
+
+import logging
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Tuple
+
+from .sqlite_helpers import connect, delete_in
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Each chunk row feeds one counter per kind. Triggers keep the counters and
+# the distinct-value totals in step with inserts and deletes, so reading the
+# statistics never has to look at individual chunks.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    chunk_type TEXT NOT NULL,
+    jar_file TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    class_name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+
+CREATE TABLE IF NOT EXISTS totals (
+    kind TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS chunks_insert AFTER INSERT ON chunks BEGIN
+    INSERT INTO counters VALUES ('chunk_type', NEW.chunk_type, 1)
+        ON CONFLICT (kind, key) DO UPDATE SET count = count + 1;
+    INSERT INTO counters VALUES ('jar_file', NEW.jar_file, 1)
+        ON CONFLICT (kind, key) DO UPDATE SET count = count + 1;
+    INSERT INTO counters VALUES ('source_file', NEW.jar_file || '!' || NEW.source_file, 1)
+        ON CONFLICT (kind, key) DO UPDATE SET count = count + 1;
+    INSERT INTO counters SELECT 'class_name', NEW.class_name, 1 WHERE NEW.class_name != ''
+        ON CONFLICT (kind, key) DO UPDATE SET count = count + 1;
+    INSERT INTO totals VALUES ('chunks', 1)
+        ON CONFLICT (kind) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS chunks_delete AFTER DELETE ON chunks BEGIN
+    UPDATE counters SET count = count - 1 WHERE kind = 'chunk_type' AND key = OLD.chunk_type;
+    UPDATE counters SET count = count - 1 WHERE kind = 'jar_file' AND key = OLD.jar_file;
+    UPDATE counters SET count = count - 1 WHERE kind = 'source_file' AND key = OLD.jar_file || '!' || OLD.source_file;
+    UPDATE counters SET count = count - 1 WHERE kind = 'class_name' AND key = OLD.class_name;
+    DELETE FROM counters WHERE kind = 'chunk_type' AND key = OLD.chunk_type AND count <= 0;
+    DELETE FROM counters WHERE kind = 'jar_file' AND key = OLD.jar_file AND count <= 0;
+    DELETE FROM counters WHERE kind = 'source_file' AND key = OLD.jar_file || '!' || OLD.source_file AND count <= 0;
+    DELETE FROM counters WHERE kind = 'class_name' AND key = OLD.class_name AND count <= 0;
+    UPDATE totals SET count = count - 1 WHERE kind = 'chunks';
+END;
+
+CREATE TRIGGER IF NOT EXISTS counters_insert AFTER INSERT ON counters BEGIN
+    INSERT INTO totals VALUES (NEW.kind, 1)
+        ON CONFLICT (kind) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS counters_delete AFTER DELETE ON counters BEGIN
+    UPDATE totals SET count = count - 1 WHERE kind = OLD.kind;
+END;
+"""
+
+class CollectionStatistics:
+    """SQLite-backed aggregate counters over the chunks in a collection.
+    
+    Counts are kept per chunk type and per JAR, together with the number of
+    distinct source files (qualified by JAR) and class names. They are
+    updated on every add and delete, so reading them costs the same no
+    matter how large the collection is.
+    """
+    
+    def __init__(self, db_path: Path):
+        """Open (or create) the statistics database."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.executescript(_SCHEMA)
+    
+    def add(self, chunks: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """Count ``(chunk_id, metadata)`` pairs, replacing chunks already counted."""
+        rows = {
+            chunk_id: (
+                chunk_id,
+                metadata.get("chunk_type") or "unknown",
+                metadata.get("jar_file") or "",
+                metadata.get("source_file") or "",
+                metadata.get("class_name") or ""
+            )
+            for chunk_id, metadata in chunks
+        }
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            # Delete first so the delete trigger uncounts replaced chunks
+            self._delete(conn, list(rows))
+            conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?)", rows.values())
+    
+    def remove(self, chunk_ids: List[str]) -> None:
+        """Stop counting the given chunks; unknown IDs are ignored."""
+        with closing(connect(self.db_path)) as conn, conn:
+            self._delete(conn, chunk_ids)
+    
+    def _delete(self, conn: sqlite3.Connection, chunk_ids: List[str]) -> None:
+        """Delete chunk rows in batches."""
+        delete_in(conn, "chunks", "chunk_id", chunk_ids)
+    
+    def clear(self) -> None:
+        """Reset every counter."""
+        # Dropping the tables avoids running the delete trigger once per chunk
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.executescript("""
+                DROP TABLE IF EXISTS chunks;
+                DROP TABLE IF EXISTS counters;
+                DROP TABLE IF EXISTS totals;
+            """ + _SCHEMA)
+    
+    def total_chunks(self) -> int:
+        """Return the number of chunks counted."""
+        with closing(connect(self.db_path)) as conn:
+            row = conn.execute("SELECT count FROM totals WHERE kind = 'chunks'").fetchone()
+        return row[0] if row else 0
+    
+    def summary(self) -> Dict[str, Any]:
+        """Return the exact statistics."""
+        with closing(connect(self.db_path)) as conn:
+            totals = dict(conn.execute("SELECT kind, count FROM totals"))
+            counters = conn.execute(
+                "SELECT kind, key, count FROM counters WHERE kind IN ('chunk_type', 'jar_file')"
+            ).fetchall()
+        
+        chunk_types = {}
+        jar_chunks = {}
+        for kind, key, count in counters:
+            if kind == "chunk_type":
+                chunk_types[key] = count
+            elif key:
+                jar_chunks[key] = count
+        
+        return {
+            "total_chunks": totals.get("chunks", 0),
+            "chunk_types": chunk_types,
+            "jar_chunks": jar_chunks,
+            "unique_source_files": totals.get("source_file", 0),
+            "unique_classes": totals.get("class_name", 0)
+        }
@@ -21,8 +21,37 @@ class Settings(BaseSettings):
     # ChromaDB Configuration
     chroma_persist_directory: str = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
     
+    # Vector Store Configuration
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "chroma")
+    ivf_min_vectors: int = int(os.getenv("IVF_MIN_VECTORS", "50000"))
+    ivf_nprobe: int = int(os.getenv("IVF_NPROBE", "8"))
+    vector_quantization: str = os.getenv("VECTOR_QUANTIZATION", "none")
+    quantization_rescore_factor: int = int(os.getenv("QUANTIZATION_RESCORE_FACTOR", "10"))
+    
     # Embedding Model Configuration
     embedding_model: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    embedding_model_dir: str = os.getenv("EMBEDDING_MODEL_DIR", "")
+    embed_batch_size: int = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+    write_batch_size: int = int(os.getenv("WRITE_BATCH_SIZE", "100"))
+    embed_token_budget: int = int(os.getenv("EMBED_TOKEN_BUDGET", "4096"))
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    embedding_cache_max_mb: int = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+    query_cache_size: int = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    
+    # Retrieval Configuration
+    search_mode: str = os.getenv("SEARCH_MODE", "vector")
+    symbol_routing: bool = os.getenv("SYMBOL_ROUTING", "true").lower() == "true"
+    hierarchy_top_files: int = int(os.getenv("HIERARCHY_TOP_FILES", "50"))
+    hierarchy_top_classes: int = int(os.getenv("HIERARCHY_TOP_CLASSES", "20"))
+    
+    # Ingestion Configuration
+    parse_workers: int = int(os.getenv("PARSE_WORKERS", "1"))
+    parse_timeout: float = float(os.getenv("PARSE_TIMEOUT", "60"))
+    ingest_workers: int = int(os.getenv("INGEST_WORKERS", "1"))
+    incremental_ingest: bool = os.getenv("INCREMENTAL_INGEST", "true").lower() == "true"
+    chunk_max_tokens: int = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+    chunk_min_tokens: int = int(os.getenv("CHUNK_MIN_TOKENS", "32"))
     
     # API Configuration
     api_host: str = os.getenv("API_HOST", "0.0.0.0")
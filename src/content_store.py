@@ -0,0 +1,66 @@
+"""Compressed on-disk store for raw code chunk content."""
+
+import logging
+import zlib
+from contextlib import closing
+from pathlib import Path
+from typing import List, Dict, Iterable, Tuple
+
+from .sqlite_helpers import connect, delete_in, select_in
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ContentStore:
+    """SQLite-backed blob store of zlib-compressed chunk content keyed by chunk ID.
+    
+    Keeping the source text here instead of in the vector database's metadata
+    keeps the index small and lets searches load content only for the hits
+    they actually return.
+    """
+    
+    def __init__(self, db_path: Path, compression_level: int = 6):
+        """Open (or create) the content store."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.compression_level = compression_level
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS contents (
+                    chunk_id TEXT PRIMARY KEY,
+                    data BLOB NOT NULL
+                )
+            """)
+    
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        """Store (chunk_id, content) pairs, replacing existing content."""
+        rows = [
+            (chunk_id, zlib.compress(content.encode('utf-8'), self.compression_level))
+            for chunk_id, content in items
+        ]
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO contents VALUES (?, ?)", rows)
+    
+    def get_many(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """Load content for the given chunk IDs; unknown IDs are left out."""
+        contents = {}
+        
+        with closing(connect(self.db_path)) as conn:
+            for chunk_id, data in select_in(
+                conn, "SELECT chunk_id, data FROM contents WHERE chunk_id IN ({placeholders})", chunk_ids
+            ):
+                contents[chunk_id] = zlib.decompress(data).decode('utf-8')
+        
+        return contents
+    
+    def delete_many(self, chunk_ids: List[str]) -> None:
+        """Delete content for the given chunk IDs."""
+        with closing(connect(self.db_path)) as conn, conn:
+            delete_in(conn, "contents", "chunk_id", chunk_ids)
+    
+    def clear(self) -> None:
+        """Delete all stored content."""
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM contents")
@@ -0,0 +1,348 @@
+"""Embedding model runtimes: eager PyTorch, dynamically quantized PyTorch and
+ONNX Runtime over an exported graph of the same SentenceTransformer model."""
+
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "quantized", "onnx", "onnx_int8")
+
+# Graph files written into the model directory by export_onnx_model
+_ONNX_FILES = {"onnx": "model.onnx", "onnx_int8": "model_qint8.onnx"}
+
+# Transformer inputs the exported graph accepts, in export order
+_ONNX_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+# Characters per token assumed when cutting text before tokenizing it; a
+# cut that turns out to hold too few tokens is widened and tried again
+_CHARS_PER_TOKEN = 6
+
+class _TokenEmbeddings(torch.nn.Module):
+    """Export wrapper calling a transformer with positional inputs."""
+    
+    def __init__(self, transformer: torch.nn.Module, input_names: List[str]):
+        super().__init__()
+        self.transformer = transformer
+        self.input_names = input_names
+    
+    def forward(self, *inputs: torch.Tensor) -> torch.Tensor:
+        return self.transformer(**dict(zip(self.input_names, inputs))).last_hidden_state
+
+def load_embedding_model(model_name: str, backend: str = "torch", model_dir: Optional[Path] = None):
+    """Load ``model_name`` on the given runtime.
+    
+    Every backend returns an object with a SentenceTransformer-style
+    ``encode(sentences, batch_size)`` returning a float32 array:
+    
+    - ``torch``: the model as is
+    - ``quantized``: the model with its linear layers dynamically quantized
+      to int8 by PyTorch on load
+    - ``onnx`` / ``onnx_int8``: the model's transformer exported to ONNX
+      (optionally with int8 weights) and run by ONNX Runtime
+    
+    ``model_dir`` is the local directory the ONNX backends load their graph,
+    tokenizer and pooling configuration from. A directory without the graph
+    is filled by exporting ``model_name`` once.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    
+    if backend == "quantized":
+        model = SentenceTransformer(model_name, device="cpu")
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    
+    model_dir = Path(model_dir) if model_dir else default_model_dir(model_name)
+    if not (model_dir / _ONNX_FILES[backend]).exists():
+        export_onnx_model(model_name, model_dir, quantize=backend == "onnx_int8")
+    return OnnxEmbeddingModel(model_dir, _ONNX_FILES[backend])
+
+def truncate_to_max_tokens(model, texts: List[str]) -> Tuple[List[str], List[int]]:
+    """Cut texts down to what the model will read, and count their tokens.
+    
+    Each text is cut at a whitespace boundary to a prefix long enough to
+    hold ``model.max_seq_length`` tokens, so the tail of a long text is
+    never tokenized. Tokenizers split words at whitespace, so the prefix
+    tokenizes to the same leading tokens as the whole text and the model
+    sees exactly what it would have after its own truncation. Returns the
+    texts and their token counts, capped at the sequence length.
+    """
+    tokenizer = model.tokenizer
+    max_tokens = model.max_seq_length - tokenizer.num_special_tokens_to_add()
+    
+    truncated = list(texts)
+    counts = [0] * len(texts)
+    pending = list(range(len(texts)))
+    max_chars = max_tokens * _CHARS_PER_TOKEN
+    
+    while pending:
+        prefixes = []
+        for i in pending:
+            text = texts[i]
+            if len(text) > max_chars:
+                cut = max(text.rfind(" ", 0, max_chars), text.rfind("\n", 0, max_chars))
+                text = text[:cut if cut > 0 else max_chars]
+            prefixes.append(text)
+        
+        token_ids = tokenizer(prefixes, add_special_tokens=False)["input_ids"]
+        retry = []
+        for i, prefix, ids in zip(pending, prefixes, token_ids):
+            if len(prefix) < len(texts[i]) and len(ids) < max_tokens:
+                retry.append(i)  # the cut was too short to fill the sequence
+            else:
+                truncated[i] = prefix
+                counts[i] = min(len(ids), max_tokens)
+        
+        pending = retry
+        max_chars *= 2
+    
+    return truncated, counts
+
+def encode_length_bucketed(model,
+                           texts: List[str],
+                           token_budget: int = 4096,
+                           max_batch_size: int = 256) -> np.ndarray:
+    """Embed texts in batches of similar token length.
+    
+    Texts are truncated with ``truncate_to_max_tokens`` and sorted by token
+    count. Each batch then takes as many texts as fit in ``token_budget``
+    padded tokens, so one-line fields go through in large batches and long
+    classes in small ones, instead of every batch being padded to its
+    longest member. Embeddings are returned in the order of ``texts``.
+    """
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    
+    truncated, counts = truncate_to_max_tokens(model, texts)
+    order = sorted(range(len(texts)), key=lambda i: counts[i], reverse=True)
+    
+    embeddings = [None] * len(texts)
+    start = 0
+    while start < len(order):
+        # The batch is padded to its first, longest member
+        batch_size = max(1, min(max_batch_size, token_budget // max(counts[order[start]], 1)))
+        batch = order[start:start + batch_size]
+        vectors = model.encode([truncated[i] for i in batch], batch_size=len(batch), show_progress_bar=False)
+        for i, vector in zip(batch, vectors):
+            embeddings[i] = vector
+        start += len(batch)
+    
+    return np.vstack(embeddings).astype(np.float32)
+
+def default_model_dir(model_name: str) -> Path:
+    """Return the directory exported ONNX models are kept in by default."""
+    return Path("./models") / Path(model_name).name
+
+def export_onnx_model(model_name: str, model_dir: Path, quantize: bool = False) -> Path:
+    """Export a SentenceTransformer model to ``model_dir`` for ONNX Runtime.
+    
+    The directory receives the model's tokenizer and module configuration
+    alongside ``model.onnx``, and ``model_qint8.onnx`` with dynamically
+    quantized weights if ``quantize`` is set.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    model_dir = Path(model_dir)
+    logger.info(f"Exporting embedding model {model_name} to ONNX in {model_dir}")
+    
+    model = SentenceTransformer(model_name, device="cpu")
+    model.save(str(model_dir))
+    
+    graph_path = model_dir / _ONNX_FILES["onnx"]
+    if not graph_path.exists():
+        sample = model.tokenizer(["public void run() {}", "class A"], padding=True, return_tensors="pt")
+        input_names = [name for name in _ONNX_INPUTS if name in sample]
+        
+        with torch.no_grad():
+            torch.onnx.export(
+                _TokenEmbeddings(model[0].auto_model, input_names).eval(),
+                tuple(sample[name] for name in input_names),
+                str(graph_path),
+                input_names=input_names,
+                output_names=["token_embeddings"],
+                dynamic_axes={
+                    name: {0: "batch", 1: "sequence"}
+                    for name in input_names + ["token_embeddings"]
+                },
+                opset_version=17,
+                dynamo=False
+            )
+    
+    if quantize:
+        quantize_dynamic(str(graph_path), str(model_dir / _ONNX_FILES["onnx_int8"]), weight_type=QuantType.QInt8)
+    
+    return model_dir
+
+class OnnxEmbeddingModel:
+    """SentenceTransformer-compatible encoder running an exported ONNX graph.
+    
+    Tokenization, pooling and normalization follow the configuration saved
+    with the model, so embeddings match the PyTorch model's up to numerical
+    error.
+    """
+    
+    def __init__(self, model_dir: Path, file_name: str = "model.onnx"):
+        """Load the graph and tokenizer from ``model_dir``."""
+        import onnxruntime
+        from transformers import AutoTokenizer
+        
+        self.model_dir = Path(model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            str(self.model_dir / file_name), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = [graph_input.name for graph_input in self.session.get_inputs()]
+        
+        bert_config = self._read_json("sentence_bert_config.json")
+        self.max_seq_length = bert_config.get("max_seq_length") or self.tokenizer.model_max_length
+        
+        self.pooling_mode = "mean"
+        self.normalize = False
+        for module in self._read_json("modules.json") or []:
+            if module["type"].endswith("Pooling"):
+                self.pooling_mode = self._pooling_mode(self._read_json(Path(module["path"]) / "config.json"))
+            elif module["type"].endswith("Normalize"):
+                self.normalize = True
+    
+    def _read_json(self, relative_path: Union[str, Path]) -> Any:
+        """Read a configuration file of the model, or {} if it is missing."""
+        path = self.model_dir / relative_path
+        return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    
+    @staticmethod
+    def _pooling_mode(config: Dict[str, Any]) -> str:
+        """Read the pooling mode from either Pooling configuration format."""
+        if "pooling_mode" in config:
+            return config["pooling_mode"]
+        for mode in ("cls_token", "max_tokens", "mean_tokens"):
+            if config.get(f"pooling_mode_{mode}"):
+                return mode.split("_")[0]
+        return "mean"
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Embed sentences in batches; a single string gives a single vector."""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        
+        # Batch sentences of similar length together to keep padding low,
+        # as SentenceTransformer.encode does
+        order = np.argsort([-len(sentence) for sentence in sentences], kind='stable')
+        ordered = [sentences[i] for i in order]
+        
+        embeddings = []
+        for start in range(0, len(ordered), batch_size):
+            encoded = self.tokenizer(
+                ordered[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            inputs = {name: encoded[name].astype(np.int64) for name in self._input_names}
+            token_embeddings = self.session.run(None, inputs)[0]
+            embeddings.append(self._pool(token_embeddings, encoded["attention_mask"]))
+        
+        result = np.empty((len(sentences), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        if embeddings:
+            result[order] = np.concatenate(embeddings)
+        if self.normalize:
+            result /= np.maximum(np.linalg.norm(result, axis=1, keepdims=True), 1e-12)
+        return result[0] if single else result
+    
+    def _pool(self, token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Reduce token embeddings to one vector per sentence."""
+        if self.pooling_mode == "cls":
+            return token_embeddings[:, 0]
+        
+        mask = attention_mask[:, :, np.newaxis].astype(np.float32)
+        if self.pooling_mode == "max":
+            return np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+        return (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        """Return the embedding width."""
+        return self.session.get_outputs()[0].shape[-1]
+
+def check_parity(reference, candidate, sentences: List[str], min_cosine: float = 0.99) -> Dict[str, Any]:
+    """Compare a backend's embeddings with a reference model's.
+    
+    Passes when every sentence's embeddings have a cosine similarity of at
+    least ``min_cosine``.
+    """
+    expected = np.asarray(reference.encode(sentences), dtype=np.float32)
+    actual = np.asarray(candidate.encode(sentences), dtype=np.float32)
+    cosines = np.einsum('ij,ij->i', expected, actual) / np.maximum(
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1), 1e-12
+    )
+    return {
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "passed": bool(cosines.min() >= min_cosine)
+    }
+
+def benchmark(model, sentences: List[str], batch_size: int = 32) -> float:
+    """Return the throughput of a model in sentences per second."""
+    model.encode(sentences[:batch_size], batch_size=batch_size)  # warm up
+    start = time.perf_counter()
+    model.encode(sentences, batch_size=batch_size)
+    return len(sentences) / (time.perf_counter() - start)
+
+def compare_backends(model_name: str,
+                     sentences: List[str],
+                     backends: Optional[List[str]] = None,
+                     model_dir: Optional[Path] = None,
+                     min_cosine: float = 0.99,
+                     batch_size: int = 32) -> Dict[str, Dict[str, Any]]:
+    """Check every backend against eager PyTorch and measure its throughput."""
+    reference = load_embedding_model(model_name, "torch")
+    report = {}
+    for backend in backends or EMBEDDING_BACKENDS:
+        model = reference if backend == "torch" else load_embedding_model(model_name, backend, model_dir)
+        report[backend] = {
+            **check_parity(reference, model, sentences, min_cosine),
+            "sentences_per_second": benchmark(model, sentences, batch_size)
+        }
+        logger.info(f"{backend}: {report[backend]}")
+    return report
+
+def main() -> None:
+    """Report parity and throughput of the embedding backends."""
+    from .config import settings
+    
+    parser = argparse.ArgumentParser(description="Compare embedding backends for parity and speed")
+    parser.add_argument("texts", type=Path, help="File with one sentence per line")
+    parser.add_argument("--model", default=settings.embedding_model)
+    parser.add_argument("--model-dir", type=Path, default=settings.embedding_model_dir or None)
+    parser.add_argument("--backends", nargs="+", choices=EMBEDDING_BACKENDS, default=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+    
+    sentences = [line for line in args.texts.read_text(encoding="utf-8").splitlines() if line.strip()]
+    report = compare_backends(args.model, sentences, args.backends, args.model_dir, args.min_cosine, args.batch_size)
+    
+    print(f"{'backend':<12}{'sentences/s':>14}{'min cosine':>14}{'mean cosine':>14}  parity")
+    for backend, result in report.items():
+        print(
+            f"{backend:<12}{result['sentences_per_second']:>14.1f}{result['min_cosine']:>14.5f}"
+            f"{result['mean_cosine']:>14.5f}  {'ok' if result['passed'] else 'FAILED'}"
+        )
+
+if __name__ == "__main__":
+    main()
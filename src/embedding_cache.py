@@ -0,0 +1,194 @@
+"""Embedding caches: a persistent cache of document embeddings and an
+in-memory LRU cache of query embeddings."""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .sqlite_helpers import connect, select_in
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """SQLite-backed cache mapping (model, document text) to its embedding.
+    
+    Vectors are stored as raw float32 bytes. When the cache grows beyond
+    ``max_bytes`` the least recently used entries are evicted.
+    """
+    
+    def __init__(self, db_path: Path, model_name: str, max_bytes: int):
+        """Open (or create) the cache database."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key BLOB PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            self._size_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+    
+    def make_key(self, text: str) -> bytes:
+        """Hash a document text together with the model name."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.model_name.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.digest()
+    
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Look up embeddings by key, returning only the ones that are cached."""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            for key, vector in select_in(
+                conn, "SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", unique_keys
+            ):
+                found[key] = np.frombuffer(vector, dtype=np.float32)
+            
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    ((now, key) for key in found)
+                )
+        
+        with self._lock:
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        
+        return found
+    
+    def put_many(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """Store embeddings and evict old entries if the cache is over budget."""
+        now = time.time()
+        rows = []
+        for key, vector in zip(keys, vectors):
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((key, blob, len(key) + len(blob), now))
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            with self._lock:
+                self._size_bytes += sum(row[2] for row in rows)
+            
+            if self._size_bytes > self.max_bytes:
+                # Replaced keys make the running total an overestimate, so
+                # recount before deciding how much to evict.
+                with self._lock:
+                    self._size_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+                if self._size_bytes > self.max_bytes:
+                    self._evict(conn)
+    
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete least recently used entries until the cache is at 90% of its budget."""
+        to_free = self._size_bytes - int(self.max_bytes * 0.9)
+        freed = 0
+        evicted = []
+        
+        cursor = conn.execute("SELECT key, size FROM embeddings ORDER BY last_used")
+        for key, size in cursor:
+            if freed >= to_free:
+                break
+            evicted.append((key,))
+            freed += size
+        cursor.close()
+        
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+        with self._lock:
+            self._size_bytes -= freed
+        logger.info(f"Evicted {len(evicted)} entries ({freed} bytes) from embedding cache")
+    
+    def clear(self) -> None:
+        """Remove every cached embedding."""
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM embeddings")
+        with self._lock:
+            self._size_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current cache size."""
+        with closing(connect(self.db_path)) as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": entries,
+            "size_bytes": self._size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class QueryEmbeddingCache:
+    """Bounded in-memory LRU cache mapping query text to its embedding."""
+    
+    def __init__(self, max_entries: int):
+        """Create an empty cache holding at most ``max_entries`` queries."""
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Return the cached embedding of a query, or None."""
+        with self._lock:
+            vector = self._entries.get(query)
+            if vector is None:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(query)
+            self.hits += 1
+            return vector
+    
+    def put(self, query: str, vector: np.ndarray) -> None:
+        """Cache a query embedding, evicting the least recently used one if full."""
+        if self.max_entries <= 0:
+            return
+        
+        with self._lock:
+            self._entries[query] = vector
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Remove every cached query embedding."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current cache size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -4,16 +4,18 @@ WebUI服务器 - 为JavaRAG提供Web界面
 """
 
 import os
+import re
+import json
 import logging
 from pathlib import Path
 from typing import List, Dict, Any
 
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Union
 import uvicorn
 
 # 导入项目模块
@@ -82,13 +84,20 @@ async def startup_event():
         rag_service = RAGService()
         
         logger.info("初始化数据摄取管道...")
-        ingestion_pipeline = IngestionPipeline()
+        # 与RAG服务共用同一个向量库实例，上传的JAR无需重启即可被搜索到
+        ingestion_pipeline = IngestionPipeline(vector_db=rag_service.vector_db)
         
         logger.info("WebUI服务启动完成")
     except Exception as e:
         logger.error(f"服务初始化失败: {e}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时停止解析进程池"""
+    if ingestion_pipeline:
+        ingestion_pipeline.close()
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
     """返回主页面"""
@@ -181,9 +190,25 @@ async def query_knowledge_base(request: QueryRequest):
 # Pydantic model for search POST request
 class WebSearchRequest(BaseModel):
     query: str
-    jar_filter: Optional[str] = None
-    type_filter: Optional[str] = None
+    jar_filter: Optional[Union[str, List[str]]] = None  # 一个或多个JAR
+    type_filter: Optional[Union[str, List[str]]] = None  # 一个或多个代码块类型
+    package_filter: Optional[str] = None  # 包名，以 .* 结尾时包含子包
     top_k: int = 10
+    mode: Optional[str] = None  # vector / lexical / hybrid / symbol / hierarchical，默认取配置
+
+def build_filters(jar_filter: Optional[Union[str, List[str]]],
+                  type_filter: Optional[Union[str, List[str]]],
+                  package_filter: Optional[str]) -> Dict[str, Any]:
+    """把请求中的过滤条件转换为 VectorDatabase.search 的 filters"""
+    filters = {}
+    for key, value in (("jar_file", jar_filter), ("chunk_type", type_filter)):
+        if isinstance(value, list):
+            filters[key] = {"$in": value}
+        elif value:
+            filters[key] = value
+    if package_filter:
+        filters['package'] = package_filter
+    return filters
 
 @app.post("/api/search", response_model=SearchResponse)
 async def search_code_post(request: WebSearchRequest):
@@ -192,13 +217,12 @@ async def search_code_post(request: WebSearchRequest):
         raise HTTPException(status_code=503, detail="RAG服务未初始化")
     
     try:
-        logger.info(f"搜索代码 (POST): query='{request.query}', jar_filter='{request.jar_filter}', type_filter='{request.type_filter}', top_k={request.top_k}")
+        logger.info(
+            f"搜索代码 (POST): query='{request.query}', jar_filter='{request.jar_filter}', "
+            f"type_filter='{request.type_filter}', package_filter='{request.package_filter}', top_k={request.top_k}"
+        )
         
-        filters = {}
-        if request.jar_filter:
-            filters['jar_file'] = request.jar_filter
-        if request.type_filter:
-            filters['chunk_type'] = request.type_filter
+        filters = build_filters(request.jar_filter, request.type_filter, request.package_filter)
         
         # Assuming rag_service has a method search_code that takes these params
         # and returns a list of dicts suitable for SearchResponse.
@@ -219,7 +243,8 @@ async def search_code_post(request: WebSearchRequest):
         search_results_list = rag_service.vector_db.search(
             query=request.query,
             top_k=request.top_k,
-            filters=filters if filters else None
+            filters=filters if filters else None,
+            mode=request.mode
         )
 
         # The search_results_list from vector_db.search is already a list of formatted dicts.
@@ -232,18 +257,74 @@ async def search_code_post(request: WebSearchRequest):
         # vector_db.search returns dicts with these keys among others.
 
         return SearchResponse(results=search_results_list)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error during search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class GrepRequest(BaseModel):
+    pattern: str
+    fixed_string: bool = False  # 按字面量而非正则表达式匹配
+    ignore_case: bool = False
+    jar_filter: Optional[Union[str, List[str]]] = None
+    type_filter: Optional[Union[str, List[str]]] = None
+    package_filter: Optional[str] = None
+    cursor: int = 0  # 上一页最后一条结果的 cursor
+    limit: int = 50
+
+@app.post("/api/grep")
+async def grep_code(request: GrepRequest):
+    """精确搜索源码 (正则表达式或字面量)，以 NDJSON 分页流式返回"""
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG服务未初始化")
+    
+    logger.info(
+        f"精确搜索: pattern='{request.pattern}', jar_filter='{request.jar_filter}', "
+        f"cursor={request.cursor}, limit={request.limit}"
+    )
+    
+    filters = build_filters(request.jar_filter, request.type_filter, request.package_filter)
+    limit = max(1, min(request.limit, 500))
+    try:
+        results = rag_service.grep(
+            request.pattern,
+            fixed_string=request.fixed_string,
+            ignore_case=request.ignore_case,
+            filters=filters if filters else None,
+            cursor=request.cursor,
+            limit=limit
+        )
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"无效的正则表达式: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def stream():
+        # 每行一个匹配的代码块，最后一行给出下一页的 cursor (没有下一页时为 null)
+        count = 0
+        last_cursor = None
+        try:
+            for result in results:
+                count += 1
+                last_cursor = result["cursor"]
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error(f"精确搜索失败: {e}")
+            yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+            return
+        
+        yield json.dumps({"count": count, "next_cursor": last_cursor if count >= limit else None}) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.get("/api/status/database", response_model=StatusResponse)
 async def check_database_status():
     """检查数据库状态"""
     try:
         if rag_service and rag_service.vector_db:
             # 尝试获取集合信息
-            collection = rag_service.vector_db.collection
-            count = collection.count()
+            count = rag_service.vector_db.count()
             
             return StatusResponse(
                 status="online",
@@ -295,17 +376,16 @@ async def delete_jar(jar_name: str):
             jar_path.unlink()
             logger.info(f"已删除JAR文件: {jar_path}")
         
-        # 从向量数据库中删除相关数据
-        if rag_service and rag_service.vector_db:
-            # 删除与该JAR文件相关的所有文档
-            collection = rag_service.vector_db.collection
-            # 根据jar_file元数据删除文档
-            collection.delete(where={"jar_file": jar_name})
-            logger.info(f"已从数据库删除JAR文件相关数据: {jar_name}")
+        # 按目录中记录的代码块ID批量删除该JAR的数据
+        chunks_deleted = 0
+        if ingestion_pipeline:
+            chunks_deleted = ingestion_pipeline.remove_jar(jar_name)
+            logger.info(f"已从数据库删除JAR文件相关数据: {jar_name} ({chunks_deleted} 个代码块)")
         
         return JSONResponse({
             "message": f"JAR文件 {jar_name} 删除成功",
-            "jar_name": jar_name
+            "jar_name": jar_name,
+            "chunks_deleted": chunks_deleted
         })
         
     except Exception as e:
@@ -319,27 +399,24 @@ async def get_jar_files():
         jar_files = []
         sources_dir = settings.sources_dir
         
+        # 一次性读取JAR目录，无需扫描向量数据库
+        catalog = ingestion_pipeline.list_jars() if ingestion_pipeline else {}
+        
         if sources_dir.exists():
             for jar_file in sources_dir.glob("*.jar"):
                 # 获取文件统计信息
                 file_stats = jar_file.stat()
                 upload_time = file_stats.st_mtime
                 
-                # 从向量数据库获取该JAR文件的块数量
-                chunks = 0
-                if rag_service and rag_service.vector_db:
-                    try:
-                        collection = rag_service.vector_db.collection
-                        result = collection.get(where={"jar_file": jar_file.name})
-                        chunks = len(result['ids']) if result['ids'] else 0
-                    except Exception as e:
-                        logger.warning(f"获取JAR文件块数量失败: {e}")
+                entry = catalog.get(jar_file.name)
+                chunks = entry["chunk_count"] if entry else 0
                 
                 jar_files.append({
                     "name": jar_file.name,
                     "status": "indexed" if chunks > 0 else "pending",
                     "chunks": chunks,
                     "uploadTime": upload_time,
+                    "ingestTime": entry["ingested_at"] if entry else None,
                     "size": file_stats.st_size
                 })
         
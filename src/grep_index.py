@@ -0,0 +1,269 @@
+"""Trigram index over chunk content for exact substring and regex search."""
+
+import json
+import logging
+import re
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11 exposes the regex parser as top-level modules
+    import sre_constants
+    import sre_parse
+
+from .metadata_filter import Condition, is_indexed_key, parse_filters, sql_conditions
+from .sqlite_helpers import connect, select_in
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Metadata returned with each match; chunks also keep the keys filters
+# are indexed on, but not the full metadata other indexes store
+_RESULT_FIELDS = ("source_file", "jar_file", "package", "class_name", "method_name", "chunk_type", "start_line")
+
+# Possessive repeats and atomic groups only exist from Python 3.11
+_POSSESSIVE_REPEAT = getattr(sre_constants, "POSSESSIVE_REPEAT", None)
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+
+_REPEATS = tuple(
+    op for op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, _POSSESSIVE_REPEAT) if op is not None
+)
+
+def _trigram_query(literal: str) -> Optional[str]:
+    """Return an FTS5 query for the trigrams of a literal, or None if it is too short."""
+    trigrams = dict.fromkeys(literal[i:i + 3].lower() for i in range(len(literal) - 2))
+    if not trigrams:
+        return None
+    return " AND ".join('"' + trigram.replace('"', '""') + '"' for trigram in trigrams)
+
+def _sequence_query(items) -> List[str]:
+    """Collect FTS5 conditions every match of a parsed regex sequence satisfies.
+    
+    Runs of literal characters become the conjunction of their trigrams.
+    Groups and repeats that must occur at least once contribute their own
+    conditions, and an alternation contributes a disjunction if every
+    branch constrains the match. Anything else only ends the current run.
+    """
+    conditions = []
+    run = []
+    
+    def flush():
+        condition = _trigram_query("".join(run))
+        if condition:
+            conditions.append(condition)
+        run.clear()
+    
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        
+        if op in _REPEATS:
+            low, high, item = av
+            if low >= 1 and len(item) == 1 and item[0][0] is sre_constants.LITERAL:
+                # "o+" in "fo+bar" still extends the run by one "o"
+                run.extend(chr(item[0][1]) * low)
+                if high != low:
+                    flush()
+                continue
+            flush()
+            if low >= 1:
+                conditions.extend(_sequence_query(item))
+        elif op is sre_constants.SUBPATTERN:
+            flush()
+            conditions.extend(_sequence_query(av[-1]))
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            flush()
+            conditions.extend(_sequence_query(av))
+        elif op is sre_constants.BRANCH:
+            flush()
+            branches = [_sequence_query(branch) for branch in av[1]]
+            if all(branches):
+                conditions.append(" OR ".join(f"({' AND '.join(branch)})" for branch in branches))
+        else:
+            flush()
+    
+    flush()
+    return conditions
+
+def required_trigrams(pattern: str, flags: int = 0) -> Optional[str]:
+    """Return an FTS5 query that every chunk matching a regex also matches.
+    
+    Returns None if the regex requires no literal of at least three
+    characters, in which case every chunk is a candidate.
+    """
+    conditions = _sequence_query(sre_parse.parse(pattern, flags))
+    return " AND ".join(f"({condition})" for condition in conditions) or None
+
+class GrepIndex:
+    """SQLite FTS5 trigram index over chunk content.
+    
+    A search turns the literals a regex requires into a trigram query, which
+    narrows the chunks down to candidates without scanning them; the regex
+    itself then only runs over the candidates. Only the presence of a
+    trigram in a chunk is indexed (``detail=none``), which keeps the index
+    small, so the regex pass is what confirms a match.
+    """
+    
+    # Candidates read per statement while searching
+    _SCAN_BATCH_SIZE = 200
+    
+    def __init__(self, db_path: Path):
+        """Open (or create) the index database."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    rowid INTEGER PRIMARY KEY,
+                    chunk_id TEXT NOT NULL UNIQUE,
+                    metadata TEXT NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS content USING fts5(body, tokenize='trigram', detail=none)"
+            )
+    
+    def add(self, chunks: Iterable[Tuple[str, Dict[str, Any], str]]) -> None:
+        """Index ``(chunk_id, metadata, content)`` triples, replacing existing entries."""
+        chunks = list(chunks)
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            self._delete(conn, [chunk_id for chunk_id, _, _ in chunks])
+            for chunk_id, metadata, content in chunks:
+                rowid = conn.execute(
+                    "INSERT INTO docs (chunk_id, metadata) VALUES (?, ?)",
+                    (chunk_id, json.dumps({key: value for key, value in metadata.items() if is_indexed_key(key)}))
+                ).lastrowid
+                conn.execute("INSERT INTO content (rowid, body) VALUES (?, ?)", (rowid, content))
+    
+    def remove(self, chunk_ids: List[str]) -> None:
+        """Remove chunks from the index; unknown IDs are ignored."""
+        with closing(connect(self.db_path)) as conn, conn:
+            self._delete(conn, chunk_ids)
+    
+    def _delete(self, conn: sqlite3.Connection, chunk_ids: List[str]) -> None:
+        """Delete the docs and content of the given chunks."""
+        rowids = select_in(conn, "SELECT rowid FROM docs WHERE chunk_id IN ({placeholders})", chunk_ids)
+        conn.executemany("DELETE FROM content WHERE rowid = ?", rowids)
+        conn.executemany("DELETE FROM docs WHERE rowid = ?", rowids)
+    
+    def clear(self) -> None:
+        """Remove every chunk from the index."""
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM content")
+            conn.execute("DELETE FROM docs")
+    
+    def count(self) -> int:
+        """Return the number of indexed chunks."""
+        with closing(connect(self.db_path)) as conn:
+            return conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+    
+    def grep(self,
+             pattern: str,
+             fixed_string: bool = False,
+             ignore_case: bool = False,
+             filters: Optional[Dict[str, Any]] = None,
+             cursor: int = 0,
+             limit: int = 50) -> Iterator[Dict[str, Any]]:
+        """Iterate over the chunks matching a regex (or, with ``fixed_string``, a literal).
+        
+        Each result holds the chunk's ID, location metadata and matching
+        lines, with line numbers in the source file; ``^`` and ``$`` match
+        at line boundaries. Results come in index order and are produced
+        lazily, at most ``limit`` of them; passing the ``cursor`` of the last
+        result continues after it. ``filters`` are conditions on metadata
+        values, as in vector search, but only on the keys in
+        ``metadata_filter.INDEXED_KEYS`` and package prefixes. Raises
+        ``re.error`` for an invalid pattern and ``ValueError`` for an
+        invalid filter.
+        """
+        if fixed_string:
+            pattern = re.escape(pattern)
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        
+        # Checked here rather than in the generator, so that an invalid
+        # pattern or filter fails on the call instead of on the first result
+        regex = re.compile(pattern, flags)
+        conditions = parse_filters(filters)
+        return self._scan(regex, required_trigrams(pattern, flags), conditions, cursor, limit)
+    
+    def _scan(self,
+              regex: re.Pattern,
+              match: Optional[str],
+              conditions: List[Condition],
+              cursor: int,
+              limit: int) -> Iterator[Dict[str, Any]]:
+        """Run a regex over the chunks matching a trigram query, in batches of candidates.
+        
+        Each batch is read on a connection of its own, closed before any
+        result is yielded: the consumer may resume the generator from
+        another thread, as a streamed web response does.
+        """
+        sql = """
+            SELECT content.rowid, content.body, docs.chunk_id, docs.metadata
+            FROM content JOIN docs ON docs.rowid = content.rowid
+            WHERE content.rowid > ?
+        """
+        params = []
+        if match:
+            sql += " AND content MATCH ?"
+            params.append(match)
+        
+        filter_sql, filter_params = sql_conditions(conditions, "docs.metadata")
+        sql += filter_sql + " ORDER BY content.rowid LIMIT ?"
+        params.extend(filter_params)
+        
+        found = 0
+        while found < limit:
+            with closing(connect(self.db_path)) as conn:
+                rows = conn.execute(sql, [cursor, *params, self._SCAN_BATCH_SIZE]).fetchall()
+            if not rows:
+                break
+            
+            for rowid, body, chunk_id, metadata in rows:
+                cursor = rowid
+                metadata = json.loads(metadata)
+                lines = self._matching_lines(regex, body, int(metadata.get("start_line") or 1))
+                if not lines:
+                    continue
+                
+                yield {
+                    "chunk_id": chunk_id,
+                    "cursor": rowid,
+                    **{key: metadata.get(key, "") for key in _RESULT_FIELDS},
+                    "matches": lines
+                }
+                found += 1
+                if found >= limit:
+                    break
+    
+    @staticmethod
+    def _matching_lines(regex: re.Pattern, body: str, start_line: int) -> List[Dict[str, Any]]:
+        """Return each line of a chunk a regex matches, with its first match's columns."""
+        lines = []
+        line = start_line
+        position = 0
+        last_line = None
+        for found in regex.finditer(body):
+            line += body.count("\n", position, found.start())
+            position = found.start()
+            if line == last_line:
+                continue
+            
+            line_start = body.rfind("\n", 0, position) + 1
+            line_end = body.find("\n", position)
+            if line_end < 0:
+                line_end = len(body)
+            lines.append({
+                "line": line,
+                "text": body[line_start:line_end],
+                "start": position - line_start,
+                "end": found.end() - line_start
+            })
+            last_line = line
+        return lines
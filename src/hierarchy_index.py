@@ -0,0 +1,278 @@
+"""Mean embeddings of files and classes, for coarse-to-fine vector search."""
+
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+import numpy as np
+
+from .metadata_filter import Condition, matches, package_ancestors
+from .sqlite_helpers import connect, delete_in, select_in
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LEVELS = ("file", "class")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    id INTEGER PRIMARY KEY,
+    level TEXT NOT NULL,
+    key TEXT NOT NULL,
+    parent INTEGER,
+    metadata TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total BLOB NOT NULL,
+    UNIQUE (level, key)
+);
+
+CREATE TABLE IF NOT EXISTS members (
+    chunk_id TEXT PRIMARY KEY,
+    file_group INTEGER NOT NULL,
+    class_group INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_members_class ON members (class_group);
+"""
+
+def _group_keys(metadata: Dict[str, Any]) -> Tuple[Tuple[str, Dict[str, Any]], Tuple[str, Dict[str, Any]]]:
+    """Return the ``(key, metadata)`` of the file and the class a chunk belongs to.
+    
+    Chunks outside any class (or whose class is unknown) share one class
+    group per file, so every chunk is a member of exactly one class.
+    """
+    jar_file = metadata.get("jar_file") or ""
+    source_file = metadata.get("source_file") or ""
+    package = metadata.get("package") or ""
+    class_name = metadata.get("class_name") or ""
+    qualified_class = metadata.get("qualified_class") or class_name
+    
+    file_metadata = {"jar_file": jar_file, "source_file": source_file, "package": package, **package_ancestors(package)}
+    class_metadata = {**file_metadata, "class_name": class_name, "qualified_class": qualified_class}
+    file_key = f"{jar_file}!{source_file}"
+    return (file_key, file_metadata), (f"{file_key}#{qualified_class}", class_metadata)
+
+class HierarchyIndex:
+    """SQLite-backed per-file and per-class sums of member embeddings.
+    
+    Every chunk belongs to one file and one class; each group keeps the sum
+    and count of its members' embeddings, updated as chunks are written and
+    deleted, so its mean never has to be recomputed from the members. Sums
+    are float64: a large file's sum loses too much to float32 rounding as
+    members come and go. A search ranks the group means against the query,
+    first files and then the classes in the best files, and hands back the
+    member IDs of the best classes for an exact search among them.
+    
+    Group means are loaded into memory on the first search and reloaded
+    after this process writes; writes made by another process are seen
+    after reopening the index.
+    """
+    
+    # Bumped when the schema changes; older indexes are rebuilt from scratch
+    _SCHEMA_VERSION = 1
+    
+    def __init__(self, db_path: Path):
+        """Open (or create) the index database."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._groups: Dict[str, Tuple[np.ndarray, np.ndarray, List[Dict[str, Any]], np.ndarray]] = {}
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != self._SCHEMA_VERSION:
+                conn.executescript("""
+                    DROP TABLE IF EXISTS groups;
+                    DROP TABLE IF EXISTS members;
+                """)
+                conn.execute(f"PRAGMA user_version = {self._SCHEMA_VERSION}")
+            conn.executescript(_SCHEMA)
+    
+    def known(self, chunk_ids: List[str]) -> List[str]:
+        """Return the given chunk IDs that are already members of a group."""
+        with closing(connect(self.db_path)) as conn:
+            rows = select_in(conn, "SELECT chunk_id FROM members WHERE chunk_id IN ({placeholders})", chunk_ids)
+        return [row[0] for row in rows]
+    
+    def add(self,
+            chunks: Iterable[Tuple[str, Dict[str, Any], Any]],
+            previous: Dict[str, np.ndarray]) -> None:
+        """Add ``(chunk_id, metadata, embedding)`` triples to their file and class.
+        
+        Chunks that are already members are moved: ``previous`` must hold
+        the embedding they were added with, which is taken out of their old
+        groups first. Members missing from ``previous`` cannot be taken out,
+        so they are left where they are instead of being counted twice. Pass
+        embeddings as the vector store returns them, so the ones given back
+        on removal match exactly.
+        """
+        chunks = list(chunks)
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            self._delete(conn, previous)
+            stuck = {row[0] for row in select_in(
+                conn, "SELECT chunk_id FROM members WHERE chunk_id IN ({placeholders})",
+                [chunk_id for chunk_id, _, _ in chunks]
+            )}
+            if stuck:
+                logger.warning(f"Keeping {len(stuck)} hierarchy members whose previous embeddings are unknown")
+            
+            totals = {}
+            for chunk_id, metadata, embedding in chunks:
+                if chunk_id in stuck:
+                    continue
+                vector = np.asarray(embedding, dtype=np.float64)
+                (file_key, file_metadata), (class_key, class_metadata) = _group_keys(metadata)
+                file_group = self._group(conn, "file", file_key, None, file_metadata, vector.shape[0])
+                class_group = self._group(conn, "class", class_key, file_group, class_metadata, vector.shape[0])
+                conn.execute("INSERT OR REPLACE INTO members VALUES (?, ?, ?)", (chunk_id, file_group, class_group))
+                
+                for group in (file_group, class_group):
+                    count, total = totals.get(group, (0, 0))
+                    totals[group] = (count + 1, total + vector)
+            
+            self._update_totals(conn, totals)
+        self._invalidate()
+    
+    def remove(self, embeddings: Dict[str, np.ndarray]) -> None:
+        """Remove chunks, given the embeddings they were added with; unknown IDs are ignored."""
+        with closing(connect(self.db_path)) as conn, conn:
+            self._delete(conn, embeddings)
+        self._invalidate()
+    
+    def _delete(self, conn: sqlite3.Connection, embeddings: Dict[str, np.ndarray]) -> None:
+        """Take chunks out of their groups and drop groups left empty."""
+        chunk_ids = list(embeddings)
+        totals = {}
+        for chunk_id, file_group, class_group in select_in(
+            conn, "SELECT chunk_id, file_group, class_group FROM members WHERE chunk_id IN ({placeholders})", chunk_ids
+        ):
+            vector = np.asarray(embeddings[chunk_id], dtype=np.float64)
+            for group in (file_group, class_group):
+                count, total = totals.get(group, (0, 0))
+                totals[group] = (count - 1, total - vector)
+        delete_in(conn, "members", "chunk_id", chunk_ids)
+        
+        self._update_totals(conn, totals)
+        conn.execute("DELETE FROM groups WHERE count <= 0")
+    
+    @staticmethod
+    def _group(conn: sqlite3.Connection,
+               level: str,
+               key: str,
+               parent: Optional[int],
+               metadata: Dict[str, Any],
+               dimension: int) -> int:
+        """Return the ID of a group, creating it empty if needed."""
+        row = conn.execute("SELECT id FROM groups WHERE level = ? AND key = ?", (level, key)).fetchone()
+        if row:
+            return row[0]
+        return conn.execute(
+            "INSERT INTO groups (level, key, parent, metadata, count, total) VALUES (?, ?, ?, ?, 0, ?)",
+            (level, key, parent, json.dumps(metadata), np.zeros(dimension, dtype=np.float64).tobytes())
+        ).lastrowid
+    
+    @staticmethod
+    def _update_totals(conn: sqlite3.Connection, totals: Dict[int, Tuple[int, np.ndarray]]) -> None:
+        """Add member count and embedding sum changes to groups."""
+        for group, (count, total) in totals.items():
+            row = conn.execute("SELECT count, total FROM groups WHERE id = ?", (group,)).fetchone()
+            if row is None:
+                continue
+            conn.execute(
+                "UPDATE groups SET count = ?, total = ? WHERE id = ?",
+                (row[0] + count, (np.frombuffer(row[1], dtype=np.float64) + total).tobytes(), group)
+            )
+    
+    def clear(self) -> None:
+        """Remove every group and member."""
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM members")
+            conn.execute("DELETE FROM groups")
+        self._invalidate()
+    
+    def count(self) -> int:
+        """Return the number of indexed chunks."""
+        with closing(connect(self.db_path)) as conn:
+            return conn.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+    
+    def group_counts(self) -> Dict[str, int]:
+        """Return the number of groups at each level."""
+        with closing(connect(self.db_path)) as conn:
+            counts = dict(conn.execute("SELECT level, COUNT(*) FROM groups GROUP BY level"))
+        return {level: counts.get(level, 0) for level in LEVELS}
+    
+    def _invalidate(self) -> None:
+        """Drop the loaded group means after a write."""
+        with self._lock:
+            self._groups.clear()
+    
+    def _load(self, level: str) -> Tuple[np.ndarray, np.ndarray, List[Dict[str, Any]], np.ndarray]:
+        """Return the IDs, parents, metadata and unit-length means of a level's groups."""
+        with self._lock:
+            if level not in self._groups:
+                with closing(connect(self.db_path)) as conn:
+                    rows = conn.execute(
+                        "SELECT id, parent, metadata, count, total FROM groups "
+                        "WHERE level = ? AND count > 0 ORDER BY id",
+                        (level,)
+                    ).fetchall()
+                
+                ids = np.array([row[0] for row in rows], dtype=np.int64)
+                parents = np.array([row[1] or 0 for row in rows], dtype=np.int64)
+                metadatas = [json.loads(row[2]) for row in rows]
+                if rows:
+                    means = np.stack([np.frombuffer(row[4], dtype=np.float64) / row[3] for row in rows])
+                    means = means.astype(np.float32)
+                    means /= np.maximum(np.linalg.norm(means, axis=1, keepdims=True), 1e-12)
+                else:
+                    means = np.zeros((0, 0), dtype=np.float32)
+                self._groups[level] = (ids, parents, metadatas, means)
+            
+            return self._groups[level]
+    
+    def top_groups(self,
+                   level: str,
+                   query_embedding: List[float],
+                   limit: int,
+                   conditions: Optional[List[Condition]] = None,
+                   parents: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the IDs of the ``limit`` groups whose mean is closest to a query.
+        
+        Only groups under one of ``parents`` are considered, if given.
+        ``conditions`` on keys a group's metadata holds (JAR, file, package
+        and, for classes, class names) must hold for it; the others are left
+        to the member search.
+        """
+        ids, group_parents, metadatas, means = self._load(level)
+        candidates = np.arange(len(ids))
+        if parents is not None:
+            candidates = candidates[np.isin(group_parents, parents)]
+        if not len(candidates):
+            return np.zeros(0, dtype=np.int64)
+        
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = means[candidates] @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        order = candidates[np.argsort(-scores, kind='stable')]
+        
+        if conditions:
+            selected = []
+            for index in order:
+                metadata = metadatas[index]
+                if matches(metadata, [condition for condition in conditions if condition[0] in metadata]):
+                    selected.append(index)
+                    if len(selected) >= limit:
+                        break
+            order = np.array(selected, dtype=np.int64)
+        
+        return ids[order[:limit]]
+    
+    def members(self, class_groups: np.ndarray) -> List[str]:
+        """Return the chunk IDs in the given class groups."""
+        groups = [int(group) for group in class_groups]
+        with closing(connect(self.db_path)) as conn:
+            rows = select_in(conn, "SELECT chunk_id FROM members WHERE class_group IN ({placeholders})", groups)
+        return [row[0] for row in rows]
@@ -1,11 +1,14 @@
 """Ingestion pipeline for processing JAR files and building the knowledge base."""
 
 import logging
+import multiprocessing
 import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 
 from src.config import settings
+from src.jar_manifest import JarManifest
 from src.jar_processor import JarProcessor
 from src.vector_db import VectorDatabase
 from src.java_parser import CodeChunk
@@ -13,22 +16,221 @@ from src.java_parser import CodeChunk
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# JAR processor owned by each worker process of the concurrent ingestion pool
+_worker_jar_processor: Optional[JarProcessor] = None
+
+def _init_ingest_worker() -> None:
+    """Create the per-process JAR processor for an ingestion pool worker."""
+    global _worker_jar_processor
+    # Files are parsed serially inside each worker; the pool itself
+    # provides the parallelism across JARs.
+    _worker_jar_processor = JarProcessor(parse_workers=1)
+
+def _extract_jar_in_worker(jar_path: Path) -> Dict[str, Any]:
+    """Validate and parse one JAR inside an ingestion pool worker."""
+    return _extract_jar(_worker_jar_processor, jar_path)
+
+def _extract_jar(jar_processor: JarProcessor, jar_path: Path) -> Dict[str, Any]:
+    """Validate a JAR and extract its code chunks and metadata.
+    
+    The JAR is opened once and the handle is shared between validation,
+    parsing and metadata extraction.
+    """
+    start_time = time.time()
+    extracted = {
+        "valid": False,
+        "chunks": [],
+        "jar_metadata": {},
+        "error": None,
+        "snapshot": None,
+        "extract_time": 0
+    }
+    
+    with jar_processor.open_jar(jar_path) as jar_file:
+        if jar_processor.validate_jar_file(jar_path, jar_file):
+            extracted["valid"] = True
+            try:
+                # Fingerprint the file before reading it, so the manifest
+                # records the content that was actually ingested
+                extracted["snapshot"] = JarManifest.snapshot(jar_path)
+                logger.info("Extracting and parsing Java code...")
+                extracted["chunks"] = jar_processor.process_jar_file(jar_path, jar_file)
+                extracted["jar_metadata"] = jar_processor.get_jar_metadata(jar_path, jar_file)
+            except Exception as e:
+                logger.error(f"Error extracting {jar_path}: {e}")
+                extracted["error"] = str(e)
+    
+    extracted["extract_time"] = time.time() - start_time
+    return extracted
+
+class _ChunkStatistics:
+    """Running statistics over a stream of code chunks."""
+    
+    def __init__(self):
+        self.chunk_count = 0
+        self.chunk_types = {}
+        self.classes = set()
+        self.source_files = set()
+        self.total_lines = 0
+    
+    def add(self, chunk: CodeChunk) -> None:
+        """Account for one chunk."""
+        self.chunk_count += 1
+        
+        # Count chunk types
+        self.chunk_types[chunk.chunk_type] = self.chunk_types.get(chunk.chunk_type, 0) + 1
+        
+        # Collect unique classes and files
+        if chunk.class_name:
+            self.classes.add(chunk.class_name)
+        
+        self.source_files.add(chunk.source_file)
+        
+        # Count lines
+        self.total_lines += chunk.end_line - chunk.start_line + 1
+    
+    def summary(self) -> Dict[str, Any]:
+        """Return the statistics, or an empty dict if no chunks were seen."""
+        if not self.chunk_count:
+            return {}
+        
+        return {
+            "chunk_types": self.chunk_types,
+            "unique_classes": len(self.classes),
+            "unique_source_files": len(self.source_files),
+            "total_lines_of_code": self.total_lines,
+            "average_chunk_size": self.total_lines / self.chunk_count
+        }
+
 class IngestionPipeline:
     """Pipeline for ingesting JAR files and building the knowledge base."""
     
-    def __init__(self, collection_name: str = "java_code_chunks"):
-        """Initialize the ingestion pipeline."""
+    def __init__(self,
+                 collection_name: str = "java_code_chunks",
+                 ingest_workers: Optional[int] = None,
+                 incremental: Optional[bool] = None,
+                 vector_db: Optional[VectorDatabase] = None):
+        """Initialize the ingestion pipeline.
+        
+        Args:
+            collection_name: Name of the vector database collection.
+            ingest_workers: Number of processes that extract and parse JARs
+                concurrently in ``ingest_jar_directory`` and ``ingest_batch``.
+                Values above 1 enable the concurrent mode. Defaults to
+                ``settings.ingest_workers``.
+            incremental: Re-ingest a changed JAR by writing only its new or
+                changed chunks instead of rewriting all of them. Chunks that
+                disappeared are deleted either way. Defaults to
+                ``settings.incremental_ingest``.
+            vector_db: Database to write to, e.g. the one a ``RAGService``
+                searches, so that searches in the same process see ingested
+                chunks at once. Defaults to a new one for ``collection_name``.
+        """
         self.jar_processor = JarProcessor()
-        self.vector_db = VectorDatabase(collection_name)
+        self.vector_db = vector_db if vector_db is not None else VectorDatabase(collection_name)
         self.collection_name = collection_name
+        self.ingest_workers = ingest_workers if ingest_workers is not None else settings.ingest_workers
+        self.incremental = incremental if incremental is not None else settings.incremental_ingest
+        self.manifest = JarManifest(
+            Path(settings.chroma_persist_directory) / f"{collection_name}_manifest.sqlite3"
+        )
     
     def ingest_jar_file(self, jar_path: Path, reset_collection: bool = False) -> Dict[str, Any]:
-        """Ingest a single JAR file into the knowledge base."""
+        """Ingest a single JAR file into the knowledge base.
+        
+        A JAR whose content has not changed since it was last ingested is
+        skipped. A changed JAR is diffed against its previous version and only
+        the difference is written (see ``_plan_chunk_delta``).
+        """
         logger.info(f"Starting ingestion of JAR file: {jar_path}")
         start_time = time.time()
         
-        # Validate JAR file
-        if not self.jar_processor.validate_jar_file(jar_path):
+        if not reset_collection and self.manifest.is_unchanged(jar_path):
+            return self._skipped_result(jar_path, start_time)
+        
+        extracted = _extract_jar(self.jar_processor, jar_path)
+        
+        # Reset collection if requested
+        if reset_collection and extracted["valid"]:
+            self._reset_collection()
+        
+        return self._store_extracted_jar(jar_path, extracted)
+    
+    def _reset_collection(self) -> None:
+        """Reset the vector database collection and forget all ingested JARs."""
+        logger.info("Resetting vector database collection")
+        self.vector_db.reset_collection()
+        self.manifest.clear()
+    
+    def _skipped_result(self, jar_path: Path, start_time: float) -> Dict[str, Any]:
+        """Build the per-JAR result for a JAR that is already up to date."""
+        logger.info(f"Skipping unchanged JAR file: {jar_path}")
+        return {
+            "success": True,
+            "skipped": True,
+            "jar_file": str(jar_path),
+            "chunks_processed": 0,
+            "processing_time": time.time() - start_time
+        }
+    
+    def _plan_chunk_delta(self, jar_path: Path, chunks: List[CodeChunk]) -> Dict[str, Any]:
+        """Diff a JAR's chunks against those recorded for its previous version.
+        
+        Chunks are compared per source file by ID and fingerprint. Returns the
+        chunks to write (new or changed; all of them when incremental
+        ingestion is off), the IDs of stale chunks to delete, the number of
+        source files affected and the manifest records for the new version.
+        """
+        previous_files = self.manifest.get_chunk_fingerprints(jar_path.name)
+        current_files = {}
+        current_ids = set()
+        records = []
+        
+        for chunk in chunks:
+            chunk_id, fingerprint = self.vector_db.chunk_signature(chunk)
+            if chunk_id in current_ids:
+                continue  # Same location, type and name; keep the first chunk
+            current_ids.add(chunk_id)
+            current_files.setdefault(chunk.source_file, []).append((chunk_id, fingerprint, chunk))
+            records.append((chunk_id, chunk.source_file, fingerprint))
+        
+        to_write = []
+        changed_files = set()
+        for source_file, current in current_files.items():
+            previous = previous_files.get(source_file, {})
+            for chunk_id, fingerprint, chunk in current:
+                if not self.incremental or previous.get(chunk_id) != fingerprint:
+                    to_write.append(chunk)
+                    changed_files.add(source_file)
+        
+        stale_ids = []
+        for source_file, previous in previous_files.items():
+            for chunk_id in previous:
+                if chunk_id not in current_ids:
+                    stale_ids.append(chunk_id)
+                    changed_files.add(source_file)
+        
+        logger.info(
+            f"{jar_path.name}: {len(to_write)} chunks to write, {len(stale_ids)} stale chunks "
+            f"to delete, {len(records) - len(to_write)} unchanged across {len(changed_files)} changed files"
+        )
+        
+        return {
+            "to_write": to_write,
+            "stale_ids": stale_ids,
+            "files_changed": len(changed_files),
+            "records": records
+        }
+    
+    def _store_extracted_jar(self, jar_path: Path, extracted: Dict[str, Any]) -> Dict[str, Any]:
+        """Write an extracted JAR's chunks to the vector database.
+        
+        Returns the per-JAR result reported by ``ingest_jar_file``. The
+        processing time covers both extraction and writing.
+        """
+        start_time = time.time() - extracted["extract_time"]
+        
+        if not extracted["valid"]:
             return {
                 "success": False,
                 "error": f"Invalid JAR file: {jar_path}",
@@ -36,39 +238,45 @@ class IngestionPipeline:
                 "processing_time": 0
             }
         
-        # Reset collection if requested
-        if reset_collection:
-            logger.info("Resetting vector database collection")
-            self.vector_db.reset_collection()
+        if extracted["error"]:
+            return {
+                "success": False,
+                "error": extracted["error"],
+                "chunks_processed": 0,
+                "processing_time": time.time() - start_time
+            }
+        
+        chunks = extracted["chunks"]
+        if not chunks:
+            return {
+                "success": False,
+                "error": "No code chunks extracted from JAR file",
+                "chunks_processed": 0,
+                "processing_time": time.time() - start_time
+            }
         
         try:
-            # Extract and parse code chunks
-            logger.info("Extracting and parsing Java code...")
-            chunks = self.jar_processor.process_jar_file(jar_path)
-            
-            if not chunks:
-                return {
-                    "success": False,
-                    "error": "No code chunks extracted from JAR file",
-                    "chunks_processed": 0,
-                    "processing_time": time.time() - start_time
-                }
+            delta = self._plan_chunk_delta(jar_path, chunks)
             
-            # Add chunks to vector database
-            logger.info("Adding chunks to vector database...")
-            self.vector_db.add_chunks(chunks)
+            # Write new and changed chunks before removing stale ones, so a
+            # failed write leaves the previous version searchable
+            if delta["to_write"]:
+                logger.info("Adding chunks to vector database...")
+                self.vector_db.add_chunks(delta["to_write"])
+            self.vector_db.delete_chunks(delta["stale_ids"])
+            self.manifest.record(jar_path, delta["records"], extracted["snapshot"])
             
             processing_time = time.time() - start_time
             
-            # Get JAR metadata
-            jar_metadata = self.jar_processor.get_jar_metadata(jar_path)
-            
             result = {
                 "success": True,
                 "jar_file": str(jar_path),
                 "chunks_processed": len(chunks),
+                "chunks_written": len(delta["to_write"]),
+                "chunks_deleted": len(delta["stale_ids"]),
+                "files_changed": delta["files_changed"],
                 "processing_time": processing_time,
-                "jar_metadata": jar_metadata,
+                "jar_metadata": extracted["jar_metadata"],
                 "chunk_statistics": self._analyze_chunks(chunks)
             }
             
@@ -84,6 +292,54 @@ class IngestionPipeline:
                 "processing_time": time.time() - start_time
             }
     
+    def _extract_concurrently(self, jar_paths: List[Path]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Extract JARs on a bounded process pool.
+        
+        Yields ``(index, extracted)`` pairs as JARs finish, so the caller can
+        act as the single writer to the vector database. At most two JARs per
+        worker are in flight, which bounds how many parsed chunks wait in
+        memory for the writer.
+        """
+        max_in_flight = self.ingest_workers * 2
+        remaining = iter(enumerate(jar_paths))
+        in_flight = {}
+        
+        # Workers are spawned rather than forked: this process already runs
+        # the embedding model's threads and the writer thread, whose locks a
+        # forked child could inherit in a held state
+        with ProcessPoolExecutor(
+            max_workers=self.ingest_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_ingest_worker
+        ) as executor:
+            def submit_next() -> bool:
+                for index, jar_path in remaining:
+                    logger.info(f"Processing JAR {index + 1}/{len(jar_paths)}: {jar_path.name}")
+                    in_flight[executor.submit(_extract_jar_in_worker, jar_path)] = index
+                    return True
+                return False
+            
+            while len(in_flight) < max_in_flight and submit_next():
+                pass
+            
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    try:
+                        extracted = future.result()
+                    except Exception as e:
+                        logger.error(f"Error processing {jar_paths[index]}: {e}")
+                        extracted = {
+                            "valid": True,
+                            "chunks": [],
+                            "jar_metadata": {},
+                            "error": str(e),
+                            "extract_time": 0
+                        }
+                    yield index, extracted
+                    submit_next()
+    
     def ingest_jar_directory(self, jar_dir: Path, reset_collection: bool = False) -> Dict[str, Any]:
         """Ingest all JAR files in a directory."""
         logger.info(f"Starting ingestion of JAR directory: {jar_dir}")
@@ -114,21 +370,36 @@ class IngestionPipeline:
         
         # Reset collection if requested (only for the first file)
         if reset_collection:
-            logger.info("Resetting vector database collection")
-            self.vector_db.reset_collection()
+            self._reset_collection()
         
         # Process each JAR file
         results = []
         total_chunks = 0
         successful_files = 0
+        skipped_files = 0
         
-        for i, jar_file in enumerate(jar_files, 1):
-            logger.info(f"Processing JAR {i}/{len(jar_files)}: {jar_file.name}")
-            
-            result = self.ingest_jar_file(jar_file, reset_collection=False)
-            results.append(result)
+        if self.ingest_workers > 1 and len(jar_files) > 1:
+            # Workers extract and parse; this process is the single writer
+            results = [None] * len(jar_files)
+            changed = []
+            for index, jar_file in enumerate(jar_files):
+                if self.manifest.is_unchanged(jar_file):
+                    results[index] = self._skipped_result(jar_file, time.time())
+                else:
+                    changed.append(index)
             
-            if result["success"]:
+            for i, extracted in self._extract_concurrently([jar_files[index] for index in changed]):
+                index = changed[i]
+                results[index] = self._store_extracted_jar(jar_files[index], extracted)
+        else:
+            for i, jar_file in enumerate(jar_files, 1):
+                logger.info(f"Processing JAR {i}/{len(jar_files)}: {jar_file.name}")
+                results.append(self.ingest_jar_file(jar_file, reset_collection=False))
+        
+        for jar_file, result in zip(jar_files, results):
+            if result.get("skipped"):
+                skipped_files += 1
+            elif result["success"]:
                 successful_files += 1
                 total_chunks += result["chunks_processed"]
             else:
@@ -137,11 +408,12 @@ class IngestionPipeline:
         processing_time = time.time() - start_time
         
         return {
-            "success": successful_files > 0,
+            "success": successful_files + skipped_files > 0,
             "directory": str(jar_dir),
             "files_found": len(jar_files),
             "files_processed": successful_files,
-            "files_failed": len(jar_files) - successful_files,
+            "files_skipped": skipped_files,
+            "files_failed": len(jar_files) - successful_files - skipped_files,
             "total_chunks": total_chunks,
             "processing_time": processing_time,
             "detailed_results": results
@@ -154,47 +426,101 @@ class IngestionPipeline:
         
         # Reset collection if requested
         if reset_collection:
-            logger.info("Resetting vector database collection")
-            self.vector_db.reset_collection()
+            self._reset_collection()
+        
+        # Skip JARs that are already up to date
+        skipped_files = []
+        changed_paths = []
+        for jar_path in jar_paths:
+            if self.manifest.is_unchanged(jar_path):
+                logger.info(f"Skipping unchanged JAR file: {jar_path}")
+                skipped_files.append(str(jar_path))
+            else:
+                changed_paths.append(jar_path)
+        jar_paths = changed_paths
         
         # Process all JAR files
-        all_chunks = []
-        successful_files = 0
-        failed_files = []
+        ingested_jars = []  # (jar_path, chunk delta, snapshot) in the order chunks are written
+        failed_files = []  # (input index, jar path)
+        statistics = _ChunkStatistics()
         
-        for i, jar_path in enumerate(jar_paths, 1):
-            logger.info(f"Processing JAR {i}/{len(jar_paths)}: {jar_path.name}")
-            
-            try:
-                if self.jar_processor.validate_jar_file(jar_path):
-                    chunks = self.jar_processor.process_jar_file(jar_path)
-                    all_chunks.extend(chunks)
-                    successful_files += 1
-                    logger.info(f"Extracted {len(chunks)} chunks from {jar_path.name}")
-                else:
-                    failed_files.append(str(jar_path))
+        def iter_extracted() -> Iterator[Tuple[int, Dict[str, Any]]]:
+            if self.ingest_workers > 1 and len(jar_paths) > 1:
+                yield from self._extract_concurrently(jar_paths)
+            else:
+                for index, jar_path in enumerate(jar_paths):
+                    logger.info(f"Processing JAR {index + 1}/{len(jar_paths)}: {jar_path.name}")
+                    yield index, _extract_jar(self.jar_processor, jar_path)
+        
+        def stream_chunks() -> Iterator[CodeChunk]:
+            # Chunks flow JAR by JAR into the vector database, so only the
+            # JARs currently being parsed or embedded are held in memory.
+            for index, extracted in iter_extracted():
+                jar_path = jar_paths[index]
+                if not extracted["valid"]:
+                    failed_files.append((index, str(jar_path)))
                     logger.error(f"Invalid JAR file: {jar_path}")
-            except Exception as e:
-                failed_files.append(str(jar_path))
-                logger.error(f"Error processing {jar_path}: {e}")
+                elif extracted["error"]:
+                    failed_files.append((index, str(jar_path)))
+                    logger.error(f"Error processing {jar_path}: {extracted['error']}")
+                elif not extracted["chunks"]:
+                    # Parse errors leave a valid JAR without chunks; treating
+                    # that as its new version would delete what it had
+                    failed_files.append((index, str(jar_path)))
+                    logger.error(f"No code chunks extracted from JAR file: {jar_path}")
+                else:
+                    chunks = extracted["chunks"]
+                    logger.info(f"Extracted {len(chunks)} chunks from {jar_path.name}")
+                    delta = self._plan_chunk_delta(jar_path, chunks)
+                    ingested_jars.append((jar_path, delta, extracted["snapshot"]))
+                    for chunk in chunks:
+                        statistics.add(chunk)
+                    yield from delta["to_write"]
+        
+        chunk_ids = self.vector_db.add_chunks(stream_chunks())
         
-        # Add all chunks to vector database in one batch
-        if all_chunks:
-            logger.info(f"Adding {len(all_chunks)} total chunks to vector database...")
-            self.vector_db.add_chunks(all_chunks)
+        chunks_deleted = 0
+        for jar_path, delta, snapshot in ingested_jars:
+            self.vector_db.delete_chunks(delta["stale_ids"])
+            self.manifest.record(jar_path, delta["records"], snapshot)
+            chunks_deleted += len(delta["stale_ids"])
         
         processing_time = time.time() - start_time
+        failed_files = [jar_path for _, jar_path in sorted(failed_files)]
         
         return {
-            "success": successful_files > 0,
-            "files_processed": successful_files,
+            "success": len(ingested_jars) + len(skipped_files) > 0,
+            "files_processed": len(ingested_jars),
+            "files_skipped": len(skipped_files),
             "files_failed": len(failed_files),
             "failed_files": failed_files,
-            "total_chunks": len(all_chunks),
+            "total_chunks": statistics.chunk_count,
+            "chunks_written": len(chunk_ids),
+            "chunks_deleted": chunks_deleted,
             "processing_time": processing_time,
-            "chunk_statistics": self._analyze_chunks(all_chunks) if all_chunks else {}
+            "chunk_statistics": statistics.summary()
         }
     
+    def close(self) -> None:
+        """Shut down the JAR processor's parsing worker pool, if one was started."""
+        self.jar_processor.close()
+    
+    def list_jars(self) -> Dict[str, Dict[str, Any]]:
+        """Return the catalog entries of all ingested JARs keyed by JAR name."""
+        return self.manifest.list_jars()
+    
+    def remove_jar(self, jar_name: str) -> int:
+        """Delete a JAR's chunks from the knowledge base and forget the JAR.
+        
+        The chunk IDs come from the catalog, so exactly that JAR's chunks
+        are deleted without searching the collection. Returns the number of
+        chunks deleted.
+        """
+        chunk_ids = self.manifest.get_chunk_ids(jar_name)
+        self.vector_db.delete_chunks(chunk_ids)
+        self.manifest.remove(jar_name)
+        return len(chunk_ids)
+    
     def get_ingestion_status(self) -> Dict[str, Any]:
         """Get the current status of the knowledge base."""
         stats = self.vector_db.get_collection_stats()
@@ -203,6 +529,7 @@ class IngestionPipeline:
             "collection_name": self.collection_name,
             "total_chunks": stats["total_chunks"],
             "chunk_types": stats["chunk_types"],
+            "jar_chunks": stats["jar_chunks"],
             "unique_source_files": stats["unique_source_files"],
             "unique_classes": stats["unique_classes"],
             "ready_for_queries": stats["total_chunks"] > 0
@@ -264,35 +591,10 @@ class IngestionPipeline:
     
     def _analyze_chunks(self, chunks: List[CodeChunk]) -> Dict[str, Any]:
         """Analyze code chunks and provide statistics."""
-        if not chunks:
-            return {}
-        
-        chunk_types = {}
-        classes = set()
-        source_files = set()
-        total_lines = 0
-        
+        statistics = _ChunkStatistics()
         for chunk in chunks:
-            # Count chunk types
-            chunk_type = chunk.chunk_type
-            chunk_types[chunk_type] = chunk_types.get(chunk_type, 0) + 1
-            
-            # Collect unique classes and files
-            if chunk.class_name:
-                classes.add(chunk.class_name)
-            
-            source_files.add(chunk.source_file)
-            
-            # Count lines
-            total_lines += chunk.end_line - chunk.start_line + 1
-        
-        return {
-            "chunk_types": chunk_types,
-            "unique_classes": len(classes),
-            "unique_source_files": len(source_files),
-            "total_lines_of_code": total_lines,
-            "average_chunk_size": total_lines / len(chunks) if chunks else 0
-        }
+            statistics.add(chunk)
+        return statistics.summary()
     
     def cleanup_temp_files(self) -> None:
         """Clean up temporary files created during processing."""
@@ -0,0 +1,225 @@
+"""Persistent manifest and catalog of ingested JARs."""
+
+import hashlib
+import logging
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+from .sqlite_helpers import connect
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class JarManifest:
+    """SQLite-backed record of each ingested JAR's fingerprint and chunk IDs.
+    
+    It doubles as the catalog of ingested JARs, so listing JARs and deleting
+    a JAR's chunks never has to scan the vector database.
+    
+    A JAR is identified by its file name, which must be unique across the
+    knowledge base: chunk IDs and the ``jar_file`` metadata are derived
+    from it too, so ingesting another JAR of the same name from a different
+    directory replaces the first one (a warning is logged). The path it was
+    last ingested from is kept for that check. Its content hash decides
+    whether a re-ingestion can be skipped; the file size and modification
+    time are kept as well so that an untouched file is recognised without
+    hashing it.
+    
+    Each chunk is recorded with its source file and a fingerprint of its
+    stored data, so a changed JAR can be re-ingested as a per-file delta.
+    """
+    
+    # Columns selected for a JAR entry, in the order ``_entry_from_row`` expects
+    _ENTRY_COLUMNS = "jar_name, content_hash, size_bytes, ingested_at, chunk_count"
+    
+    def __init__(self, db_path: Path):
+        """Open (or create) the manifest database."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jars (
+                    jar_name TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    ingested_at REAL NOT NULL,
+                    chunk_count INTEGER NOT NULL DEFAULT 0,
+                    jar_path TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jar_chunks (
+                    jar_name TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    source_file TEXT NOT NULL DEFAULT '',
+                    fingerprint TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (jar_name, chunk_id)
+                )
+            """)
+            
+            # Manifests written before per-chunk fingerprints lack the columns;
+            # their chunks simply count as changed on the next ingestion.
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jar_chunks)")}
+            for column in ("source_file", "fingerprint"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jar_chunks ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+            
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jars)")}
+            if "chunk_count" not in columns:
+                conn.execute("ALTER TABLE jars ADD COLUMN chunk_count INTEGER NOT NULL DEFAULT 0")
+                conn.execute("""
+                    UPDATE jars SET chunk_count = (
+                        SELECT COUNT(*) FROM jar_chunks WHERE jar_chunks.jar_name = jars.jar_name
+                    )
+                """)
+            if "jar_path" not in columns:
+                conn.execute("ALTER TABLE jars ADD COLUMN jar_path TEXT NOT NULL DEFAULT ''")
+    
+    @staticmethod
+    def fingerprint(jar_path: Path) -> str:
+        """Compute the SHA-256 content hash of a JAR file."""
+        digest = hashlib.sha256()
+        with open(jar_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    @classmethod
+    def snapshot(cls, jar_path: Path) -> Tuple[str, int, int]:
+        """Return the content hash, size and modification time of a JAR file.
+        
+        Taken before a JAR is read for ingestion and passed to ``record``, so
+        a file that changes while it is being ingested is not recorded as
+        ingested with its new content.
+        """
+        stat = jar_path.stat()
+        return cls.fingerprint(jar_path), stat.st_size, stat.st_mtime_ns
+    
+    def is_unchanged(self, jar_path: Path) -> bool:
+        """Check whether a JAR was already ingested with identical content."""
+        with closing(connect(self.db_path)) as conn:
+            row = conn.execute(
+                "SELECT content_hash, size_bytes, mtime_ns FROM jars WHERE jar_name = ?",
+                (jar_path.name,)
+            ).fetchone()
+        
+        if row is None or not jar_path.exists():
+            return False
+        
+        content_hash, size_bytes, mtime_ns = row
+        stat = jar_path.stat()
+        if stat.st_size == size_bytes and stat.st_mtime_ns == mtime_ns:
+            return True
+        
+        if stat.st_size != size_bytes or self.fingerprint(jar_path) != content_hash:
+            return False
+        
+        # Same content with a new timestamp (e.g. re-downloaded); remember the
+        # new timestamp so the next check does not need to hash again.
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute(
+                "UPDATE jars SET mtime_ns = ? WHERE jar_name = ?",
+                (stat.st_mtime_ns, jar_path.name)
+            )
+        return True
+    
+    def get_chunk_ids(self, jar_name: str) -> List[str]:
+        """Return the chunk IDs recorded for a JAR."""
+        with closing(connect(self.db_path)) as conn:
+            rows = conn.execute(
+                "SELECT chunk_id FROM jar_chunks WHERE jar_name = ?", (jar_name,)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def get_chunk_fingerprints(self, jar_name: str) -> Dict[str, Dict[str, str]]:
+        """Return a JAR's recorded chunks as ``{source_file: {chunk_id: fingerprint}}``."""
+        with closing(connect(self.db_path)) as conn:
+            rows = conn.execute(
+                "SELECT source_file, chunk_id, fingerprint FROM jar_chunks WHERE jar_name = ?",
+                (jar_name,)
+            ).fetchall()
+        
+        files = {}
+        for source_file, chunk_id, fingerprint in rows:
+            files.setdefault(source_file, {})[chunk_id] = fingerprint
+        return files
+    
+    def get_entry(self, jar_name: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest entry for a JAR, or None if it was never ingested."""
+        with closing(connect(self.db_path)) as conn:
+            row = conn.execute(
+                f"SELECT {self._ENTRY_COLUMNS} FROM jars WHERE jar_name = ?",
+                (jar_name,)
+            ).fetchone()
+        
+        return self._entry_from_row(row) if row is not None else None
+    
+    def list_jars(self) -> Dict[str, Dict[str, Any]]:
+        """Return the entries of all ingested JARs keyed by JAR name."""
+        with closing(connect(self.db_path)) as conn:
+            rows = conn.execute(f"SELECT {self._ENTRY_COLUMNS} FROM jars").fetchall()
+        
+        return {row[0]: self._entry_from_row(row) for row in rows}
+    
+    @staticmethod
+    def _entry_from_row(row: Tuple) -> Dict[str, Any]:
+        """Convert a row selected with ``_ENTRY_COLUMNS`` to an entry dict."""
+        return {
+            "jar_name": row[0],
+            "content_hash": row[1],
+            "size_bytes": row[2],
+            "ingested_at": row[3],
+            "chunk_count": row[4]
+        }
+    
+    def record(self,
+               jar_path: Path,
+               chunks: Iterable[Tuple[str, str, str]],
+               snapshot: Tuple[str, int, int]) -> None:
+        """Record a successful ingestion, replacing any previous entry.
+        
+        ``chunks`` holds a ``(chunk_id, source_file, fingerprint)`` tuple for
+        every chunk the JAR now has in the knowledge base, and ``snapshot``
+        is what ``snapshot`` returned before the JAR was read.
+        """
+        chunks = list(chunks)
+        content_hash, size_bytes, mtime_ns = snapshot
+        resolved_path = str(jar_path.resolve())
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            row = conn.execute("SELECT jar_path FROM jars WHERE jar_name = ?", (jar_path.name,)).fetchone()
+            if row and row[0] and row[0] != resolved_path:
+                logger.warning(
+                    f"{jar_path.name} from {resolved_path} replaces the JAR of the same name from {row[0]}; "
+                    "JAR file names must be unique"
+                )
+            
+            conn.execute("DELETE FROM jar_chunks WHERE jar_name = ?", (jar_path.name,))
+            conn.execute(
+                "INSERT OR REPLACE INTO jars "
+                "(jar_name, content_hash, size_bytes, mtime_ns, ingested_at, chunk_count, jar_path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (jar_path.name, content_hash, size_bytes, mtime_ns, time.time(), len(chunks), resolved_path)
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO jar_chunks (jar_name, chunk_id, source_file, fingerprint) VALUES (?, ?, ?, ?)",
+                ((jar_path.name, *chunk) for chunk in chunks)
+            )
+        
+        logger.debug(f"Recorded {len(chunks)} chunks for {jar_path.name} in manifest")
+    
+    def remove(self, jar_name: str) -> None:
+        """Forget a JAR."""
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM jar_chunks WHERE jar_name = ?", (jar_name,))
+            conn.execute("DELETE FROM jars WHERE jar_name = ?", (jar_name,))
+    
+    def clear(self) -> None:
+        """Forget every JAR, e.g. after the collection was reset."""
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM jar_chunks")
+            conn.execute("DELETE FROM jars")
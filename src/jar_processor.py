@@ -1,11 +1,18 @@
 """JAR file processor for extracting Java source files."""
 
+import argparse
 import logging
-import shutil
-import tempfile
+import multiprocessing
+import multiprocessing.pool
+import queue
+import sys
+import threading
+import time
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Generator
+from typing import List, Dict, Any, Iterator, Optional
 
 from .config import settings
 from .java_parser import JavaParser, CodeChunk
@@ -13,16 +20,66 @@ from .java_parser import JavaParser, CodeChunk
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Parser owned by each worker process of the parallel parsing pool, and the
+# queue on which it reports when it starts each file
+_worker_parser: Optional[JavaParser] = None
+_worker_started = None
+
+def _init_parse_worker(started) -> None:
+    """Create the per-process Java parser for a parsing pool worker."""
+    global _worker_parser, _worker_started
+    _worker_parser = JavaParser()
+    _worker_started = started
+
+def _parse_source_in_worker(index: int, source: bytes, source_file: str) -> List[CodeChunk]:
+    """Parse one Java source inside a parsing pool worker."""
+    _worker_started.put((index, time.time()))
+    return _worker_parser.parse_java_code(source, source_file)
+
 class JarProcessor:
     """Processor for handling JAR files and extracting Java source code."""
     
-    def __init__(self):
-        """Initialize the JAR processor."""
+    def __init__(self, parse_workers: Optional[int] = None, parse_timeout: Optional[float] = None):
+        """Initialize the JAR processor.
+        
+        Args:
+            parse_workers: Number of processes used to parse Java files. Values
+                above 1 enable the parallel parsing mode. Defaults to
+                ``settings.parse_workers``.
+            parse_timeout: Seconds to wait for a single file in parallel mode
+                before skipping it. Defaults to ``settings.parse_timeout``.
+        """
         self.java_parser = JavaParser()
-        self.temp_dir = settings.temp_dir
+        self.parse_workers = parse_workers if parse_workers is not None else settings.parse_workers
+        self.parse_timeout = parse_timeout if parse_timeout is not None else settings.parse_timeout
+        self._parse_pool = None
+        self._parse_started = None
+    
+    @contextmanager
+    def open_jar(self, jar_path: Path) -> Iterator[Optional[zipfile.ZipFile]]:
+        """Open a JAR once so validation, parsing and metadata share one handle.
+        
+        Yields ``None`` if the file cannot be opened; the other methods then
+        fall back to opening the JAR themselves and report the error.
+        """
+        try:
+            jar_file = zipfile.ZipFile(jar_path, 'r')
+        except Exception as e:
+            logger.debug(f"Could not open JAR file {jar_path}: {e}")
+            yield None
+            return
+        
+        with jar_file:
+            yield jar_file
     
-    def process_jar_file(self, jar_path: Path) -> List[CodeChunk]:
-        """Process a single JAR file and extract code chunks."""
+    def process_jar_file(self, jar_path: Path, jar_file: Optional[zipfile.ZipFile] = None) -> List[CodeChunk]:
+        """Process a single JAR file and extract code chunks.
+        
+        Java sources are streamed straight out of the archive without being
+        extracted to disk, and each chunk's ``source_file`` is the path of its
+        entry inside the JAR. The JAR's file name is recorded in each chunk's
+        ``jar_file`` metadata.
+        """
         logger.info(f"Processing JAR file: {jar_path}")
         
         if not jar_path.exists():
@@ -34,21 +91,29 @@ class JarProcessor:
         
         chunks = []
         
-        # Create a temporary directory for extraction
-        with tempfile.TemporaryDirectory(dir=self.temp_dir) as temp_extract_dir:
-            try:
-                # Extract JAR file
-                extracted_files = self._extract_jar(jar_path, Path(temp_extract_dir))
+        try:
+            with self._jar_handle(jar_path, jar_file) as jar:
+                java_entries = self._java_entries(jar)
                 
                 # Process each Java file
-                for java_file in extracted_files:
-                    file_chunks = self.java_parser.parse_file(java_file)
-                    chunks.extend(file_chunks)
-                
-                logger.info(f"Extracted {len(chunks)} code chunks from {jar_path}")
-                
-            except Exception as e:
-                logger.error(f"Error processing JAR file {jar_path}: {e}")
+                if self.parse_workers > 1 and len(java_entries) > 1:
+                    chunks = self._parse_entries_parallel(jar, java_entries)
+                else:
+                    for entry_name in java_entries:
+                        file_chunks = self.java_parser.parse_java_code(jar.read(entry_name), entry_name)
+                        chunks.extend(file_chunks)
+            
+            # Tag every chunk with the JAR it came from
+            jar_name = sys.intern(jar_path.name)
+            for chunk in chunks:
+                chunk.metadata['jar_file'] = jar_name
+            
+            logger.info(f"Extracted {len(chunks)} code chunks from {jar_path}")
+        
+        except zipfile.BadZipFile:
+            logger.error(f"Invalid ZIP/JAR file: {jar_path}")
+        except Exception as e:
+            logger.error(f"Error processing JAR file {jar_path}: {e}")
         
         return chunks
     
@@ -76,30 +141,134 @@ class JarProcessor:
         logger.info(f"Total extracted chunks: {len(all_chunks)}")
         return all_chunks
     
-    def _extract_jar(self, jar_path: Path, extract_dir: Path) -> List[Path]:
-        """Extract JAR file and return list of Java files."""
-        java_files = []
+    def _parse_entries_parallel(self, jar_file: zipfile.ZipFile, java_entries: List[str]) -> List[CodeChunk]:
+        """Parse JAR entries on the worker pool, keeping the serial chunk order.
         
-        try:
-            with zipfile.ZipFile(jar_path, 'r') as jar_file:
-                # Extract all files
-                jar_file.extractall(extract_dir)
-                
-                # Find all Java files
-                for java_file in extract_dir.rglob('*.java'):
-                    if java_file.is_file():
-                        java_files.append(java_file)
-                
-                logger.debug(f"Extracted {len(java_files)} Java files from {jar_path}")
-                
-        except zipfile.BadZipFile:
-            logger.error(f"Invalid ZIP/JAR file: {jar_path}")
-        except Exception as e:
-            logger.error(f"Error extracting JAR file {jar_path}: {e}")
+        Workers report when they start each file, and ``parse_timeout``
+        counts from then, so neither pool startup nor time spent queued
+        behind other files counts against it. A file that does not finish in
+        time is skipped: the pool is torn down at once, so the stuck worker
+        cannot hold up other files, and the files in flight alongside it are
+        resubmitted to a fresh pool. Results are put back in entry order, so
+        the output matches the serial path.
+        """
+        results: Dict[int, List[CodeChunk]] = {}
+        in_flight = {}  # entry index -> async result
+        deadlines = {}  # entry index -> deadline, once a worker has started it
+        remaining = list(range(len(java_entries)))
+        remaining.reverse()
+        finished = threading.Event()
         
-        return java_files
+        while remaining or in_flight:
+            # Cleared before checking, so a result arriving meanwhile still
+            # ends the wait below at once
+            finished.clear()
+            
+            for index, result in list(in_flight.items()):
+                if result.ready():
+                    del in_flight[index]
+                    deadlines.pop(index, None)
+                    try:
+                        results[index] = result.get()
+                    except Exception as e:
+                        logger.error(f"Error parsing file {java_entries[index]}: {e}")
+            
+            while in_flight:
+                try:
+                    index, started = self._parse_started.get_nowait()
+                except queue.Empty:
+                    break
+                if index in in_flight:
+                    deadlines[index] = started + self.parse_timeout
+            
+            now = time.time()
+            expired = [index for index, deadline in deadlines.items() if deadline <= now]
+            if expired:
+                for index in expired:
+                    del in_flight[index]
+                    logger.error(f"Timed out parsing {java_entries[index]} after {self.parse_timeout}s, skipping")
+                self.close()
+                remaining.extend(sorted(in_flight, reverse=True))
+                in_flight.clear()
+                deadlines.clear()
+            
+            while remaining and len(in_flight) < self.parse_workers:
+                index = remaining.pop()
+                entry_name = java_entries[index]
+                in_flight[index] = self._pool().apply_async(
+                    _parse_source_in_worker,
+                    (index, jar_file.read(entry_name), entry_name),
+                    callback=lambda _: finished.set(),
+                    error_callback=lambda _: finished.set()
+                )
+            
+            if in_flight:
+                # Start reports do not set the event, so poll for them until
+                # every file in flight has a deadline
+                wait = min(deadlines.values(), default=now + self.parse_timeout) - time.time()
+                if len(deadlines) < len(in_flight):
+                    wait = min(wait, 0.1)
+                finished.wait(max(0.0, wait))
+        
+        return [chunk for index in sorted(results) for chunk in results[index]]
     
-    def get_jar_metadata(self, jar_path: Path) -> dict:
+    def _pool(self) -> multiprocessing.pool.Pool:
+        """Return the parsing worker pool, starting it if needed.
+        
+        Workers are not forked from the ingesting process, which may already
+        run other threads whose locks a child would inherit. Where available
+        they come from a fork server that has imported this module once, so
+        a pool restarted after a timeout starts quickly; otherwise they are
+        spawned.
+        """
+        if self._parse_pool is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context("spawn")
+            self._parse_started = context.Queue()
+            self._parse_pool = context.Pool(
+                processes=self.parse_workers,
+                initializer=_init_parse_worker,
+                initargs=(self._parse_started,)
+            )
+        return self._parse_pool
+    
+    def close(self) -> None:
+        """Shut down the parsing worker pool, if one was started."""
+        if self._parse_pool is not None:
+            self._parse_pool.terminate()
+            self._parse_pool.join()
+            self._parse_pool = None
+            self._parse_started.close()
+            self._parse_started = None
+    
+    def __enter__(self) -> "JarProcessor":
+        """Use the processor in a ``with`` block that closes its pool."""
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        """Shut down the parsing worker pool."""
+        self.close()
+    
+    @contextmanager
+    def _jar_handle(self, jar_path: Path, jar_file: Optional[zipfile.ZipFile]) -> Iterator[zipfile.ZipFile]:
+        """Yield the caller's open JAR, or open (and later close) one ourselves."""
+        if jar_file is not None:
+            yield jar_file
+        else:
+            with zipfile.ZipFile(jar_path, 'r') as opened:
+                yield opened
+    
+    def _java_entries(self, jar_file: zipfile.ZipFile) -> List[str]:
+        """Return the names of all Java source entries in an open JAR."""
+        return [
+            info.filename for info in jar_file.infolist()
+            if info.filename.endswith('.java') and not info.is_dir()
+        ]
+    
+    def get_jar_metadata(self, jar_path: Path, jar_file: Optional[zipfile.ZipFile] = None) -> dict:
         """Extract metadata from JAR file."""
         metadata = {
             'jar_name': jar_path.name,
@@ -110,30 +279,29 @@ class JarProcessor:
         }
         
         try:
-            with zipfile.ZipFile(jar_path, 'r') as jar_file:
+            with self._jar_handle(jar_path, jar_file) as jar:
                 # Count Java files
-                java_files = [name for name in jar_file.namelist() if name.endswith('.java')]
-                metadata['java_file_count'] = len(java_files)
+                metadata['java_file_count'] = len(self._java_entries(jar))
                 
                 # Extract manifest information
                 try:
-                    manifest_content = jar_file.read('META-INF/MANIFEST.MF').decode('utf-8')
+                    manifest_content = jar.read('META-INF/MANIFEST.MF').decode('utf-8')
                     manifest_lines = manifest_content.strip().split('\n')
                     
                     for line in manifest_lines:
                         if ':' in line:
                             key, value = line.split(':', 1)
                             metadata['manifest_info'][key.strip()] = value.strip()
-                            
+                
                 except KeyError:
                     logger.debug(f"No manifest found in {jar_path}")
-                
+        
         except Exception as e:
             logger.error(f"Error reading JAR metadata from {jar_path}: {e}")
         
         return metadata
     
-    def validate_jar_file(self, jar_path: Path) -> bool:
+    def validate_jar_file(self, jar_path: Path, jar_file: Optional[zipfile.ZipFile] = None) -> bool:
         """Validate that a JAR file is a valid sources JAR."""
         if not jar_path.exists():
             logger.error(f"JAR file does not exist: {jar_path}")
@@ -144,9 +312,9 @@ class JarProcessor:
             return False
         
         try:
-            with zipfile.ZipFile(jar_path, 'r') as jar_file:
+            with self._jar_handle(jar_path, jar_file) as jar:
                 # Check if it contains Java files
-                java_files = [name for name in jar_file.namelist() if name.endswith('.java')]
+                java_files = self._java_entries(jar)
                 
                 if not java_files:
                     logger.warning(f"No Java files found in {jar_path}")
@@ -154,7 +322,7 @@ class JarProcessor:
                 
                 logger.info(f"Valid sources JAR: {jar_path} ({len(java_files)} Java files)")
                 return True
-                
+        
         except zipfile.BadZipFile:
             logger.error(f"Invalid ZIP/JAR file: {jar_path}")
             return False
@@ -162,16 +330,92 @@ class JarProcessor:
             logger.error(f"Error validating JAR file {jar_path}: {e}")
             return False
     
-    def list_jar_contents(self, jar_path: Path) -> List[str]:
+    def list_jar_contents(self, jar_path: Path, jar_file: Optional[zipfile.ZipFile] = None) -> List[str]:
         """List all Java files in a JAR."""
         java_files = []
         
         try:
-            with zipfile.ZipFile(jar_path, 'r') as jar_file:
-                java_files = [name for name in jar_file.namelist() if name.endswith('.java')]
-                java_files.sort()
-                
+            with self._jar_handle(jar_path, jar_file) as jar:
+                java_files = sorted(self._java_entries(jar))
+        
         except Exception as e:
             logger.error(f"Error listing JAR contents {jar_path}: {e}")
         
-        return java_files
\ No newline at end of file
+        return java_files
+
+def _peak_rss_mib() -> float:
+    """Return the peak resident set size of this process in MiB."""
+    import resource
+    
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def _own_chunk(chunk: CodeChunk) -> CodeChunk:
+    """Copy a chunk into one that owns its content and metadata lists."""
+    return CodeChunk(
+        content=chunk.content,
+        source_file=chunk.source_file,
+        class_name=chunk.class_name,
+        method_name=chunk.method_name,
+        start_line=chunk.start_line,
+        end_line=chunk.end_line,
+        chunk_type=chunk.chunk_type,
+        metadata={key: list(value) if isinstance(value, tuple) else value for key, value in chunk.metadata.items()}
+    )
+
+def _hold_chunks(jar_paths: List[Path], chunk_count: int, compact: bool) -> Dict[str, Any]:
+    """Extract JARs, cycling through them, until ``chunk_count`` chunks are held in memory."""
+    processor = JarProcessor(parse_workers=1)
+    baseline = _peak_rss_mib()
+    chunks = []
+    
+    while len(chunks) < chunk_count:
+        extracted_any = False
+        for jar_path in jar_paths:
+            extracted = processor.process_jar_file(jar_path)
+            chunks.extend(extracted if compact else map(_own_chunk, extracted))
+            extracted_any = extracted_any or bool(extracted)
+            if len(chunks) >= chunk_count:
+                break
+        if not extracted_any:
+            break
+    
+    return {
+        "chunks": len(chunks),
+        "baseline_rss_mib": baseline,
+        "peak_rss_mib": _peak_rss_mib()
+    }
+
+def benchmark_chunk_memory(jar_paths: List[Path], chunk_count: int = 100000) -> Dict[str, Dict[str, Any]]:
+    """Compare peak RSS of holding compact chunks against chunks that own their content.
+    
+    Each variant runs in a fresh process, so their peaks do not mix.
+    """
+    report = {}
+    for variant, compact in (("owned", False), ("compact", True)):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            report[variant] = executor.submit(_hold_chunks, jar_paths, chunk_count, compact).result()
+        logger.info(f"{variant}: {report[variant]}")
+    return report
+
+def main() -> None:
+    """Report the peak memory of holding extracted chunks."""
+    parser = argparse.ArgumentParser(description="Measure peak RSS of holding extracted code chunks in memory")
+    parser.add_argument(
+        "jars", type=Path, nargs="+", help="Sources JARs, extracted repeatedly until enough chunks are held"
+    )
+    parser.add_argument("--chunks", type=int, default=100000)
+    args = parser.parse_args()
+    
+    report = benchmark_chunk_memory(args.jars, args.chunks)
+    
+    print(f"{'variant':<10}{'chunks':>10}{'baseline MiB':>14}{'peak MiB':>12}{'held MiB':>12}")
+    for variant, result in report.items():
+        print(
+            f"{variant:<10}{result['chunks']:>10}{result['baseline_rss_mib']:>14.1f}"
+            f"{result['peak_rss_mib']:>12.1f}{result['peak_rss_mib'] - result['baseline_rss_mib']:>12.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
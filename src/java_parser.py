@@ -1,33 +1,150 @@
 """Java code parser using Tree-sitter for intelligent code chunking."""
 
+import argparse
 import logging
+import re
+import sys
+import time
+import zipfile
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple, Union
 
 import tree_sitter
-from tree_sitter import Language, Parser
+from tree_sitter import Language, Parser, Query
+
+try:
+    from tree_sitter import QueryCursor
+except ImportError:  # tree-sitter < 0.25 runs captures on the Query itself
+    QueryCursor = None
+
+from .config import settings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
 class CodeChunk:
-    """Represents a semantic chunk of Java code."""
-    content: str
-    source_file: str
-    class_name: Optional[str]
-    method_name: Optional[str]
-    start_line: int
-    end_line: int
-    chunk_type: str  # 'method', 'class', 'interface', 'field'
-    metadata: Dict[str, Any]
+    """Represents a semantic chunk of Java code.
+    
+    Ingestion holds many chunks at once, so they are kept compact:
+    attributes live in ``__slots__``, names are interned so that chunks
+    share them, and a chunk parsed from a file stores only a byte range of
+    that file's source buffer, which all chunks of the file share.
+    ``content`` is decoded from the buffer each time it is read.
+    """
+    
+    __slots__ = ('_content', '_source', '_start_byte', '_end_byte', 'source_file', 'class_name',
+                 'method_name', 'start_line', 'end_line', 'chunk_type', 'metadata')
+    
+    def __init__(self,
+                 content: Optional[str],
+                 source_file: str,
+                 class_name: Optional[str],
+                 method_name: Optional[str],
+                 start_line: int,
+                 end_line: int,
+                 chunk_type: str,  # 'method', 'class', 'interface', 'field'
+                 metadata: Dict[str, Any]):
+        """Create a chunk that owns its ``content``."""
+        self._content = content
+        self._source = None
+        self._start_byte = 0
+        self._end_byte = 0
+        self.source_file = sys.intern(source_file)
+        self.class_name = sys.intern(class_name) if class_name else class_name
+        self.method_name = sys.intern(method_name) if method_name else method_name
+        self.start_line = start_line
+        self.end_line = end_line
+        self.chunk_type = sys.intern(chunk_type)
+        self.metadata = metadata
+    
+    @classmethod
+    def from_source(cls, source: bytes, start_byte: int, end_byte: int, **fields) -> 'CodeChunk':
+        """Create a chunk whose content is a byte range of a shared UTF-8 source buffer."""
+        chunk = cls(content=None, **fields)
+        chunk._source = source
+        chunk._start_byte = start_byte
+        chunk._end_byte = end_byte
+        return chunk
+    
+    @property
+    def content(self) -> str:
+        """The chunk's code."""
+        if self._source is None:
+            return self._content
+        return str(memoryview(self._source)[self._start_byte:self._end_byte], 'utf-8', 'replace')
+    
+    @content.setter
+    def content(self, content: str) -> None:
+        """Replace the content, detaching the chunk from its source buffer."""
+        self._content = content
+        self._source = None
+    
+    def _fields(self) -> tuple:
+        """Return the values that make two chunks equal."""
+        return (self.content, self.source_file, self.class_name, self.method_name,
+                self.start_line, self.end_line, self.chunk_type, self.metadata)
+    
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, CodeChunk):
+            return NotImplemented
+        return self._fields() == other._fields()
+    
+    def __repr__(self) -> str:
+        return (f"CodeChunk(source_file={self.source_file!r}, class_name={self.class_name!r}, "
+                f"method_name={self.method_name!r}, start_line={self.start_line}, "
+                f"end_line={self.end_line}, chunk_type={self.chunk_type!r})")
+
+# Declarations that become chunks, and the other type declarations that only
+# scope qualified names. Matching them with a query lets tree-sitter walk the
+# tree in C instead of recursing through every node in Python.
+DECLARATION_QUERY = """
+[
+  (class_declaration)
+  (interface_declaration)
+  (method_declaration)
+  (field_declaration)
+  (enum_declaration)
+  (record_declaration)
+  (annotation_type_declaration)
+] @declaration
+"""
+
+_SCOPE_DECLARATIONS = frozenset(['enum_declaration', 'record_declaration', 'annotation_type_declaration'])
+_TYPE_DECLARATIONS = _SCOPE_DECLARATIONS | {'class_declaration', 'interface_declaration'}
+
+# Words and single punctuation marks, a tokenizer-independent proxy for
+# the number of model tokens in a piece of code
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Whitespace trimmed from the ends of chunk spans, as byte values
+_WHITESPACE = frozenset(b' \t\n\r\x0b\x0c')
+
+def estimate_tokens(text: str) -> int:
+    """Estimate how many tokens a piece of code is."""
+    return len(_TOKEN_PATTERN.findall(text))
 
 class JavaParser:
-    """Parser for Java source code using Tree-sitter."""
+    """Parser for Java source code using Tree-sitter.
+    
+    Chunks are kept within a token budget: a declaration longer than
+    ``max_tokens`` is split at statement or member boundaries into parts
+    that link back to it, and runs of adjacent field declarations shorter
+    than ``min_tokens`` in the same class are merged into one chunk.
+    Tokens are counted with ``estimate_tokens``.
+    """
     
-    def __init__(self):
-        """Initialize the Java parser."""
+    def __init__(self, max_tokens: Optional[int] = None, min_tokens: Optional[int] = None):
+        """Initialize the Java parser.
+        
+        Args:
+            max_tokens: Token budget of a chunk. Defaults to
+                ``settings.chunk_max_tokens``.
+            min_tokens: Fields shorter than this are merged with their
+                neighbours. Defaults to ``settings.chunk_min_tokens``.
+        """
+        self.max_tokens = max_tokens if max_tokens is not None else settings.chunk_max_tokens
+        self.min_tokens = min_tokens if min_tokens is not None else settings.chunk_min_tokens
+        
         try:
             # Try to use tree-sitter-java installed via pip
             import tree_sitter_java as tsjava
@@ -47,88 +164,251 @@ class JavaParser:
         
         self.parser = Parser()
         self.parser.language = self.java_language
+        self.declaration_query = Query(self.java_language, DECLARATION_QUERY)
+        self._shared_values = {}  # modifier tuples shared between chunks
     
     def parse_file(self, file_path: Path) -> List[CodeChunk]:
         """Parse a Java file and extract semantic chunks."""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                source_code = f.read()
-            
-            return self.parse_java_code(source_code, str(file_path))
-            
+            return self.parse_java_code(Path(file_path).read_bytes(), str(file_path))
+        
         except Exception as e:
             logger.error(f"Error parsing file {file_path}: {e}")
             return []
     
-    def parse_java_code(self, source_code: str, file_path: str) -> List[CodeChunk]:
-        """Parse Java source code and extract semantic chunks."""
+    def parse_java_code(self, source_code: Union[str, bytes], file_path: str) -> List[CodeChunk]:
+        """Parse Java source code and extract semantic chunks.
+        
+        ``source_code`` is best passed as the raw UTF-8 bytes of a file, e.g.
+        read straight out of a JAR: tree-sitter parses the bytes as they are,
+        chunk text is sliced out of them by byte offset and only each
+        chunk's own text is decoded. Newlines are normalised the same way as
+        when reading a file in text mode.
+        """
         try:
-            tree = self.parser.parse(bytes(source_code, 'utf8'))
+            if isinstance(source_code, str):
+                source_code = source_code.encode('utf-8')
+            if b'\r' in source_code:
+                source_code = source_code.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            
+            tree = self.parser.parse(source_code)
             chunks = []
             
-            # Extract chunks from the syntax tree
-            self._extract_chunks(tree.root_node, source_code, file_path, chunks)
+            # Extract chunks from the syntax tree; a memoryview slices the
+            # source without copying it
+            self._extract_chunks(tree.root_node, memoryview(source_code), file_path, chunks)
             
             return chunks
-            
+        
         except Exception as e:
             logger.error(f"Error parsing Java code: {e}")
             return []
     
-    def _extract_chunks(self, node, source_code: str, file_path: str, chunks: List[CodeChunk]):
-        """Recursively extract code chunks from the syntax tree."""
-        lines = source_code.split('\n')
+    def _extract_chunks(self, node, source: memoryview, file_path: str, chunks: List[CodeChunk]):
+        """Extract code chunks from the syntax tree in a single pass.
         
-        # Handle different node types
-        if node.type == 'method_declaration':
-            chunk = self._create_method_chunk(node, source_code, file_path, lines)
-            if chunk:
-                chunks.append(chunk)
+        Declarations are visited in document order, which matches a pre-order
+        walk of the tree. A stack of enclosing type declarations replaces the
+        per-node walk up the parent chain. Every chunk records the file's
+        ``package`` and the ``qualified_class`` it declares or belongs to.
+        """
+        package = self._find_package(node, source)
+        type_stack = []  # (end_byte, name, is_class) of enclosing type declarations
+        small_fields = []  # (node, chunk) of adjacent small fields waiting to be merged
         
-        elif node.type == 'class_declaration':
-            chunk = self._create_class_chunk(node, source_code, file_path, lines)
+        for decl in self._find_declarations(node):
+            while type_stack and type_stack[-1][0] <= decl.start_byte:
+                type_stack.pop()
+            containing_class = next((name for _, name, is_class in reversed(type_stack) if is_class), None)
+            
+            if decl.type in _TYPE_DECLARATIONS:
+                type_stack.append(
+                    (decl.end_byte, self._find_class_name(decl, source), decl.type == 'class_declaration')
+                )
+            names = [name or '' for _, name, _ in type_stack]
+            qualified_class = sys.intern(".".join([package, *names] if package else names))
+            
+            if decl.type == 'method_declaration':
+                chunk = self._create_method_chunk(decl, source, file_path, containing_class)
+            elif decl.type == 'class_declaration':
+                chunk = self._create_class_chunk(decl, source, file_path)
+            elif decl.type == 'interface_declaration':
+                chunk = self._create_interface_chunk(decl, source, file_path)
+            elif decl.type in _SCOPE_DECLARATIONS:
+                chunk = None
+            else:
+                chunk = self._create_field_chunk(decl, source, file_path, containing_class)
+            
             if chunk:
-                chunks.append(chunk)
-        
-        elif node.type == 'interface_declaration':
-            chunk = self._create_interface_chunk(node, source_code, file_path, lines)
+                chunk.metadata.update(package=package, qualified_class=qualified_class)
+            
+            if chunk and chunk.chunk_type == 'field' and estimate_tokens(chunk.content) < self.min_tokens:
+                if small_fields and not self._can_merge_field(small_fields, chunk):
+                    chunks.extend(self._merge_fields(small_fields, source))
+                    small_fields = []
+                small_fields.append((decl, chunk))
+                continue
+            
+            # Any other declaration ends the run of small fields
+            chunks.extend(self._merge_fields(small_fields, source))
+            small_fields = []
+            
             if chunk:
-                chunks.append(chunk)
+                chunks.extend(self._split_oversized(decl, chunk, source))
         
-        elif node.type == 'field_declaration':
-            chunk = self._create_field_chunk(node, source_code, file_path, lines)
-            if chunk:
-                chunks.append(chunk)
+        chunks.extend(self._merge_fields(small_fields, source))
+    
+    def _find_package(self, root, source: memoryview) -> str:
+        """Return the name in the file's package declaration, or '' for the default package."""
+        for child in root.children:
+            if child.type == 'package_declaration':
+                for name in child.children:
+                    if name.type in ('scoped_identifier', 'identifier'):
+                        return sys.intern(''.join(self._get_node_text(name, source).split()))
+        return ''
+    
+    def _can_merge_field(self, small_fields: List[Any], chunk: CodeChunk) -> bool:
+        """Whether a small field can join the pending run without breaking the budget."""
+        run_tokens = sum(estimate_tokens(field.content) for _, field in small_fields)
+        return (
+            small_fields[0][1].metadata['qualified_class'] == chunk.metadata['qualified_class']
+            and run_tokens + estimate_tokens(chunk.content) <= self.max_tokens
+        )
+    
+    def _merge_fields(self, small_fields: List[Any], source: memoryview) -> List[CodeChunk]:
+        """Merge a run of adjacent field declarations into one chunk."""
+        if len(small_fields) < 2:
+            return [chunk for _, chunk in small_fields]
         
-        # Recursively process child nodes
-        for child in node.children:
-            self._extract_chunks(child, source_code, file_path, chunks)
+        first_node, first = small_fields[0]
+        last_node, last = small_fields[-1]
+        fields = [chunk for _, chunk in small_fields]
+        names = [chunk.method_name for chunk in fields if chunk.method_name]
+        
+        metadata = {
+            'fields': tuple(names),
+            'modifiers': self._share(dict.fromkeys(m for chunk in fields for m in chunk.metadata['modifiers'])),
+            'type': tuple(dict.fromkeys(chunk.metadata['type'] for chunk in fields if chunk.metadata['type'])),
+            'annotations': tuple(a for chunk in fields for a in chunk.metadata['annotations']),
+            'package': first.metadata['package'],
+            'qualified_class': first.metadata['qualified_class']
+        }
+        
+        return [CodeChunk.from_source(
+            source.obj, first_node.start_byte, last_node.end_byte,
+            source_file=first.source_file,
+            class_name=first.class_name,
+            method_name=", ".join(names) or None,
+            start_line=first.start_line,
+            end_line=last.end_line,
+            chunk_type='field',
+            metadata=metadata
+        )]
+    
+    def _split_oversized(self, node, chunk: CodeChunk, source: memoryview) -> List[CodeChunk]:
+        """Split a chunk over the token budget at statement or member boundaries.
+        
+        The parts cover the declaration's text without gaps or overlap; the
+        first keeps the signature and the last the closing brace. Each part
+        records its position and the line span of the whole declaration.
+        Class chunks only hold the class header and are never split.
+        """
+        if chunk.chunk_type == 'class' or estimate_tokens(chunk.content) <= self.max_tokens:
+            return [chunk]
+        
+        # Group the split units greedily, starting a new part when the next
+        # unit would push the current one over the budget
+        groups = []
+        group_tokens = 0
+        for unit in self._split_units(node, source):
+            tokens = estimate_tokens(self._get_node_text(unit, source))
+            if groups and group_tokens + tokens <= self.max_tokens:
+                groups[-1].append(unit)
+                group_tokens += tokens
+            else:
+                groups.append([unit])
+                group_tokens = tokens
+        
+        if len(groups) < 2:
+            return [chunk]
+        
+        # Parts after the first begin at the start of their first unit's line
+        starts = [node.start_byte] + [self._line_start(group[0].start_byte, source) for group in groups[1:]]
+        ends = starts[1:] + [node.end_byte]
+        start_lines = [chunk.start_line] + [group[0].start_point[0] + 1 for group in groups[1:]]
+        end_lines = [group[-1].end_point[0] + 1 for group in groups[:-1]] + [chunk.end_line]
+        
+        parts = []
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            parts.append(CodeChunk.from_source(
+                source.obj, *self._strip_span(start, end, source, leading=False),
+                source_file=chunk.source_file,
+                class_name=chunk.class_name,
+                method_name=chunk.method_name,
+                start_line=start_lines[i],
+                end_line=end_lines[i],
+                chunk_type=chunk.chunk_type,
+                metadata={
+                    **chunk.metadata,
+                    'part': i + 1,
+                    'parts': len(groups),
+                    'parent_start_line': chunk.start_line,
+                    'parent_end_line': chunk.end_line
+                }
+            ))
+        return parts
+    
+    def _split_units(self, node, source: memoryview) -> List[Any]:
+        """Return the child nodes a declaration may be split between.
+        
+        Children over the budget are broken into their own children, so a
+        huge ``if`` or ``try`` statement is split between the statements of
+        its blocks rather than kept whole.
+        """
+        units = []
+        for child in node.named_children:
+            if child.named_child_count and estimate_tokens(self._get_node_text(child, source)) > self.max_tokens:
+                units.extend(self._split_units(child, source))
+            else:
+                units.append(child)
+        return units
     
-    def _create_method_chunk(self, node, source_code: str, file_path: str, lines: List[str]) -> Optional[CodeChunk]:
+    def _find_declarations(self, node) -> List[Any]:
+        """Return all chunkable declaration nodes under ``node`` in document order."""
+        if QueryCursor is not None:
+            captures = QueryCursor(self.declaration_query).captures(node)
+        else:
+            captures = self.declaration_query.captures(node)
+        
+        if isinstance(captures, dict):
+            declarations = captures.get('declaration', [])
+        else:  # tree-sitter < 0.23 returns (node, capture_name) pairs
+            declarations = [captured for captured, _ in captures]
+        
+        # Ancestors start before their descendants, so sorting by start byte
+        # reproduces pre-order traversal.
+        return sorted(declarations, key=lambda decl: decl.start_byte)
+    
+    def _create_method_chunk(self, node, source: memoryview, file_path: str,
+                             class_name: Optional[str] = None) -> Optional[CodeChunk]:
         """Create a code chunk for a method declaration."""
         try:
             start_line = node.start_point[0] + 1
             end_line = node.end_point[0] + 1
             
-            # Extract method content
-            content = self._get_node_text(node, source_code)
-            
             # Extract method name
-            method_name = self._find_method_name(node)
-            
-            # Find the containing class
-            class_name = self._find_containing_class(node, source_code)
+            method_name = self._find_method_name(node, source)
             
             # Extract additional metadata
             metadata = {
                 'modifiers': self._extract_modifiers(node),
-                'parameters': self._extract_parameters(node),
-                'return_type': self._extract_return_type(node),
-                'annotations': self._extract_annotations(node)
+                'parameters': self._extract_parameters(node, source),
+                'return_type': self._extract_return_type(node, source),
+                'annotations': self._extract_annotations(node, source)
             }
             
-            return CodeChunk(
-                content=content,
+            return CodeChunk.from_source(
+                source.obj, node.start_byte, node.end_byte,
                 source_file=file_path,
                 class_name=class_name,
                 method_name=method_name,
@@ -141,26 +421,26 @@ class JavaParser:
             logger.warning(f"Error creating method chunk: {e}")
             return None
     
-    def _create_class_chunk(self, node, source_code: str, file_path: str, lines: List[str]) -> Optional[CodeChunk]:
+    def _create_class_chunk(self, node, source: memoryview, file_path: str) -> Optional[CodeChunk]:
         """Create a code chunk for a class declaration."""
         try:
             start_line = node.start_point[0] + 1
             end_line = node.end_point[0] + 1
             
             # Extract class content (just the declaration, not the full body)
-            class_header = self._extract_class_header(node, source_code)
+            header_start, header_end = self._class_header_span(node, source)
             
-            class_name = self._find_class_name(node)
+            class_name = self._find_class_name(node, source)
             
             metadata = {
                 'modifiers': self._extract_modifiers(node),
-                'extends': self._extract_extends(node),
-                'implements': self._extract_implements(node),
-                'annotations': self._extract_annotations(node)
+                'extends': self._extract_extends(node, source),
+                'implements': self._extract_implements(node, source),
+                'annotations': self._extract_annotations(node, source)
             }
             
-            return CodeChunk(
-                content=class_header,
+            return CodeChunk.from_source(
+                source.obj, header_start, header_end,
                 source_file=file_path,
                 class_name=class_name,
                 method_name=None,
@@ -173,23 +453,22 @@ class JavaParser:
             logger.warning(f"Error creating class chunk: {e}")
             return None
     
-    def _create_interface_chunk(self, node, source_code: str, file_path: str, lines: List[str]) -> Optional[CodeChunk]:
+    def _create_interface_chunk(self, node, source: memoryview, file_path: str) -> Optional[CodeChunk]:
         """Create a code chunk for an interface declaration."""
         try:
             start_line = node.start_point[0] + 1
             end_line = node.end_point[0] + 1
             
-            content = self._get_node_text(node, source_code)
-            interface_name = self._find_interface_name(node)
+            interface_name = self._find_interface_name(node, source)
             
             metadata = {
                 'modifiers': self._extract_modifiers(node),
-                'extends': self._extract_extends(node),
-                'annotations': self._extract_annotations(node)
+                'extends': self._extract_extends(node, source),
+                'annotations': self._extract_annotations(node, source)
             }
             
-            return CodeChunk(
-                content=content,
+            return CodeChunk.from_source(
+                source.obj, node.start_byte, node.end_byte,
                 source_file=file_path,
                 class_name=interface_name,
                 method_name=None,
@@ -202,24 +481,23 @@ class JavaParser:
             logger.warning(f"Error creating interface chunk: {e}")
             return None
     
-    def _create_field_chunk(self, node, source_code: str, file_path: str, lines: List[str]) -> Optional[CodeChunk]:
+    def _create_field_chunk(self, node, source: memoryview, file_path: str,
+                            class_name: Optional[str] = None) -> Optional[CodeChunk]:
         """Create a code chunk for a field declaration."""
         try:
             start_line = node.start_point[0] + 1
             end_line = node.end_point[0] + 1
             
-            content = self._get_node_text(node, source_code)
-            field_name = self._find_field_name(node)
-            class_name = self._find_containing_class(node, source_code)
+            field_name = self._find_field_name(node, source)
             
             metadata = {
                 'modifiers': self._extract_modifiers(node),
-                'type': self._extract_field_type(node),
-                'annotations': self._extract_annotations(node)
+                'type': self._extract_field_type(node, source),
+                'annotations': self._extract_annotations(node, source)
             }
             
-            return CodeChunk(
-                content=content,
+            return CodeChunk.from_source(
+                source.obj, node.start_byte, node.end_byte,
                 source_file=file_path,
                 class_name=class_name,
                 method_name=field_name,
@@ -232,63 +510,74 @@ class JavaParser:
             logger.warning(f"Error creating field chunk: {e}")
             return None
     
-    def _get_node_text(self, node, source_code: str) -> str:
+    def _get_node_text(self, node, source: memoryview) -> str:
         """Extract text content of a node."""
-        return source_code[node.start_byte:node.end_byte]
+        return str(source[node.start_byte:node.end_byte], 'utf-8', 'replace')
+    
+    def _get_name(self, node, source: memoryview) -> str:
+        """Extract the text of a name-like node, interned so that chunks share it."""
+        return sys.intern(self._get_node_text(node, source))
+    
+    def _share(self, values) -> Tuple[str, ...]:
+        """Return a tuple of values shared by every chunk with the same values."""
+        values = tuple(values)
+        return self._shared_values.setdefault(values, values)
+    
+    def _strip_span(self, start_byte: int, end_byte: int, source: memoryview,
+                    leading: bool = True) -> Tuple[int, int]:
+        """Narrow a span of the source to exclude surrounding whitespace."""
+        text = source.obj
+        while end_byte > start_byte and text[end_byte - 1] in _WHITESPACE:
+            end_byte -= 1
+        while leading and start_byte < end_byte and text[start_byte] in _WHITESPACE:
+            start_byte += 1
+        return start_byte, end_byte
+    
+    def _line_start(self, offset: int, source: memoryview) -> int:
+        """Move an offset back to the start of its line if only indentation precedes it."""
+        line_start = source.obj.rfind(b'\n', 0, offset) + 1
+        return line_start if not bytes(source[line_start:offset]).strip() else offset
     
-    def _find_method_name(self, node) -> Optional[str]:
+    def _find_method_name(self, node, source: memoryview) -> Optional[str]:
         """Find the method name from a method declaration node."""
         for child in node.children:
             if child.type == 'identifier':
-                return child.text.decode('utf-8')
+                return self._get_name(child, source)
         return None
     
-    def _find_class_name(self, node) -> Optional[str]:
+    def _find_class_name(self, node, source: memoryview) -> Optional[str]:
         """Find the class name from a class declaration node."""
         for child in node.children:
             if child.type == 'identifier':
-                return child.text.decode('utf-8')
+                return self._get_name(child, source)
         return None
     
-    def _find_interface_name(self, node) -> Optional[str]:
+    def _find_interface_name(self, node, source: memoryview) -> Optional[str]:
         """Find the interface name from an interface declaration node."""
         for child in node.children:
             if child.type == 'identifier':
-                return child.text.decode('utf-8')
+                return self._get_name(child, source)
         return None
     
-    def _find_field_name(self, node) -> Optional[str]:
+    def _find_field_name(self, node, source: memoryview) -> Optional[str]:
         """Find the field name from a field declaration node."""
         for child in node.children:
             if child.type == 'variable_declarator':
                 for grandchild in child.children:
                     if grandchild.type == 'identifier':
-                        return grandchild.text.decode('utf-8')
+                        return self._get_name(grandchild, source)
         return None
     
-    def _find_containing_class(self, node, source_code: str) -> Optional[str]:
-        """Find the containing class name for a given node."""
-        current = node.parent
-        while current:
-            if current.type == 'class_declaration':
-                return self._find_class_name(current)
-            current = current.parent
-        return None
-    
-    def _extract_class_header(self, node, source_code: str) -> str:
-        """Extract just the class header (declaration line)."""
-        lines = source_code.split('\n')
-        start_line = node.start_point[0]
-        
-        # Find the opening brace
-        for i, child in enumerate(node.children):
+    def _class_header_span(self, node, source: memoryview) -> Tuple[int, int]:
+        """Find the byte span of the class header (everything before the class body)."""
+        for child in node.children:
             if child.type == 'class_body':
-                end_line = child.start_point[0]
-                return '\n'.join(lines[start_line:end_line]).strip()
+                return self._strip_span(node.start_byte, child.start_byte, source)
         
-        return lines[start_line].strip()
+        line_end = source.obj.find(b'\n', node.start_byte, node.end_byte)
+        return self._strip_span(node.start_byte, line_end if line_end >= 0 else node.end_byte, source)
     
-    def _extract_modifiers(self, node) -> List[str]:
+    def _extract_modifiers(self, node) -> Tuple[str, ...]:
         """Extract modifiers (public, private, static, etc.)."""
         modifiers = []
         for child in node.children:
@@ -296,54 +585,126 @@ class JavaParser:
                 for modifier in child.children:
                     if modifier.type in ['public', 'private', 'protected', 'static', 'final', 'abstract']:
                         modifiers.append(modifier.type)
-        return modifiers
+        return self._share(modifiers)
     
-    def _extract_parameters(self, node) -> List[str]:
+    def _extract_parameters(self, node, source: memoryview) -> Tuple[str, ...]:
         """Extract method parameters."""
         parameters = []
         for child in node.children:
             if child.type == 'formal_parameters':
                 for param in child.children:
                     if param.type == 'formal_parameter':
-                        param_text = param.text.decode('utf-8')
+                        param_text = self._get_name(param, source)
                         parameters.append(param_text)
-        return parameters
+        return tuple(parameters)
     
-    def _extract_return_type(self, node) -> Optional[str]:
+    def _extract_return_type(self, node, source: memoryview) -> Optional[str]:
         """Extract method return type."""
-        for child in node.children:
-            if child.type in ['type_identifier', 'generic_type', 'array_type', 'void_type']:
-                return child.text.decode('utf-8')
-        return None
+        return_type = node.child_by_field_name('type')
+        return self._get_name(return_type, source) if return_type else None
     
-    def _extract_annotations(self, node) -> List[str]:
+    def _extract_annotations(self, node, source: memoryview) -> Tuple[str, ...]:
         """Extract annotations."""
         annotations = []
         for child in node.children:
             if child.type == 'annotation':
-                annotations.append(child.text.decode('utf-8'))
-        return annotations
+                annotations.append(self._get_name(child, source))
+        return tuple(annotations)
     
-    def _extract_extends(self, node) -> Optional[str]:
-        """Extract extends clause."""
+    def _extract_extends(self, node, source: memoryview) -> Optional[str]:
+        """Extract the extended class, or the comma-separated interfaces an interface extends."""
         for child in node.children:
             if child.type == 'superclass':
-                return child.text.decode('utf-8')
+                return self._get_name(child.named_children[0], source) if child.named_children else None
+            if child.type == 'extends_interfaces':
+                return ", ".join(self._extract_type_list(child, source)) or None
         return None
     
-    def _extract_implements(self, node) -> List[str]:
-        """Extract implements clause."""
-        implements = []
+    def _extract_implements(self, node, source: memoryview) -> Tuple[str, ...]:
+        """Extract the interfaces a class implements."""
         for child in node.children:
             if child.type == 'super_interfaces':
-                for interface in child.children:
-                    if interface.type == 'type_identifier':
-                        implements.append(interface.text.decode('utf-8'))
-        return implements
+                return self._extract_type_list(child, source)
+        return ()
     
-    def _extract_field_type(self, node) -> Optional[str]:
-        """Extract field type."""
+    def _extract_type_list(self, node, source: memoryview) -> Tuple[str, ...]:
+        """Extract the types of the type list in an extends or implements clause."""
         for child in node.children:
-            if child.type in ['type_identifier', 'generic_type', 'array_type']:
-                return child.text.decode('utf-8')
-        return None
\ No newline at end of file
+            if child.type == 'type_list':
+                return tuple(self._get_name(type_node, source) for type_node in child.named_children)
+        return ()
+    
+    def _extract_field_type(self, node, source: memoryview) -> Optional[str]:
+        """Extract field type."""
+        field_type = node.child_by_field_name('type')
+        return self._get_name(field_type, source) if field_type else None
+
+def _read_sources(paths: List[Path]) -> List[Tuple[str, bytes]]:
+    """Read the ``(path, bytes)`` of Java files, directories of them and sources JARs."""
+    sources = []
+    for path in paths:
+        if path.is_dir():
+            sources.extend((str(file), file.read_bytes()) for file in sorted(path.rglob("*.java")))
+        elif path.suffix == ".jar":
+            with zipfile.ZipFile(path) as jar:
+                sources.extend(
+                    (name, jar.read(name)) for name in sorted(jar.namelist()) if name.endswith(".java")
+                )
+        else:
+            sources.append((str(path), path.read_bytes()))
+    return sources
+
+def benchmark_parser(paths: List[Path], repeat: int = 3) -> Dict[str, Any]:
+    """Time parsing Java sources into chunks, best of ``repeat`` runs.
+    
+    Sources are read into memory first, so only parsing is timed. Also
+    reports the slowest file, where a walk that is superlinear in file size
+    shows first.
+    """
+    parser = JavaParser()
+    sources = _read_sources(paths)
+    
+    best = None
+    for _ in range(repeat):
+        chunk_count = 0
+        file_times = []
+        start = time.perf_counter()
+        for name, source in sources:
+            file_start = time.perf_counter()
+            chunk_count += len(parser.parse_java_code(source, name))
+            file_times.append((time.perf_counter() - file_start, name))
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, chunk_count, max(file_times, default=(0.0, "")))
+    
+    elapsed, chunk_count, (slowest_seconds, slowest_file) = best
+    lines = sum(source.count(b"\n") + 1 for _, source in sources)
+    report = {
+        "files": len(sources),
+        "lines": lines,
+        "chunks": chunk_count,
+        "seconds": elapsed,
+        "lines_per_second": lines / elapsed if elapsed else 0.0,
+        "slowest_file": slowest_file,
+        "slowest_seconds": slowest_seconds
+    }
+    logger.info(f"Parser benchmark: {report}")
+    return report
+
+def main() -> None:
+    """Report how fast Java sources are parsed into chunks."""
+    parser = argparse.ArgumentParser(description="Measure Java parsing and chunking speed")
+    parser.add_argument("paths", type=Path, nargs="+", help="Java files, directories of them or sources JARs")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    report = benchmark_parser(args.paths, args.repeat)
+    
+    print(f"{'files':>8}{'lines':>10}{'chunks':>10}{'seconds':>10}{'lines/s':>12}  slowest file")
+    print(
+        f"{report['files']:>8}{report['lines']:>10}{report['chunks']:>10}{report['seconds']:>10.2f}"
+        f"{report['lines_per_second']:>12.0f}  {report['slowest_file']} ({report['slowest_seconds']:.2f}s)"
+    )
+
+if __name__ == "__main__":
+    main()
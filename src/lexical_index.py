@@ -0,0 +1,149 @@
+"""Identifier-aware lexical index over code chunks, scored with BM25."""
+
+import json
+import logging
+import re
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+from .metadata_filter import parse_filters, sql_conditions
+from .sqlite_helpers import connect, select_in
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Words of identifier characters, and the pieces a camelCase word splits into:
+# acronyms ("HTTP" in "HTTPServer"), capitalised or lower-case words, digit
+# runs, and letters of scripts without case
+_WORD_PATTERN = re.compile(r"\w+")
+_WORD_PART_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+|[^\W\d_A-Za-z]+")
+
+# Relative BM25 weight of matches in class/method names vs. the code body
+_NAME_WEIGHT = 5.0
+_BODY_WEIGHT = 1.0
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower-case terms, breaking up camelCase and snake_case.
+    
+    A compound identifier yields its parts as well as the whole identifier,
+    so ``computeIfAbsent`` matches queries for ``compute`` and for the exact
+    name alike.
+    """
+    terms = []
+    for word in _WORD_PATTERN.findall(text):
+        parts = [part.lower() for piece in word.split('_') for part in _WORD_PART_PATTERN.findall(piece)]
+        if len(parts) != 1:
+            terms.append(word.lower())
+        terms.extend(parts)
+    return terms
+
+class LexicalIndex:
+    """SQLite FTS5 inverted index over chunk names and content.
+    
+    Text is tokenized with ``tokenize`` before it is stored, so the full-text
+    index sees identifier parts as separate terms. Each chunk's metadata is
+    kept next to it, which lets a lexical search filter and format its hits
+    without going back to the vector database.
+    """
+    
+    def __init__(self, db_path: Path):
+        """Open (or create) the index database."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    rowid INTEGER PRIMARY KEY,
+                    chunk_id TEXT NOT NULL UNIQUE,
+                    metadata TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(names, body)")
+    
+    def add(self, chunks: Iterable[Tuple[str, Dict[str, Any], str]]) -> None:
+        """Index ``(chunk_id, metadata, content)`` triples, replacing existing entries."""
+        chunks = list(chunks)
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            self._delete(conn, [chunk_id for chunk_id, _, _ in chunks])
+            for chunk_id, metadata, content in chunks:
+                names = f"{metadata.get('class_name', '')} {metadata.get('method_name', '')}"
+                rowid = conn.execute(
+                    "INSERT INTO docs (chunk_id, metadata) VALUES (?, ?)",
+                    (chunk_id, json.dumps(metadata))
+                ).lastrowid
+                conn.execute(
+                    "INSERT INTO terms (rowid, names, body) VALUES (?, ?, ?)",
+                    (rowid, " ".join(tokenize(names)), " ".join(tokenize(content)))
+                )
+    
+    def remove(self, chunk_ids: List[str]) -> None:
+        """Remove chunks from the index; unknown IDs are ignored."""
+        with closing(connect(self.db_path)) as conn, conn:
+            self._delete(conn, chunk_ids)
+    
+    def _delete(self, conn: sqlite3.Connection, chunk_ids: List[str]) -> None:
+        """Delete the docs and terms of the given chunks."""
+        rowids = select_in(conn, "SELECT rowid FROM docs WHERE chunk_id IN ({placeholders})", chunk_ids)
+        conn.executemany("DELETE FROM terms WHERE rowid = ?", rowids)
+        conn.executemany("DELETE FROM docs WHERE rowid = ?", rowids)
+    
+    def clear(self) -> None:
+        """Remove every chunk from the index."""
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM terms")
+            conn.execute("DELETE FROM docs")
+    
+    def count(self) -> int:
+        """Return the number of indexed chunks."""
+        with closing(connect(self.db_path)) as conn:
+            return conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+    
+    def search(self,
+               query: str,
+               top_k: int = 5,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Return the best ``(chunk_id, metadata, score)`` matches for a query.
+        
+        Chunks containing every word of the query as a whole are looked up
+        first, which keeps exact identifier lookups to a few posting lists.
+        Only if nothing matches that way are chunks matching any term,
+        including identifier parts, ranked instead. Ranking uses BM25 with
+        name matches weighted above body matches; higher scores are better.
+        ``filters`` are conditions on metadata values, as in vector search.
+        """
+        words = list(dict.fromkeys(word.lower() for word in _WORD_PATTERN.findall(query)))
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        
+        with closing(connect(self.db_path)) as conn:
+            hits = self._match(conn, " AND ".join(f'"{word}"' for word in words), top_k, filters)
+            if not hits and terms != words:
+                hits = self._match(conn, " OR ".join(f'"{term}"' for term in terms), top_k, filters)
+        
+        return hits
+    
+    def _match(self,
+               conn: sqlite3.Connection,
+               match: str,
+               top_k: int,
+               filters: Optional[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Run one ranked full-text query."""
+        sql = f"""
+            SELECT docs.chunk_id, docs.metadata, bm25(terms, {_NAME_WEIGHT}, {_BODY_WEIGHT}) AS score
+            FROM terms JOIN docs ON docs.rowid = terms.rowid
+            WHERE terms MATCH ?
+        """
+        filter_sql, filter_params = sql_conditions(parse_filters(filters), "docs.metadata")
+        sql += filter_sql + " ORDER BY score LIMIT ?"
+        params = [match, *filter_params, top_k]
+        
+        # FTS5 reports BM25 as a negative number where lower is better
+        return [
+            (chunk_id, json.loads(metadata), -score)
+            for chunk_id, metadata, score in conn.execute(sql, params)
+        ]
@@ -0,0 +1,158 @@
+"""Metadata filters shared by the vector stores and the side indexes.
+
+A filter maps a metadata key to a value the key must equal, or to a dict of
+operators:
+
+- ``{"$eq": value}``: equal to the value, the same as the bare value
+- ``{"$in": [value, ...]}``: equal to any of the values
+- ``{"$prefix": "org.apache.kafka"}``: only on ``package``; the package or
+  any package below it. A bare package ending in ``.*`` means the same.
+- ``{"$gt" | "$gte" | "$lt" | "$lte": number}``: numeric ranges on
+  ``start_line``, ``end_line`` and ``line_count``
+
+Empty values are ignored. Every filter becomes a list of conditions that
+are equality, membership or range tests on one key, which each backend
+can answer inside its index: package prefixes are matched through the
+``package_<depth>`` ancestor keys stored with every chunk, so they never
+need a string scan.
+"""
+
+import operator
+import re
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+# Metadata compared as numbers rather than strings
+NUMERIC_KEYS = ("start_line", "end_line", "line_count")
+
+# Metadata the vector store keeps a dedicated index of, besides the
+# package ancestors: the keys filters are expected to use
+INDEXED_KEYS = ("jar_file", "package", "chunk_type", "source_file", "class_name", "method_name", *NUMERIC_KEYS)
+
+_ANCESTOR_KEY_PATTERN = re.compile(r"package_\d+")
+
+SQL_OPERATORS = {"$eq": "=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+_PYTHON_OPERATORS = {
+    "$eq": operator.eq,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le
+}
+
+# A parsed filter condition: (metadata key, operator, value or list of values)
+Condition = Tuple[str, str, Any]
+
+def package_ancestors(package: str) -> Dict[str, str]:
+    """Return the ancestor keys of a package, itself included.
+    
+    ``org.apache.kafka`` gives ``package_1="org"``,
+    ``package_2="org.apache"`` and ``package_3="org.apache.kafka"``.
+    """
+    parts = package.split(".") if package else []
+    return {f"package_{depth}": ".".join(parts[:depth]) for depth in range(1, len(parts) + 1)}
+
+def is_indexed_key(key: str) -> bool:
+    """Return whether a metadata key has a dedicated index in the vector store."""
+    return key in INDEXED_KEYS or bool(_ANCESTOR_KEY_PATTERN.fullmatch(key))
+
+def indexed_values(metadata: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """Yield the ``(key, value)`` pairs of a chunk's metadata that are indexed.
+    
+    Package ancestors are derived from ``package``, so metadata written
+    before they were stored is indexed the same way.
+    """
+    for key, value in metadata.items():
+        if key in INDEXED_KEYS and value not in (None, ""):
+            try:
+                yield key, coerce(key, value)
+            except ValueError:
+                continue
+    yield from package_ancestors(str(metadata.get("package") or "")).items()
+
+def coerce(key: str, value: Any) -> Any:
+    """Convert a value to the type a key is compared as.
+    
+    Raises ``ValueError`` for a value of a numeric key that is not a number.
+    """
+    if key not in NUMERIC_KEYS:
+        return str(value)
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+def parse_filters(filters: Optional[Dict[str, Any]]) -> List[Condition]:
+    """Turn a filter dict into conditions, rewriting package prefixes.
+    
+    Raises ``ValueError`` for an unknown operator, a prefix on a key other
+    than ``package``, or a non-numeric bound on a numeric key.
+    """
+    conditions = []
+    for key, value in (filters or {}).items():
+        operators = value if isinstance(value, dict) else {"$eq": value}
+        for op, operand in operators.items():
+            # Only apply non-empty filters
+            if operand is None or operand == "" or (isinstance(operand, (list, tuple, set)) and not operand):
+                continue
+            
+            if op == "$eq" and key == "package" and isinstance(operand, str) and operand.endswith(".*"):
+                op, operand = "$prefix", operand[:-2]
+            
+            if op == "$prefix":
+                if key != "package":
+                    raise ValueError(f"Prefix filters are only supported on package, not {key}")
+                prefix = str(operand).strip(".")
+                if not prefix:
+                    continue
+                conditions.append((f"package_{prefix.count('.') + 1}", "$eq", prefix))
+            elif op == "$in":
+                values = [operand] if isinstance(operand, str) else operand
+                conditions.append((key, "$in", [coerce(key, v) for v in values]))
+            elif op in SQL_OPERATORS:
+                conditions.append((key, op, coerce(key, operand)))
+            else:
+                raise ValueError(f"Unknown filter operator: {op}")
+    return conditions
+
+def chroma_where(conditions: List[Condition]) -> Optional[Dict[str, Any]]:
+    """Translate conditions into a ChromaDB where clause."""
+    clauses = [{key: {op: value}} for key, op, value in conditions]
+    if not clauses:
+        return None
+    
+    # ChromaDB needs an explicit $and to combine several conditions
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def sql_conditions(conditions: List[Condition], column: str) -> Tuple[str, List[Any]]:
+    """Translate conditions into SQL on a JSON metadata column.
+    
+    Returns ``" AND ..."`` to append to a WHERE clause, and its parameters.
+    Numeric keys are cast, so metadata stored as strings compares the same
+    as metadata stored as numbers.
+    """
+    sql = ""
+    params = []
+    for key, op, value in conditions:
+        field = f"json_extract({column}, ?)"
+        if key in NUMERIC_KEYS:
+            field = f"CAST({field} AS REAL)"
+        params.append(f'$."{key}"')
+        
+        if op == "$in":
+            sql += f" AND {field} IN ({', '.join('?' * len(value))})"
+            params.extend(value)
+        else:
+            sql += f" AND {field} {SQL_OPERATORS[op]} ?"
+            params.append(value)
+    return sql, params
+
+def matches(metadata: Dict[str, Any], conditions: List[Condition]) -> bool:
+    """Return whether a chunk's metadata satisfies every condition."""
+    for key, op, value in conditions:
+        try:
+            stored = coerce(key, metadata[key])
+        except (KeyError, TypeError, ValueError):
+            return False
+        
+        if not (stored in value if op == "$in" else _PYTHON_OPERATORS[op](stored, value)):
+            return False
+    return True
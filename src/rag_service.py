@@ -1,7 +1,7 @@
 """RAG service for answering queries about Java code."""
 
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 
 from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
@@ -61,15 +61,17 @@ Answer:"""
               top_k: int = 5, 
               filters: Optional[Dict[str, Any]] = None,
               include_metadata: bool = False) -> Dict[str, Any]:
-        """Process a user query and return an answer."""
+        """Process a user query and return an answer.
+        
+        ``metadata["route"]`` tells how the context was retrieved: ``"symbol"``
+        when the declarations of the symbols the query names filled it,
+        ``"symbol+<mode>"`` when search results made up the rest, otherwise
+        the search mode that was used.
+        """
         logger.info(f"Processing query: '{user_query}'")
         
         # Step 1: Retrieve relevant code chunks
-        retrieved_chunks = self.vector_db.search(
-            query=user_query,
-            top_k=top_k,
-            filters=filters
-        )
+        retrieved_chunks, route = self._retrieve(user_query, top_k, filters)
         
         if not retrieved_chunks:
             return {
@@ -78,7 +80,8 @@ Answer:"""
                 "metadata": {
                     "query": user_query,
                     "chunks_found": 0,
-                    "llm_used": False
+                    "llm_used": False,
+                    "route": route
                 }
             }
         
@@ -107,24 +110,132 @@ Answer:"""
                 "chunks_found": len(retrieved_chunks),
                 "llm_used": llm_used,
                 "top_k": top_k,
-                "filters": filters or {}
+                "filters": filters or {},
+                "route": route
             }
         }
         
         logger.info(f"Query processed successfully. Found {len(retrieved_chunks)} relevant chunks.")
         return response
     
+    def _retrieve(self,
+                  user_query: str,
+                  top_k: int,
+                  filters: Optional[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], str]:
+        """Route a query to exact symbol lookup first, falling back to search.
+        
+        The declarations of known classes, methods or fields a query names
+        (e.g. "what does ``StringUtils.isBlank`` do") come first; if they
+        fill ``top_k``, neither the embedding model nor a vector search is
+        needed. Otherwise the configured search mode fills the remaining
+        places with chunks not already retrieved.
+        """
+        symbol_chunks = []
+        if settings.symbol_routing:
+            symbol_chunks = self.vector_db.search(user_query, top_k, filters, mode="symbol")
+            if len(symbol_chunks) >= top_k:
+                return symbol_chunks, "symbol"
+        
+        retrieved_chunks = self.vector_db.search(query=user_query, top_k=top_k, filters=filters)
+        if not symbol_chunks:
+            return retrieved_chunks, settings.search_mode
+        
+        seen = {chunk["chunk_id"] for chunk in symbol_chunks}
+        merged = symbol_chunks + [chunk for chunk in retrieved_chunks if chunk["chunk_id"] not in seen]
+        merged = merged[:top_k]
+        for rank, chunk in enumerate(merged, 1):
+            chunk["rank"] = rank
+        return merged, f"symbol+{settings.search_mode}"
+    
+    def lookup_symbol(self,
+                      symbol: str,
+                      limit: int = 10,
+                      filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Find the declarations of a simple or qualified class, method or field name.
+        
+        Returns each declaration's kind, qualified name, package, signature,
+        file and lines, and the ID of the chunk holding it.
+        """
+        return self.vector_db.symbol_index.lookup(symbol, limit, filters)
+    
+    def find_implementors(self,
+                          interface_name: str,
+                          transitive: bool = True,
+                          limit: int = 100,
+                          filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Find the classes implementing an interface.
+        
+        With ``transitive``, classes implementing a sub-interface and
+        subclasses of implementors are included. Results are formatted like
+        ``lookup_symbol``. Type names are matched as written in the code,
+        since imports are not resolved.
+        """
+        kinds = ("implements", "extends") if transitive else ("implements",)
+        return self.vector_db.symbol_index.subtypes(
+            interface_name, kinds, transitive, ("class",), limit, filters
+        )
+    
+    def find_subclasses(self,
+                        class_name: str,
+                        transitive: bool = True,
+                        limit: int = 100,
+                        filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Find the classes extending a class, directly or (with ``transitive``) indirectly."""
+        return self.vector_db.symbol_index.subtypes(
+            class_name, ("extends",), transitive, ("class",), limit, filters
+        )
+    
+    def find_methods_returning(self,
+                               type_name: str,
+                               limit: int = 100,
+                               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Find the methods whose return type is a type, ignoring type arguments and arrays."""
+        return self.vector_db.symbol_index.referrers(type_name, ("returns",), limit, filters)
+    
+    def find_members(self,
+                     type_name: str,
+                     limit: int = 100,
+                     filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Find the methods and fields declared by a class or interface."""
+        return self.vector_db.symbol_index.referrers(type_name, ("member",), limit, filters)
+    
+    def find_references(self,
+                        type_name: str,
+                        limit: int = 100,
+                        filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Find the methods and fields whose return, parameter or field types mention a type."""
+        return self.vector_db.symbol_index.referrers(type_name, limit=limit, filters=filters)
+    
+    def grep(self,
+             pattern: str,
+             fixed_string: bool = False,
+             ignore_case: bool = False,
+             filters: Optional[Dict[str, Any]] = None,
+             cursor: int = 0,
+             limit: int = 50) -> Iterator[Dict[str, Any]]:
+        """Search chunk content for a regex or literal, like grep over the indexed sources.
+        
+        Yields matching chunks with their matching lines, one page of at
+        most ``limit`` at a time; see ``GrepIndex.grep`` for the cursor.
+        """
+        logger.info(f"Grepping code for: '{pattern}'")
+        return self.vector_db.grep_index.grep(pattern, fixed_string, ignore_case, filters, cursor, limit)
+    
     def search_code(self, 
                    query: str, 
                    top_k: int = 10, 
-                   filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+                   filters: Optional[Dict[str, Any]] = None,
+                   include_content: bool = True,
+                   mode: Optional[str] = None) -> List[Dict[str, Any]]:
         """Search for code chunks without LLM generation."""
         logger.info(f"Searching code for: '{query}'")
         
         results = self.vector_db.search(
             query=query,
             top_k=top_k,
-            filters=filters
+            filters=filters,
+            include_content=include_content,
+            mode=mode
         )
         
         return results
@@ -138,12 +249,16 @@ Answer:"""
         context_parts = []
         
         for i, chunk in enumerate(chunks, 1):
+            # Parts of a split declaration say which part they are
+            metadata = chunk.get('metadata', {})
+            part = f" (part {metadata['part']}/{metadata['parts']})" if metadata.get('parts') else ""
+            
             # Create a formatted context entry
             context_entry = f"""[Chunk {i}]
 File: {chunk['source_file']}
 Class: {chunk['class_name']}
 Method: {chunk['method_name']}
-Type: {chunk['chunk_type']}
+Type: {chunk['chunk_type']}{part}
 Lines: {chunk['start_line']}-{chunk['end_line']}
 Similarity: {chunk['similarity_score']:.3f}
 
@@ -241,7 +356,7 @@ Code:
             if stats["total_chunks"] == 0:
                 health["issues"].append("No code chunks in vector database")
                 health["status"] = "warning"
-                
+        
         except Exception as e:
             health["components"]["vector_db"] = {
                 "status": "error",
@@ -0,0 +1,35 @@
+"""Helpers shared by the SQLite-backed stores and indexes."""
+
+import sqlite3
+from pathlib import Path
+from typing import List, Any, Sequence, Tuple
+
+# Keep SQL statements below SQLite's host parameter limit
+QUERY_BATCH_SIZE = 500
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Open a connection to a store's database.
+    
+    Stores open one per operation instead of sharing a connection, which
+    keeps them safe to use from several threads.
+    """
+    return sqlite3.connect(db_path)
+
+def select_in(conn: sqlite3.Connection, query: str, values: Sequence[Any]) -> List[Tuple]:
+    """Run a query with an ``IN ({placeholders})`` clause over any number of values.
+    
+    The values are bound in batches of ``QUERY_BATCH_SIZE``, and the rows of
+    every batch are returned together.
+    """
+    rows = []
+    for i in range(0, len(values), QUERY_BATCH_SIZE):
+        batch = values[i:i + QUERY_BATCH_SIZE]
+        rows.extend(conn.execute(query.format(placeholders=", ".join("?" * len(batch))), batch))
+    return rows
+
+def delete_in(conn: sqlite3.Connection, table: str, column: str, values: Sequence[Any]) -> None:
+    """Delete the rows of ``table`` whose ``column`` is one of ``values``, in batches."""
+    for i in range(0, len(values), QUERY_BATCH_SIZE):
+        batch = values[i:i + QUERY_BATCH_SIZE]
+        placeholders = ", ".join("?" * len(batch))
+        conn.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", batch)
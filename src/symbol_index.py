@@ -0,0 +1,423 @@
+"""Exact index of the Java symbols declared by code chunks."""
+
+import json
+import logging
+import re
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+from .metadata_filter import matches, parse_filters, sql_conditions
+from .sqlite_helpers import connect, select_in
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Identifiers, optionally qualified with '.' (or '#' as in Javadoc links)
+# and followed by an empty argument list
+_SYMBOL_PATTERN = re.compile(r"`([^`]+)`|([A-Za-z_$][\w$]*(?:[.#][A-Za-z_$][\w$]*)*)(\(\))?")
+
+# Undotted words that are unlikely to be English: camelCase (``isBlank``,
+# ``JSONObject``, ``Int64Value``) or containing '_' or '$'. Capitalized
+# words and acronyms such as ``JSON`` or ``APIs`` do not qualify
+_IDENTIFIER_PATTERN = re.compile(r".*([a-z\d][A-Z]|[A-Z]{2}[a-z]{2})|.*[_$]")
+
+# Parts of a written type that are not its name: annotations, a leading
+# extends/implements keyword, innermost type arguments, array brackets and
+# varargs dots
+_TYPE_NOISE_PATTERN = re.compile(r"@[\w.]+(\([^()]*\))?|^\s*(extends|implements)\b|<[^<>]*>|\[\s*\]|\.\.\.")
+
+# Edges from a symbol to a type it names, grouped by the question they answer
+_SUBTYPE_EDGES = ("extends", "implements")
+_REFERENCE_EDGES = ("returns", "parameter", "field_type")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    rowid INTEGER PRIMARY KEY,
+    chunk_id TEXT NOT NULL UNIQUE,
+    metadata TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS symbols (
+    doc INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    qualified_name TEXT NOT NULL,
+    package TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    start_line INTEGER NOT NULL,
+    end_line INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS edges (
+    doc INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    target_name TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols (name);
+CREATE INDEX IF NOT EXISTS idx_symbols_doc ON symbols (doc);
+CREATE INDEX IF NOT EXISTS idx_edges_target ON edges (target_name, kind);
+CREATE INDEX IF NOT EXISTS idx_edges_doc ON edges (doc);
+"""
+
+def find_symbols(text: str) -> List[str]:
+    """Return the words of a question that look like Java symbols.
+    
+    Qualified names (``StringUtils.isBlank``, ``java.util.List``), names
+    followed by ``()``, anything in backticks and camelCase or ``_``/``$``
+    identifiers (``isBlank``, ``MAX_SIZE``) qualify; plain words and
+    acronyms do not. ``#`` is
+    read as ``.`` and trailing ``()`` is dropped.
+    """
+    symbols = []
+    for quoted, word, call in _SYMBOL_PATTERN.findall(text):
+        if quoted:
+            word = quoted.strip().removesuffix("()")
+        elif not ("." in word or "#" in word or call or _IDENTIFIER_PATTERN.match(word)):
+            continue
+        word = word.replace("#", ".").strip(".")
+        if word:
+            symbols.append(word)
+    return list(dict.fromkeys(symbols))
+
+def _chunk_symbols(metadata: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """Return the ``(kind, name, signature)`` of each symbol a chunk declares."""
+    chunk_type = metadata.get("chunk_type", "")
+    if chunk_type in ("class", "interface"):
+        name = metadata.get("class_name", "")
+        return [(chunk_type, name, name)] if name else []
+    
+    if chunk_type == "method":
+        name = metadata.get("method_name", "")
+        signature = f"{metadata.get('return_type', '')} {name}({metadata.get('parameters', '')})".strip()
+        return [("method", name, signature)] if name else []
+    
+    if chunk_type == "field":
+        # A merged run of small fields declares all of them; which field
+        # has which type is only known if they share one
+        names = (metadata.get("fields") or metadata.get("method_name", "")).split(", ")
+        field_types = _split_types(metadata.get("type", ""))
+        field_type = field_types[0] if len(field_types) == 1 else ""
+        return [("field", name, f"{field_type} {name}".strip()) for name in names if name]
+    
+    return []
+
+def _split_types(text: str) -> List[str]:
+    """Split a comma-separated list of types or parameters, keeping type arguments together."""
+    parts = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(text):
+        if char in "<(":
+            depth += 1
+        elif char in ">)":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+def _type_name(text: str) -> str:
+    """Reduce a written type such as ``final Map<K, V>[]`` to its name, ``Map``."""
+    previous = None
+    while text != previous:
+        # Nested type arguments are removed from the inside out
+        previous, text = text, _TYPE_NOISE_PATTERN.sub(" ", text)
+    words = [word for word in text.split() if word != "final"]
+    return words[-1] if words else ""
+
+def _chunk_edges(metadata: Dict[str, Any], scope: str) -> List[Tuple[str, str, str]]:
+    """Return the ``(kind, source, target)`` type edges a chunk declares.
+    
+    Sources are qualified names. Targets are type names as written in the
+    code, which are usually simple names since imports are not resolved.
+    """
+    chunk_type = metadata.get("chunk_type", "")
+    edges = []
+    if chunk_type in ("class", "interface"):
+        for supertype in _split_types(metadata.get("extends", "")):
+            edges.append(("extends", scope, _type_name(supertype)))
+        for interface in _split_types(metadata.get("implements", "")):
+            edges.append(("implements", scope, _type_name(interface)))
+        return edges
+    
+    for kind, name, _ in _chunk_symbols(metadata):
+        member = ".".join(filter(None, [scope, name]))
+        if scope:
+            edges.append(("member", member, scope))
+        if kind == "method":
+            if metadata.get("return_type"):
+                edges.append(("returns", member, _type_name(metadata["return_type"])))
+            for parameter in _split_types(metadata.get("parameters", "")):
+                # The last word of a parameter is its name
+                edges.append(("parameter", member, _type_name(parameter.rsplit(None, 1)[0])))
+        elif kind == "field":
+            # Fields merged into one chunk reference every type in it
+            for field_type in _split_types(metadata.get("type", "")):
+                edges.append(("field_type", member, _type_name(field_type)))
+    
+    return edges
+
+def _names_match(written: str, wanted: str) -> bool:
+    """Whether a type name as written in code can refer to the wanted type."""
+    return written == wanted or wanted.endswith(f".{written}") or written.endswith(f".{wanted}")
+
+class SymbolIndex:
+    """SQLite index from declared names to the chunks that declare them.
+    
+    Every class, interface, method and field chunk is indexed under its
+    simple name together with its package, fully qualified name, signature
+    and location, so a question that names a symbol can be answered with a
+    B-tree lookup instead of a similarity search. Names are matched case
+    sensitively, as in Java. Each chunk's metadata is kept next to it, like
+    in the lexical index.
+    
+    The index also keeps a graph of edges from symbols to the types they
+    name: supertypes (``extends``, ``implements``), declaring types
+    (``member``) and referenced types (``returns``, ``parameter``,
+    ``field_type``). Edges are stored by target name, so the symbols
+    pointing at a type are an adjacency list lookup away. Split
+    declarations contribute their edges once, from their first part.
+    """
+    
+    # Bumped when the schema changes; older indexes are rebuilt from scratch
+    _SCHEMA_VERSION = 2
+    
+    # Types rank above members of the same name
+    _KIND_ORDER = "CASE symbols.kind WHEN 'class' THEN 0 WHEN 'interface' THEN 0 WHEN 'method' THEN 1 ELSE 2 END"
+    
+    def __init__(self, db_path: Path):
+        """Open (or create) the index database."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != self._SCHEMA_VERSION:
+                conn.executescript("""
+                    DROP TABLE IF EXISTS docs;
+                    DROP TABLE IF EXISTS symbols;
+                    DROP TABLE IF EXISTS edges;
+                """)
+                conn.execute(f"PRAGMA user_version = {self._SCHEMA_VERSION}")
+            conn.executescript(_SCHEMA)
+    
+    def add(self, chunks: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """Index the symbols of ``(chunk_id, metadata)`` pairs, replacing existing entries."""
+        chunks = list(chunks)
+        
+        with closing(connect(self.db_path)) as conn, conn:
+            self._delete(conn, [chunk_id for chunk_id, _ in chunks])
+            for chunk_id, metadata in chunks:
+                rowid = conn.execute(
+                    "INSERT INTO docs (chunk_id, metadata) VALUES (?, ?)",
+                    (chunk_id, json.dumps(metadata))
+                ).lastrowid
+                
+                package = metadata.get("package", "")
+                # Collections written before qualified names were recorded
+                # fall back to the class name
+                scope = metadata.get("qualified_class") or metadata.get("class_name", "")
+                rows = []
+                for kind, name, signature in _chunk_symbols(metadata):
+                    qualified_name = scope if kind in ("class", "interface") else ".".join(filter(None, [scope, name]))
+                    rows.append((
+                        rowid, kind, name, qualified_name or name, package, signature,
+                        metadata.get("source_file", ""),
+                        int(metadata.get("start_line") or 0),
+                        int(metadata.get("end_line") or 0)
+                    ))
+                conn.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                
+                if str(metadata.get("part") or 1) == "1":
+                    conn.executemany(
+                        "INSERT INTO edges VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (rowid, kind, source, target, target.rsplit(".", 1)[-1])
+                            for kind, source, target in _chunk_edges(metadata, scope) if target
+                        ]
+                    )
+    
+    def remove(self, chunk_ids: List[str]) -> None:
+        """Remove chunks from the index; unknown IDs are ignored."""
+        with closing(connect(self.db_path)) as conn, conn:
+            self._delete(conn, chunk_ids)
+    
+    def _delete(self, conn: sqlite3.Connection, chunk_ids: List[str]) -> None:
+        """Delete the docs and symbols of the given chunks."""
+        rowids = select_in(conn, "SELECT rowid FROM docs WHERE chunk_id IN ({placeholders})", chunk_ids)
+        conn.executemany("DELETE FROM symbols WHERE doc = ?", rowids)
+        conn.executemany("DELETE FROM edges WHERE doc = ?", rowids)
+        conn.executemany("DELETE FROM docs WHERE rowid = ?", rowids)
+    
+    def clear(self) -> None:
+        """Remove every chunk from the index."""
+        with closing(connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM symbols")
+            conn.execute("DELETE FROM edges")
+            conn.execute("DELETE FROM docs")
+    
+    def count(self) -> int:
+        """Return the number of indexed chunks."""
+        with closing(connect(self.db_path)) as conn:
+            return conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+    
+    def lookup(self,
+               symbol: str,
+               limit: int = 10,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Return the declarations of a simple or qualified name.
+        
+        ``isBlank`` matches every symbol with that name, while a qualified
+        name such as ``StringUtils.isBlank`` or ``org.apache.StringUtils``
+        must match the end of the fully qualified name. Each result holds
+        the symbol's kind, names, package, signature, location and chunk.
+        """
+        with closing(connect(self.db_path)) as conn:
+            rows = self._match(conn, symbol, limit, filters)
+        
+        return [self._symbol_record(row) for row in rows]
+    
+    def subtypes(self,
+                 type_name: str,
+                 kinds: Tuple[str, ...] = _SUBTYPE_EDGES,
+                 transitive: bool = True,
+                 symbol_kinds: Tuple[str, ...] = ("class", "interface"),
+                 limit: int = 100,
+                 filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Return the types that extend or implement a type, as symbol records.
+        
+        ``kinds`` selects the subtype edges to follow. With ``transitive``
+        the walk continues from every type found, so subclasses of
+        implementors count as implementors too. Only symbols of
+        ``symbol_kinds`` are returned, but the walk passes through all of
+        them. ``filters`` apply to the returned symbols only.
+        """
+        found = {}
+        frontier = [type_name]
+        seen = {type_name}
+        with closing(connect(self.db_path)) as conn:
+            while frontier:
+                next_frontier = []
+                for name in frontier:
+                    for row in self._incoming(conn, name, kinds):
+                        qualified_name = row[4]
+                        found.setdefault(qualified_name, row)
+                        if transitive and qualified_name not in seen:
+                            seen.add(qualified_name)
+                            next_frontier.append(qualified_name)
+                frontier = next_frontier
+        
+        rows = [row for row in found.values() if row[2] in symbol_kinds]
+        return self._records(rows, limit, filters)
+    
+    def referrers(self,
+                  type_name: str,
+                  kinds: Tuple[str, ...] = _REFERENCE_EDGES,
+                  limit: int = 100,
+                  filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Return the symbols with an edge of one of ``kinds`` to a type, as symbol records.
+        
+        ``("returns",)`` finds the methods returning the type, ``("member",)``
+        its methods and fields, and the default every method or field whose
+        signature mentions it.
+        """
+        with closing(connect(self.db_path)) as conn:
+            rows = {row[4]: row for row in self._incoming(conn, type_name, kinds)}
+        return self._records(list(rows.values()), limit, filters)
+    
+    def _incoming(self, conn: sqlite3.Connection, type_name: str, kinds: Tuple[str, ...]) -> List[Tuple]:
+        """Return the symbols with an edge of one of ``kinds`` to a type."""
+        placeholders = ", ".join("?" * len(kinds))
+        rows = conn.execute(
+            f"""
+            SELECT docs.chunk_id, docs.metadata, symbols.kind, symbols.name, symbols.qualified_name,
+                   symbols.package, symbols.signature, symbols.source_file, symbols.start_line, symbols.end_line,
+                   edges.target
+            FROM edges
+            JOIN symbols ON symbols.doc = edges.doc AND symbols.qualified_name = edges.source
+            JOIN docs ON docs.rowid = edges.doc
+            WHERE edges.target_name = ? AND edges.kind IN ({placeholders})
+            """,
+            [type_name.rsplit(".", 1)[-1], *kinds]
+        ).fetchall()
+        return [row[:-1] for row in rows if _names_match(row[-1], type_name)]
+    
+    def _records(self, rows: List[Tuple], limit: int, filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Filter, sort and format symbol rows."""
+        conditions = parse_filters(filters)
+        if conditions:
+            rows = [row for row in rows if matches(json.loads(row[1]), conditions)]
+        rows.sort(key=lambda row: (row[4], row[7], row[8]))
+        return [self._symbol_record(row) for row in rows[:limit]]
+    
+    @staticmethod
+    def _symbol_record(row: Tuple) -> Dict[str, Any]:
+        """Format a row of doc and symbol columns."""
+        chunk_id, _, kind, name, qualified_name, package, signature, source_file, start_line, end_line = row
+        return {
+            "chunk_id": chunk_id,
+            "kind": kind,
+            "name": name,
+            "qualified_name": qualified_name,
+            "package": package,
+            "signature": signature,
+            "source_file": source_file,
+            "start_line": start_line,
+            "end_line": end_line
+        }
+    
+    def search(self,
+               query: str,
+               top_k: int = 5,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Return ``(chunk_id, metadata, score)`` for the symbols named in a question.
+        
+        Symbols are found with ``find_symbols`` and looked up in the order
+        they appear; every hit is exact and scores 1.0. A question that
+        names no known symbol gets no results. ``filters`` are conditions on
+        metadata values, as in vector search.
+        """
+        hits = {}
+        with closing(connect(self.db_path)) as conn:
+            for symbol in find_symbols(query):
+                for chunk_id, metadata, *_ in self._match(conn, symbol, top_k, filters):
+                    hits.setdefault(chunk_id, (chunk_id, json.loads(metadata), 1.0))
+                if len(hits) >= top_k:
+                    break
+        
+        return list(hits.values())[:top_k]
+    
+    def _match(self,
+               conn: sqlite3.Connection,
+               symbol: str,
+               limit: int,
+               filters: Optional[Dict[str, Any]]) -> List[Tuple]:
+        """Run one symbol lookup, returning doc and symbol columns."""
+        name = symbol.rsplit(".", 1)[-1]
+        sql = """
+            SELECT docs.chunk_id, docs.metadata, symbols.kind, symbols.name, symbols.qualified_name,
+                   symbols.package, symbols.signature, symbols.source_file, symbols.start_line, symbols.end_line
+            FROM symbols JOIN docs ON docs.rowid = symbols.doc
+            WHERE symbols.name = ?
+        """
+        params = [name]
+        
+        if "." in symbol:
+            # GLOB is case sensitive; identifiers cannot contain its wildcards
+            sql += " AND (symbols.qualified_name = ? OR symbols.qualified_name GLOB ?)"
+            params.extend([symbol, f"*.{symbol}"])
+        
+        filter_sql, filter_params = sql_conditions(parse_filters(filters), "docs.metadata")
+        sql += filter_sql
+        params.extend(filter_params)
+        
+        sql += f" ORDER BY {self._KIND_ORDER}, symbols.qualified_name, symbols.source_file, symbols.start_line LIMIT ?"
+        params.append(limit)
+        
+        return conn.execute(sql, params).fetchall()
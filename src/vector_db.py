@@ -1,15 +1,26 @@
 """Vector database manager using ChromaDB for code embeddings."""
 
+import hashlib
 import logging
 import uuid
-from typing import List, Dict, Any, Optional
-
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
 
+import numpy as np
+from .collection_stats import CollectionStatistics
 from .config import settings
+from .content_store import ContentStore
+from .embedding_backend import load_embedding_model, encode_length_bucketed
+from .embedding_cache import EmbeddingCache, QueryEmbeddingCache
 from .java_parser import CodeChunk
+from .grep_index import GrepIndex
+from .hierarchy_index import HierarchyIndex
+from .lexical_index import LexicalIndex
+from .metadata_filter import package_ancestors, parse_filters
+from .symbol_index import SymbolIndex
+from .vector_store import VectorStore, ChromaVectorStore, NumpyVectorStore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,197 +28,634 @@ logger = logging.getLogger(__name__)
 class VectorDatabase:
     """Vector database manager for storing and retrieving code embeddings."""
     
-    def __init__(self, collection_name: str = "java_code_chunks"):
-        """Initialize the vector database."""
+    SEARCH_MODES = ("vector", "lexical", "hybrid", "symbol", "hierarchical")
+    
+    # Hybrid search takes this many candidates per requested result from each
+    # ranking; _RRF_K is the usual reciprocal rank fusion constant
+    _HYBRID_CANDIDATE_FACTOR = 4
+    _RRF_K = 60
+    
+    def __init__(self, collection_name: str = "java_code_chunks", quantization: Optional[str] = None):
+        """Initialize the vector database.
+        
+        Embeddings are kept by the backend chosen with
+        ``settings.vector_backend``: ``"chroma"`` (a ChromaDB collection) or
+        ``"numpy"`` (a memory-mapped in-process index). The numpy backend can
+        search quantized copies of the embeddings; ``quantization`` selects
+        ``"none"``, ``"int8"`` or ``"binary"`` for this collection and
+        defaults to ``settings.vector_quantization``.
+        """
         self.collection_name = collection_name
+        self.quantization = quantization or settings.vector_quantization
+        
+        # Initialize embedding model
+        logger.info(f"Loading embedding model: {settings.embedding_model} ({settings.embedding_backend})")
+        self.embedding_model = load_embedding_model(
+            settings.embedding_model,
+            settings.embedding_backend,
+            settings.embedding_model_dir or None
+        )
         
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=settings.chroma_persist_directory,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
+        # Cache document embeddings so unchanged code is never re-embedded;
+        # quantized runtimes embed slightly differently, so they get their own keys
+        self.embedding_cache = None
+        if settings.embedding_cache_enabled:
+            cache_model_name = settings.embedding_model
+            if settings.embedding_backend in ("quantized", "onnx_int8"):
+                cache_model_name += f"#{settings.embedding_backend}"
+            self.embedding_cache = EmbeddingCache(
+                Path(settings.chroma_persist_directory) / "embedding_cache.sqlite3",
+                model_name=cache_model_name,
+                max_bytes=settings.embedding_cache_max_mb * 1024 * 1024
             )
+        
+        # Repeated queries (web UI, filter suggestions, evaluations) reuse
+        # their embedding instead of running the model again
+        self.query_cache = QueryEmbeddingCache(settings.query_cache_size)
+        
+        # Raw chunk content lives in a compressed side store rather than in
+        # the collection, which only keeps embeddings and metadata
+        self.content_store = ContentStore(
+            Path(settings.chroma_persist_directory) / f"{collection_name}_content.sqlite3"
         )
         
-        # Initialize embedding model
-        logger.info(f"Loading embedding model: {settings.embedding_model}")
-        self.embedding_model = SentenceTransformer(settings.embedding_model)
-        
-        # Get or create collection
-        try:
-            self.collection = self.client.get_collection(name=collection_name)
-            logger.info(f"Loaded existing collection: {collection_name}")
-        except Exception:
-            self.collection = self.client.create_collection(
-                name=collection_name,
-                metadata={"description": "Java code chunks for RAG"}
+        self.store = self._create_store(collection_name, self.quantization)
+        
+        # Exact counters over the collection, kept up to date on every write
+        self.statistics = CollectionStatistics(
+            Path(settings.chroma_persist_directory) / f"{collection_name}_stats.sqlite3"
+        )
+        if self.statistics.total_chunks() != self.store.count():
+            self._rebuild_statistics()
+        
+        # Identifier-aware BM25 index for lexical and hybrid search
+        self.lexical_index = LexicalIndex(
+            Path(settings.chroma_persist_directory) / f"{collection_name}_lexical.sqlite3"
+        )
+        if self.lexical_index.count() != self.store.count():
+            self._rebuild_lexical_index()
+        
+        # Declared names of classes, methods and fields, for exact lookups
+        self.symbol_index = SymbolIndex(
+            Path(settings.chroma_persist_directory) / f"{collection_name}_symbols.sqlite3"
+        )
+        if self.symbol_index.count() != self.store.count():
+            self._rebuild_symbol_index()
+        
+        # Trigram index over raw content for exact substring and regex search
+        self.grep_index = GrepIndex(
+            Path(settings.chroma_persist_directory) / f"{collection_name}_grep.sqlite3"
+        )
+        if self.grep_index.count() != self.store.count():
+            self._rebuild_grep_index()
+        
+        # Mean embeddings of files and classes for coarse-to-fine search
+        self.hierarchy_index = HierarchyIndex(
+            Path(settings.chroma_persist_directory) / f"{collection_name}_hierarchy.sqlite3"
+        )
+        if self.hierarchy_index.count() != self.store.count():
+            self._rebuild_hierarchy_index()
+    
+    @staticmethod
+    def _create_store(collection_name: str, quantization: str) -> VectorStore:
+        """Open the configured vector store backend."""
+        if settings.vector_backend == "numpy":
+            logger.info(f"Using NumPy vector store for collection: {collection_name} (quantization: {quantization})")
+            return NumpyVectorStore(
+                Path(settings.chroma_persist_directory) / f"{collection_name}_vectors",
+                ivf_min_vectors=settings.ivf_min_vectors,
+                ivf_nprobe=settings.ivf_nprobe,
+                quantization=quantization,
+                rescore_factor=settings.quantization_rescore_factor
             )
-            logger.info(f"Created new collection: {collection_name}")
+        
+        if settings.vector_backend != "chroma":
+            raise ValueError(f"Unknown vector backend: {settings.vector_backend}")
+        if quantization != "none":
+            raise ValueError("Quantization requires the numpy vector backend")
+        
+        return ChromaVectorStore(settings.chroma_persist_directory, collection_name)
     
-    def add_chunks(self, chunks: List[CodeChunk]) -> None:
-        """Add code chunks to the vector database."""
-        if not chunks:
-            logger.warning("No chunks to add")
-            return
+    def _iter_stored_chunks(self, batch_size: int = 5000) -> Iterator[Tuple[List[str], List[Dict[str, Any]]]]:
+        """Page through the collection, yielding the IDs and metadata of each batch.
         
-        logger.info(f"Adding {len(chunks)} chunks to vector database")
+        Used to rebuild the side indexes of collections written before they
+        existed, or that got out of step with the store.
+        """
+        offset = 0
+        while True:
+            ids, metadatas = self.store.get_page(batch_size, offset)
+            if not ids:
+                return
+            yield ids, metadatas
+            offset += len(ids)
+    
+    def _rebuild_statistics(self) -> None:
+        """Recount the statistics from the collection's metadata."""
+        logger.info(f"Rebuilding statistics for collection: {self.collection_name}")
+        self.statistics.clear()
+        for ids, metadatas in self._iter_stored_chunks():
+            self.statistics.add(zip(ids, metadatas))
+    
+    def _rebuild_lexical_index(self) -> None:
+        """Re-index every chunk of the collection lexically."""
+        logger.info(f"Rebuilding lexical index for collection: {self.collection_name}")
+        self.lexical_index.clear()
+        for ids, metadatas in self._iter_stored_chunks():
+            contents = self.content_store.get_many(ids)
+            self.lexical_index.add(
+                (chunk_id, metadata, contents.get(chunk_id, metadata.get("content", "")))
+                for chunk_id, metadata in zip(ids, metadatas)
+            )
+    
+    def _rebuild_symbol_index(self) -> None:
+        """Re-index the symbols of every chunk of the collection."""
+        logger.info(f"Rebuilding symbol index for collection: {self.collection_name}")
+        self.symbol_index.clear()
+        for ids, metadatas in self._iter_stored_chunks():
+            self.symbol_index.add(zip(ids, metadatas))
+    
+    def _rebuild_grep_index(self) -> None:
+        """Re-index the content of every chunk of the collection by trigrams."""
+        logger.info(f"Rebuilding grep index for collection: {self.collection_name}")
+        self.grep_index.clear()
+        for ids, metadatas in self._iter_stored_chunks():
+            contents = self.content_store.get_many(ids)
+            self.grep_index.add(
+                (chunk_id, metadata, contents.get(chunk_id, metadata.get("content", "")))
+                for chunk_id, metadata in zip(ids, metadatas)
+            )
+    
+    def _rebuild_hierarchy_index(self) -> None:
+        """Recompute the file and class mean embeddings from the stored embeddings."""
+        logger.info(f"Rebuilding hierarchy index for collection: {self.collection_name}")
+        self.hierarchy_index.clear()
+        for ids, metadatas in self._iter_stored_chunks():
+            embeddings = self.store.get_embeddings(ids)
+            self.hierarchy_index.add(
+                ((chunk_id, metadata, embeddings[chunk_id]) for chunk_id, metadata in zip(ids, metadatas)
+                 if chunk_id in embeddings),
+                {}
+            )
+    
+    def add_chunks(self,
+                   chunks: Iterable[CodeChunk],
+                   embed_batch_size: Optional[int] = None,
+                   write_batch_size: Optional[int] = None) -> List[str]:
+        """Add code chunks to the vector database and return their IDs.
+        
+        ``chunks`` may be any iterable, including a generator. Chunks are
+        embedded ``embed_batch_size`` at a time and written in slices of
+        ``write_batch_size``, so memory use does not grow with the input.
+        Writing one embedded batch overlaps with encoding the next.
+        """
+        embed_batch_size = embed_batch_size or settings.embed_batch_size
+        write_batch_size = write_batch_size or settings.write_batch_size
         
-        # Prepare data for batch insertion
+        ids = []
+        pending_write = None
+        
+        # A single writer thread keeps inserts ordered while the caller's
+        # thread moves on to encoding the next batch.
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            for batch in self._iter_batches(chunks, embed_batch_size):
+                documents, metadatas, batch_ids, contents = self._prepare_batch(batch)
+                
+                # Generate embeddings
+                logger.debug(f"Generating embeddings for {len(documents)} chunks...")
+                embeddings = self._encode_documents(documents)
+                
+                if pending_write is not None:
+                    pending_write.result()
+                pending_write = writer.submit(
+                    self._write_batch, metadatas, batch_ids, embeddings, contents, write_batch_size
+                )
+                ids.extend(batch_ids)
+            
+            if pending_write is not None:
+                pending_write.result()
+        
+        if not ids:
+            logger.warning("No chunks to add")
+            return []
+        
+        logger.info(f"Successfully added {len(ids)} chunks to vector database")
+        return ids
+    
+    @staticmethod
+    def _iter_batches(chunks: Iterable[CodeChunk], batch_size: int) -> Iterator[List[CodeChunk]]:
+        """Group an iterable of chunks into lists of at most ``batch_size``."""
+        iterator = iter(chunks)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            yield batch
+    
+    def _prepare_batch(self, chunks: List[CodeChunk]) -> Tuple[List[str], List[Dict[str, Any]], List[str], List[str]]:
+        """Build the documents, metadata, IDs and raw contents for a batch of chunks."""
         documents = []
         metadatas = []
         ids = []
+        contents = []
         
         for chunk in chunks:
             # Create document text for embedding
             doc_text = self._create_document_text(chunk)
             documents.append(doc_text)
             
-            # Create metadata
-            metadata = {
-                "source_file": chunk.source_file,
-                "class_name": chunk.class_name or "",
-                "method_name": chunk.method_name or "",
-                "start_line": chunk.start_line,
-                "end_line": chunk.end_line,
-                "chunk_type": chunk.chunk_type,
-                "content": chunk.content,
-                **chunk.metadata
-            }
-            
-            # Convert lists to strings for ChromaDB compatibility
-            for key, value in metadata.items():
-                if isinstance(value, list):
-                    metadata[key] = ", ".join(str(v) for v in value)
-                elif value is None:
-                    metadata[key] = ""
-                else:
-                    metadata[key] = str(value)
-            
-            metadatas.append(metadata)
+            metadatas.append(self._create_metadata(chunk))
             
             # Generate unique ID
             chunk_id = self._generate_chunk_id(chunk)
             ids.append(chunk_id)
+            contents.append(chunk.content)
         
-        # Generate embeddings
-        logger.info("Generating embeddings...")
-        embeddings = self.embedding_model.encode(documents).tolist()
+        return documents, metadatas, ids, contents
+    
+    def _create_metadata(self, chunk: CodeChunk) -> Dict[str, Any]:
+        """Create the ChromaDB metadata for a code chunk.
         
-        # Add to collection in batches
-        batch_size = 100
-        for i in range(0, len(documents), batch_size):
-            end_idx = min(i + batch_size, len(documents))
+        JAR and package are always present, and each ancestor of the package
+        gets a ``package_<depth>`` key, so filters can match a package prefix
+        exactly. Line numbers and the line count stay numbers for range
+        filters; everything else is stored as a string.
+        """
+        package = chunk.metadata.get("package") or ""
+        metadata = {
+            "source_file": chunk.source_file,
+            "class_name": chunk.class_name or "",
+            "method_name": chunk.method_name or "",
+            "chunk_type": chunk.chunk_type,
+            **chunk.metadata,
+            "jar_file": chunk.metadata.get("jar_file") or "",
+            "package": package,
+            **package_ancestors(package)
+        }
+        
+        # Convert lists to strings for ChromaDB compatibility
+        for key, value in metadata.items():
+            if isinstance(value, (list, tuple)):
+                metadata[key] = ", ".join(str(v) for v in value)
+            elif value is None:
+                metadata[key] = ""
+            else:
+                metadata[key] = str(value)
+        
+        metadata.update(
+            start_line=chunk.start_line,
+            end_line=chunk.end_line,
+            line_count=chunk.end_line - chunk.start_line + 1
+        )
+        return metadata
+    
+    def chunk_signature(self, chunk: CodeChunk) -> Tuple[str, str]:
+        """Return a chunk's ID and a fingerprint of everything stored for it.
+        
+        Two chunks with the same ID and fingerprint would be written
+        identically, so re-writing one of them can be skipped.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self._create_document_text(chunk).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(chunk.content.encode('utf-8'))
+        for key, value in sorted(self._create_metadata(chunk).items()):
+            digest.update(f"\0{key}={value}".encode('utf-8'))
+        return self._generate_chunk_id(chunk), digest.hexdigest()
+    
+    def _encode_documents(self, documents: List[str]) -> List[List[float]]:
+        """Embed documents, reusing cached embeddings where possible."""
+        if self.embedding_cache is None:
+            return self._encode_uncached(documents).tolist()
+        
+        keys = [self.embedding_cache.make_key(doc) for doc in documents]
+        cached = self.embedding_cache.get_many(keys)
+        
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing:
+            new_embeddings = self._encode_uncached([documents[i] for i in missing])
+            self.embedding_cache.put_many([keys[i] for i in missing], new_embeddings)
+            for i, embedding in zip(missing, new_embeddings):
+                cached[keys[i]] = embedding
+        
+        logger.debug(f"Embedding cache: {len(documents) - len(missing)}/{len(documents)} hits")
+        return np.vstack([cached[key] for key in keys]).tolist()
+    
+    def _encode_uncached(self, documents: List[str]) -> np.ndarray:
+        """Run the embedding model over documents batched by token length."""
+        return encode_length_bucketed(self.embedding_model, documents, settings.embed_token_budget)
+    
+    def _write_batch(self,
+                     metadatas: List[Dict[str, Any]],
+                     ids: List[str],
+                     embeddings: List[List[float]],
+                     contents: List[str],
+                     write_batch_size: int) -> None:
+        """Write one embedded batch to the collection in slices.
+        
+        The document text is only needed to compute the embedding, so the
+        collection stores embeddings and metadata, and the raw content goes
+        to the content store. Chunks are upserted, so writing a chunk that is
+        already stored replaces it instead of being ignored.
+        
+        The side stores and indexes are only written once the collection
+        has taken the batch, so a failed upsert never leaves them holding
+        chunks the collection does not have.
+        """
+        # Group sums are updated incrementally, so chunks being replaced
+        # first give back the embedding they were added with. Embeddings
+        # are added as the store returns them (float16-rounded by the numpy
+        # backend), so what is later taken out is exactly what went in
+        previous = self.store.get_embeddings(self.hierarchy_index.known(ids))
+        
+        for i in range(0, len(ids), write_batch_size):
+            end_idx = min(i + write_batch_size, len(ids))
             
-            self.collection.add(
-                documents=documents[i:end_idx],
-                metadatas=metadatas[i:end_idx],
+            self.store.upsert(
                 ids=ids[i:end_idx],
-                embeddings=embeddings[i:end_idx]
+                embeddings=embeddings[i:end_idx],
+                metadatas=metadatas[i:end_idx]
             )
-            
-            logger.debug(f"Added batch {i//batch_size + 1}/{(len(documents)-1)//batch_size + 1}")
         
-        logger.info(f"Successfully added {len(chunks)} chunks to vector database")
+        self.content_store.put_many(zip(ids, contents))
+        self.statistics.add(zip(ids, metadatas))
+        self.lexical_index.add(zip(ids, metadatas, contents))
+        self.symbol_index.add(zip(ids, metadatas))
+        self.grep_index.add(zip(ids, metadatas, contents))
+        stored = self.store.get_embeddings(ids)
+        self.hierarchy_index.add(
+            ((chunk_id, metadata, stored[chunk_id])
+             for chunk_id, metadata in zip(ids, metadatas) if chunk_id in stored),
+            previous
+        )
     
-    def search(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        """Search for relevant code chunks."""
+    def delete_chunks(self, chunk_ids: List[str]) -> None:
+        """Delete code chunks by ID."""
+        if not chunk_ids:
+            return
+        
+        logger.info(f"Deleting {len(chunk_ids)} chunks from vector database")
+        
+        # The group sums need the embeddings before they are deleted
+        embeddings = self.store.get_embeddings(chunk_ids)
+        
+        batch_size = 1000
+        for i in range(0, len(chunk_ids), batch_size):
+            self.store.delete(chunk_ids[i:i + batch_size])
+        
+        self.content_store.delete_many(chunk_ids)
+        self.statistics.remove(chunk_ids)
+        self.lexical_index.remove(chunk_ids)
+        self.symbol_index.remove(chunk_ids)
+        self.grep_index.remove(chunk_ids)
+        self.hierarchy_index.remove(embeddings)
+    
+    def search(self,
+               query: str,
+               top_k: int = 5,
+               filters: Optional[Dict[str, Any]] = None,
+               include_content: bool = True,
+               mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search for relevant code chunks.
+        
+        ``mode`` is one of ``SEARCH_MODES`` and defaults to
+        ``settings.search_mode``:
+        
+        - ``"vector"``: embedding similarity
+        - ``"lexical"``: BM25 over identifier-aware terms; never runs the
+          embedding model
+        - ``"hybrid"``: both, merged with reciprocal rank fusion
+        - ``"symbol"``: exact lookup of the class, method and field names
+          the query mentions (see ``symbol_index.find_symbols``); returns
+          nothing if it names no known symbol
+        - ``"hierarchical"``: embedding similarity, coarse to fine: the query
+          is compared with the mean embedding of every file, then of the
+          classes in the ``settings.hierarchy_top_files`` closest files, and
+          only the members of the ``settings.hierarchy_top_classes`` closest
+          classes are searched. Much cheaper on large collections, at the
+          cost of missing chunks in classes whose mean is far from the query
+        
+        ``similarity_score`` holds the cosine similarity (in vector and
+        hierarchical mode), the BM25 score, the fused score or 1.0 for exact
+        symbol hits respectively. Content is loaded from the content store
+        for the returned hits only. With ``include_content=False`` no content
+        is loaded and each result's ``content`` is ``None``.
+        
+        ``filters`` restrict every mode to chunks whose metadata matches, e.g.
+        ``{"package": "org.apache.kafka.*", "jar_file": {"$in": [...]},
+        "line_count": {"$lte": 40}}``; see ``metadata_filter`` for the
+        operators. They are applied by the index being searched, before the
+        top ``top_k`` are chosen.
+        """
         logger.info(f"Searching for: '{query}' (top_k={top_k})")
         
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode([query]).tolist()[0]
+        formatted_results = self.search_many([query], top_k, filters, include_content, mode)[0]
+        
+        logger.info(f"Found {len(formatted_results)} relevant chunks")
+        return formatted_results
+    
+    def search_many(self,
+                    queries: List[str],
+                    top_k: int = 5,
+                    filters: Optional[Dict[str, Any]] = None,
+                    include_content: bool = True,
+                    mode: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """Search for several queries at once.
+        
+        For the vector part of a search all queries are embedded in one batch
+        and sent to the collection in a single query call. Returns one result
+        list per query, each formatted like ``search``.
+        """
+        mode = mode or settings.search_mode
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        
+        if not queries:
+            return []
+        
+        logger.debug(f"Searching for {len(queries)} queries (top_k={top_k}, mode={mode})")
         
-        # Prepare where clause for filtering
-        where_clause = None
-        if filters:
-            where_clause = {}
-            for key, value in filters.items():
-                if value:  # Only add non-empty filters
-                    where_clause[key] = {"$eq": str(value)}
+        if mode == "vector":
+            hits = self._vector_hits(queries, top_k, filters)
+        elif mode == "lexical":
+            hits = [self.lexical_index.search(query, top_k, filters) for query in queries]
+        elif mode == "symbol":
+            hits = [self.symbol_index.search(query, top_k, filters) for query in queries]
+        elif mode == "hierarchical":
+            hits = self._hierarchical_hits(queries, top_k, filters)
+        else:
+            candidates = max(top_k * self._HYBRID_CANDIDATE_FACTOR, top_k)
+            hits = [
+                self._fuse_rankings([vector_hits, self.lexical_index.search(query, candidates, filters)], top_k)
+                for query, vector_hits in zip(queries, self._vector_hits(queries, candidates, filters))
+            ]
+        
+        # Load the content of all hits in one go
+        contents = {}
+        if include_content:
+            hit_ids = list(dict.fromkeys(chunk_id for query_hits in hits for chunk_id, _, _ in query_hits))
+            contents = self.content_store.get_many(hit_ids)
+        
+        return [self._format_results(query_hits, contents, include_content) for query_hits in hits]
+    
+    def _vector_hits(self,
+                     queries: List[str],
+                     top_k: int,
+                     filters: Optional[Dict[str, Any]]) -> List[List[Tuple[str, Dict[str, Any], float]]]:
+        """Run a batched vector search, returning ``(chunk_id, metadata, similarity)`` per query."""
+        query_embeddings = self._encode_queries(queries)
         
         # Search the collection
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=where_clause,
-            include=["documents", "metadatas", "distances"]
-        )
+        results = self.store.query(query_embeddings, top_k, filters)
+        
+        return [
+            [
+                (chunk_id, metadata, 1 - distance)  # Convert distance to similarity
+                for chunk_id, metadata, distance in zip(ids, metadatas, distances)
+            ]
+            for ids, metadatas, distances in results
+        ]
+    
+    def _hierarchical_hits(self,
+                           queries: List[str],
+                           top_k: int,
+                           filters: Optional[Dict[str, Any]]) -> List[List[Tuple[str, Dict[str, Any], float]]]:
+        """Run a vector search restricted to the members of the classes closest to each query."""
+        conditions = parse_filters(filters)
+        
+        hits = []
+        for query_embedding in self._encode_queries(queries):
+            files = None
+            if settings.hierarchy_top_files > 0:
+                files = self.hierarchy_index.top_groups(
+                    "file", query_embedding, settings.hierarchy_top_files, conditions
+                )
+            classes = self.hierarchy_index.top_groups(
+                "class", query_embedding, settings.hierarchy_top_classes, conditions, parents=files
+            )
+            candidates = self.hierarchy_index.members(classes)
+            logger.debug(f"Hierarchical search: {len(classes)} classes, {len(candidates)} candidate chunks")
+            
+            ids, metadatas, distances = self.store.query([query_embedding], top_k, filters, ids=candidates)[0]
+            hits.append([
+                (chunk_id, metadata, 1 - distance)  # Convert distance to similarity
+                for chunk_id, metadata, distance in zip(ids, metadatas, distances)
+            ])
+        return hits
+    
+    def _fuse_rankings(self,
+                       rankings: List[List[Tuple[str, Dict[str, Any], float]]],
+                       top_k: int) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Merge ranked hit lists with reciprocal rank fusion."""
+        scores = {}
+        metadatas = {}
+        for ranking in rankings:
+            for rank, (chunk_id, metadata, _) in enumerate(ranking, 1):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (self._RRF_K + rank)
+                metadatas.setdefault(chunk_id, metadata)
         
-        # Format results
+        fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(chunk_id, metadatas[chunk_id], score) for chunk_id, score in fused]
+    
+    def _encode_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed queries in one batch, reusing cached query embeddings."""
+        embeddings = {}
+        for query in dict.fromkeys(queries):
+            vector = self.query_cache.get(query)
+            if vector is not None:
+                embeddings[query] = vector
+        
+        missing = [query for query in dict.fromkeys(queries) if query not in embeddings]
+        if missing:
+            for query, vector in zip(missing, self.embedding_model.encode(missing)):
+                self.query_cache.put(query, vector)
+                embeddings[query] = vector
+        
+        return [embeddings[query].tolist() for query in queries]
+    
+    @staticmethod
+    def _format_results(hits: List[Tuple[str, Dict[str, Any], float]],
+                        contents: Dict[str, str],
+                        include_content: bool) -> List[Dict[str, Any]]:
+        """Format the ``(chunk_id, metadata, score)`` hits of one query as search results."""
         formatted_results = []
-        if results['documents'] and results['documents'][0]:
-            for i, (doc, metadata, distance) in enumerate(zip(
-                results['documents'][0],
-                results['metadatas'][0],
-                results['distances'][0]
-            )):
-                formatted_results.append({
-                    "rank": i + 1,
-                    "content": metadata.get("content", doc),
-                    "source_file": metadata.get("source_file", ""),
-                    "class_name": metadata.get("class_name", ""),
-                    "method_name": metadata.get("method_name", ""),
-                    "chunk_type": metadata.get("chunk_type", ""),
-                    "start_line": metadata.get("start_line", ""),
-                    "end_line": metadata.get("end_line", ""),
-                    "similarity_score": 1 - distance,  # Convert distance to similarity
-                    "metadata": metadata
-                })
+        for i, (chunk_id, metadata, score) in enumerate(hits):
+            if include_content:
+                # Collections written before the content store kept
+                # content in the metadata
+                content = contents.get(chunk_id, metadata.get("content", ""))
+            else:
+                content = None
+            
+            formatted_results.append({
+                "rank": i + 1,
+                "chunk_id": chunk_id,
+                "content": content,
+                "source_file": metadata.get("source_file", ""),
+                "class_name": metadata.get("class_name", ""),
+                "method_name": metadata.get("method_name", ""),
+                "chunk_type": metadata.get("chunk_type", ""),
+                "start_line": metadata.get("start_line", ""),
+                "end_line": metadata.get("end_line", ""),
+                "similarity_score": score,
+                "metadata": metadata
+            })
         
-        logger.info(f"Found {len(formatted_results)} relevant chunks")
         return formatted_results
     
     def get_collection_stats(self) -> Dict[str, Any]:
-        """Get statistics about the collection."""
-        count = self.collection.count()
-        
-        # Get sample of metadata to understand the data
-        sample_results = self.collection.get(
-            limit=min(100, count),
-            include=["metadatas"]
-        )
+        """Get exact statistics about the collection.
         
-        # Analyze chunk types
-        chunk_types = {}
-        source_files = set()
-        classes = set()
+        Served from the incrementally maintained counters, so the cost does
+        not depend on the size of the collection.
+        """
+        return {
+            **self.statistics.summary(),
+            "collection_name": self.collection_name,
+            "quantization": self.quantization,
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None,
+            "query_cache": self.query_cache.stats()
+        }
+    
+    def count(self) -> int:
+        """Return the number of chunks in the collection."""
+        return self.store.count()
+    
+    def measure_recall(self,
+                       queries: List[str],
+                       top_k: int = 10,
+                       filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Measure vector search recall@k against exact, unquantized search.
         
-        if sample_results['metadatas']:
-            for metadata in sample_results['metadatas']:
-                chunk_type = metadata.get('chunk_type', 'unknown')
-                chunk_types[chunk_type] = chunk_types.get(chunk_type, 0) + 1
-                
-                if metadata.get('source_file'):
-                    source_files.add(metadata['source_file'])
-                
-                if metadata.get('class_name'):
-                    classes.add(metadata['class_name'])
+        Only the numpy backend can scan its vectors exactly, so only it can
+        report how much quantization and the IVF index cost in recall.
+        """
+        if not isinstance(self.store, NumpyVectorStore):
+            raise ValueError("Recall can only be measured on the numpy vector backend")
         
+        recall = self.store.measure_recall(self._encode_queries(queries), top_k, filters)
+        logger.info(f"Recall@{top_k} with {self.quantization} quantization over {len(queries)} queries: {recall:.3f}")
         return {
-            "total_chunks": count,
-            "chunk_types": chunk_types,
-            "unique_source_files": len(source_files),
-            "unique_classes": len(classes),
-            "collection_name": self.collection_name
+            "quantization": self.quantization,
+            "top_k": top_k,
+            "queries": len(queries),
+            "recall": recall
         }
     
     def delete_collection(self) -> None:
-        """Delete the entire collection."""
-        logger.warning(f"Deleting collection: {self.collection_name}")
-        self.client.delete_collection(name=self.collection_name)
+        """Delete the entire collection; it is left empty and usable, as after ``reset_collection``."""
+        self.reset_collection()
     
     def reset_collection(self) -> None:
         """Reset the collection (delete and recreate)."""
         logger.warning(f"Resetting collection: {self.collection_name}")
-        try:
-            self.client.delete_collection(name=self.collection_name)
-        except ValueError:
-            pass  # Collection doesn't exist
-        
-        self.collection = self.client.create_collection(
-            name=self.collection_name,
-            metadata={"description": "Java code chunks for RAG"}
-        )
+        self.store.reset()
+        self.content_store.clear()
+        self.statistics.clear()
+        self.lexical_index.clear()
+        self.symbol_index.clear()
+        self.grep_index.clear()
+        self.hierarchy_index.clear()
         logger.info(f"Reset collection: {self.collection_name}")
     
     def _create_document_text(self, chunk: CodeChunk) -> str:
@@ -232,8 +680,12 @@ class VectorDatabase:
         if chunk.metadata:
             metadata_text = []
             for key, value in chunk.metadata.items():
-                if value and key not in ['content']:  # Avoid duplicating content
-                    if isinstance(value, list):
+                # Skip content (already included) and the JAR name, so the same
+                # code in another JAR version embeds identically. Package and
+                # qualified names are served exactly by the symbol index, and
+                # leaving them out keeps previously cached embeddings valid.
+                if value and key not in ['content', 'jar_file', 'package', 'qualified_class']:
+                    if isinstance(value, (list, tuple)):
                         metadata_text.append(f"{key}: {', '.join(str(v) for v in value)}")
                     else:
                         metadata_text.append(f"{key}: {value}")
@@ -248,12 +700,22 @@ class VectorDatabase:
         # Create a deterministic ID based on chunk content and location
         base_string = f"{chunk.source_file}:{chunk.start_line}:{chunk.end_line}:{chunk.chunk_type}"
         
+        # Source paths are relative to their JAR, so qualify them with the
+        # JAR to keep identical paths in different JARs apart
+        if chunk.metadata.get('jar_file'):
+            base_string = f"{chunk.metadata['jar_file']}!{base_string}"
+        
         if chunk.class_name:
             base_string += f":{chunk.class_name}"
         
         if chunk.method_name:
             base_string += f":{chunk.method_name}"
         
+        # Parts of a split declaration can share all of the above when it
+        # sits on one line, e.g. a long array initializer
+        if chunk.metadata.get('part'):
+            base_string += f"#part{chunk.metadata['part']}"
+        
         # Use UUID5 for deterministic ID generation
         namespace = uuid.UUID('6ba7b810-9dad-11d1-80b4-00c04fd430c8')  # DNS namespace
         return str(uuid.uuid5(namespace, base_string))
\ No newline at end of file
@@ -0,0 +1,795 @@
+"""Pluggable vector storage backends for the vector database."""
+
+import json
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import closing
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+from .metadata_filter import (
+    Condition, SQL_OPERATORS, chroma_where, indexed_values, is_indexed_key, parse_filters, sql_conditions
+)
+from .sqlite_helpers import connect, select_in
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Per-query hits as returned by ``VectorStore.query``: parallel lists of
+# chunk IDs, metadata and distances, best first
+QueryResult = Tuple[List[str], List[Dict[str, Any]], List[float]]
+
+# Supported compressed representations of the vectors searched first
+QUANTIZATIONS = ("none", "int8", "binary")
+
+# Set bits per byte, for Hamming distances; NumPy 2 counts them natively
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return _POPCOUNT_TABLE[values]
+
+class VectorStore(ABC):
+    """Storage and nearest-neighbour search of chunk embeddings and metadata.
+    
+    Distances are squared Euclidean distances, ChromaDB's default, so scores
+    are comparable across backends. ``filters`` are conditions on metadata
+    values as described in ``metadata_filter``; empty values are ignored.
+    """
+    
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]) -> None:
+        """Insert chunks, replacing any with the same ID."""
+    
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None:
+        """Delete chunks by ID; unknown IDs are ignored."""
+    
+    @abstractmethod
+    def query(self,
+              query_embeddings: List[List[float]],
+              top_k: int,
+              filters: Optional[Dict[str, Any]] = None,
+              ids: Optional[List[str]] = None) -> List[QueryResult]:
+        """Return the ``top_k`` nearest chunks for each query embedding.
+        
+        With ``ids``, only those chunks are searched.
+        """
+    
+    @abstractmethod
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Return the stored embeddings of chunks by ID; unknown IDs are left out."""
+    
+    @abstractmethod
+    def get_page(self, limit: int, offset: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Return the IDs and metadata of a page of stored chunks."""
+    
+    @abstractmethod
+    def count(self) -> int:
+        """Return the number of stored chunks."""
+    
+    @abstractmethod
+    def reset(self) -> None:
+        """Delete every chunk."""
+
+class ChromaVectorStore(VectorStore):
+    """Vector store backed by a persistent ChromaDB collection."""
+    
+    def __init__(self, persist_directory: str, collection_name: str):
+        """Open (or create) the collection."""
+        self.collection_name = collection_name
+        
+        # Initialize ChromaDB client
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+        
+        # Get or create collection
+        try:
+            self.collection = self.client.get_collection(name=collection_name)
+            logger.info(f"Loaded existing collection: {collection_name}")
+        except Exception:
+            self.collection = self._create_collection()
+            logger.info(f"Created new collection: {collection_name}")
+    
+    def _create_collection(self):
+        """Create the collection."""
+        return self.client.create_collection(
+            name=self.collection_name,
+            metadata={"description": "Java code chunks for RAG"}
+        )
+    
+    def upsert(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]) -> None:
+        """Insert chunks, replacing any with the same ID."""
+        self.collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas)
+    
+    def delete(self, ids: List[str]) -> None:
+        """Delete chunks by ID; unknown IDs are ignored."""
+        self.collection.delete(ids=ids)
+    
+    def query(self,
+              query_embeddings: List[List[float]],
+              top_k: int,
+              filters: Optional[Dict[str, Any]] = None,
+              ids: Optional[List[str]] = None) -> List[QueryResult]:
+        """Return the ``top_k`` nearest chunks for each query embedding."""
+        if ids is not None and not ids:
+            return [([], [], []) for _ in query_embeddings]
+        
+        results = self.collection.query(
+            query_embeddings=query_embeddings,
+            ids=ids,
+            n_results=top_k,
+            where=chroma_where(parse_filters(filters)),
+            include=["metadatas", "distances"]
+        )
+        return list(zip(results['ids'], results['metadatas'], results['distances']))
+    
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Return the stored embeddings of chunks by ID; unknown IDs are left out."""
+        embeddings = {}
+        for i in range(0, len(ids), 1000):
+            page = self.collection.get(ids=ids[i:i + 1000], include=["embeddings"])
+            embeddings.update(zip(page['ids'], np.asarray(page['embeddings'], dtype=np.float32)))
+        return embeddings
+    
+    def get_page(self, limit: int, offset: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Return the IDs and metadata of a page of stored chunks."""
+        page = self.collection.get(limit=limit, offset=offset, include=["metadatas"])
+        return page['ids'], page['metadatas']
+    
+    def count(self) -> int:
+        """Return the number of stored chunks."""
+        return self.collection.count()
+    
+    def reset(self) -> None:
+        """Delete and recreate the collection."""
+        try:
+            self.client.delete_collection(name=self.collection_name)
+        except ValueError:
+            pass  # Collection doesn't exist
+        
+        self.collection = self._create_collection()
+
+class NumpyVectorStore(VectorStore):
+    """In-process vector store over a memory-mapped float16 matrix.
+    
+    Embeddings live in ``vectors.f16``, one row per chunk. The file is mapped
+    into memory rather than read, so opening the store is cheap and several
+    worker processes share the same pages. Chunk IDs, metadata and the row
+    each chunk occupies are kept in SQLite; rows freed by deletes are reused.
+    
+    Search is an exact, vectorised scan while the store holds fewer than
+    ``ivf_min_vectors`` chunks. Above that, an inverted file (IVF) index is
+    trained: vectors are clustered with k-means and a query only scans the
+    ``ivf_nprobe`` clusters whose centroids are closest to it. The index is
+    retrained when the store has doubled in size since the last training.
+    
+    With ``quantization`` set to ``int8`` or ``binary``, a compact copy of
+    every vector is kept next to the float16 matrix: one signed byte per
+    dimension plus a scale, or one sign bit per dimension. Searches rank
+    all candidate rows by the compact codes first (an int8 dot product or
+    a Hamming distance) and then re-score the best ``top_k * rescore_factor``
+    of them against the float16 vectors, so only those rows of the large
+    matrix are read from disk and the distances returned are exact.
+    
+    Filters are answered before any vector is read. Metadata keys filters
+    are expected to use (see ``metadata_filter.INDEXED_KEYS``) are also
+    stored as ``(key, value, row)`` entries of a B-tree, so equality,
+    membership and range conditions on them are index lookups; only
+    conditions on other keys read every chunk's metadata.
+    
+    The in-memory state is loaded on open; a process that only reads sees
+    writes made by another process after reopening the store.
+    """
+    
+    # Rows converted to float32 at a time during a scan
+    _SCAN_BLOCK_ROWS = 65536
+    
+    def __init__(self,
+                 directory: Path,
+                 ivf_min_vectors: int = 50000,
+                 ivf_nprobe: int = 8,
+                 quantization: str = "none",
+                 rescore_factor: int = 10):
+        """Open (or create) the store in ``directory``.
+        
+        A store written with a different ``quantization`` is re-encoded
+        from its float16 vectors on open.
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ivf_min_vectors = ivf_min_vectors
+        self.ivf_nprobe = ivf_nprobe
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor)
+        self._lock = threading.RLock()
+        
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    row INTEGER PRIMARY KEY,
+                    chunk_id TEXT NOT NULL UNIQUE,
+                    metadata TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY)")
+            conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS filter_values (
+                    key TEXT NOT NULL,
+                    value,
+                    row INTEGER NOT NULL,
+                    PRIMARY KEY (key, value, row)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_filter_values_row ON filter_values (row)")
+            
+            # Stores written before the filter index existed are indexed once
+            if conn.execute("SELECT 1 FROM info WHERE key = 'filter_index'").fetchone() is None:
+                self._index_filter_values(conn)
+        
+        self._load()
+        
+        if self._stored_quantization != quantization:
+            with self._lock, closing(self._connect()) as conn, conn:
+                self._requantize(conn)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the row catalog."""
+        return connect(self.directory / "chunks.sqlite3")
+    
+    def _index_filter_values(self, conn: sqlite3.Connection) -> None:
+        """Rebuild the filter index from the stored metadata."""
+        conn.execute("DELETE FROM filter_values")
+        conn.executemany(
+            "INSERT OR IGNORE INTO filter_values VALUES (?, ?, ?)",
+            (
+                (key, value, row)
+                for row, metadata in conn.execute("SELECT row, metadata FROM chunks").fetchall()
+                for key, value in indexed_values(json.loads(metadata))
+            )
+        )
+        self._set_info(conn, filter_index=1)
+    
+    def _load(self) -> None:
+        """Map the data files and rebuild the in-memory row state."""
+        with closing(self._connect()) as conn:
+            info = dict(conn.execute("SELECT key, value FROM info"))
+            rows = np.array([row[0] for row in conn.execute("SELECT row FROM chunks")], dtype=np.int64)
+            free_rows = [row[0] for row in conn.execute("SELECT row FROM free_rows ORDER BY row DESC")]
+        
+        self.dimension = info.get("dimension", 0)
+        self._capacity = info.get("capacity", 0)
+        self._trained_count = info.get("trained_count", 0)
+        self._free_rows = free_rows
+        self._next_row = info.get("next_row", 0)
+        self._stored_quantization = QUANTIZATIONS[info.get("quantization", 0)]
+        self._map_files(self._stored_quantization)
+        
+        self._valid = np.zeros(self._capacity, dtype=bool)
+        self._valid[rows] = True
+        
+        centroids_path = self.directory / "centroids.npy"
+        self._centroids = np.load(centroids_path) if self._trained_count and centroids_path.exists() else None
+        self._lists = None
+        
+        center_path = self.directory / "binary_center.npy"
+        self._center = np.load(center_path) if center_path.exists() else None
+    
+    def _data_files(self, quantization: Optional[str] = None) -> List[Tuple[str, str, Any, int]]:
+        """Return ``(attribute, file name, dtype, row width)`` of every data file."""
+        quantization = quantization or self.quantization
+        files = [
+            ("_vectors", "vectors.f16", np.float16, self.dimension),
+            ("_norms", "norms.f32", np.float32, 1),
+            ("_assignments", "assignments.i32", np.int32, 1)
+        ]
+        if quantization == "int8":
+            files += [
+                ("_codes", "codes.i8", np.int8, self.dimension),
+                ("_scales", "scales.f32", np.float32, 1)
+            ]
+        elif quantization == "binary":
+            files.append(("_codes", "codes.bits", np.uint8, (self.dimension + 7) // 8))
+        return files
+    
+    def _map_files(self, quantization: Optional[str] = None) -> None:
+        """Memory-map every data file at the current capacity."""
+        self._codes = self._scales = None
+        for attribute, name, dtype, width in self._data_files(quantization):
+            shape = (self._capacity, width) if attribute in ("_vectors", "_codes") else (self._capacity,)
+            setattr(self, attribute, self._map(name, dtype, shape))
+    
+    def _map(self, name: str, dtype, shape: Tuple[int, ...]) -> Optional[np.memmap]:
+        """Memory-map a data file, or return None while the store is empty."""
+        if not shape[0] or (len(shape) > 1 and not shape[1]):
+            return None
+        return np.memmap(self.directory / name, dtype=dtype, mode='r+', shape=shape)
+    
+    def _requantize(self, conn: sqlite3.Connection) -> None:
+        """Rebuild the compact codes from the float16 vectors."""
+        logger.info(
+            f"Re-encoding vector store {self.directory.name} "
+            f"from {self._stored_quantization} to {self.quantization} quantization"
+        )
+        for name in ("codes.i8", "scales.f32", "codes.bits", "binary_center.npy"):
+            (self.directory / name).unlink(missing_ok=True)
+        self._center = None
+        
+        if self._capacity and self.dimension:
+            for _, name, dtype, width in self._data_files():
+                with open(self.directory / name, 'ab') as f:
+                    f.truncate(self._capacity * width * np.dtype(dtype).itemsize)
+            self._map_files()
+            
+            rows = np.flatnonzero(self._valid)
+            if self.quantization == "binary" and len(rows):
+                self._set_center(sum(
+                    np.asarray(self._vectors[rows[start:start + self._SCAN_BLOCK_ROWS]], dtype=np.float32).sum(axis=0)
+                    for start in range(0, len(rows), self._SCAN_BLOCK_ROWS)
+                ) / len(rows))
+            
+            for start in range(0, len(rows), self._SCAN_BLOCK_ROWS):
+                block_rows = rows[start:start + self._SCAN_BLOCK_ROWS]
+                self._encode(block_rows, np.asarray(self._vectors[block_rows], dtype=np.float32))
+            self._flush()
+        
+        self._stored_quantization = self.quantization
+        self._set_info(conn, quantization=QUANTIZATIONS.index(self.quantization))
+    
+    def _encode(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Write the compact codes of vectors stored at the given rows."""
+        if self.quantization == "int8":
+            # Symmetric per-vector scaling onto [-127, 127]
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            self._codes[rows] = np.rint(vectors / scales[:, np.newaxis]).astype(np.int8)
+            self._scales[rows] = scales
+        elif self.quantization == "binary":
+            # Embeddings share a large per-dimension offset, so bits record
+            # the side of the collection mean a value falls on, not its sign
+            if self._center is None:
+                self._set_center(vectors.mean(axis=0))
+            self._codes[rows] = np.packbits(vectors > self._center, axis=1)
+    
+    def _set_center(self, center: np.ndarray) -> None:
+        """Persist the per-dimension threshold of binary codes."""
+        self._center = center.astype(np.float32)
+        np.save(self.directory / "binary_center.npy", self._center)
+    
+    def _set_info(self, conn: sqlite3.Connection, **values: int) -> None:
+        """Persist store-wide counters."""
+        conn.executemany("INSERT OR REPLACE INTO info VALUES (?, ?)", values.items())
+    
+    def _grow(self, conn: sqlite3.Connection, needed_rows: int) -> None:
+        """Extend the data files so that at least ``needed_rows`` rows fit."""
+        if needed_rows <= self._capacity:
+            return
+        
+        capacity = max(needed_rows, self._capacity * 2, 1024)
+        for _, name, dtype, width in self._data_files():
+            with open(self.directory / name, 'ab') as f:
+                f.truncate(capacity * width * np.dtype(dtype).itemsize)
+        
+        self._capacity = capacity
+        self._set_info(conn, capacity=capacity)
+        
+        valid = np.zeros(capacity, dtype=bool)
+        valid[:len(self._valid)] = self._valid
+        self._valid = valid
+        self._map_files()
+    
+    def upsert(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]) -> None:
+        """Insert chunks, replacing any with the same ID."""
+        if not ids:
+            return
+        
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        
+        with self._lock, closing(self._connect()) as conn, conn:
+            if not self.dimension:
+                self.dimension = vectors.shape[1]
+                self._set_info(conn, dimension=self.dimension, quantization=QUANTIZATIONS.index(self.quantization))
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dimension}"
+                )
+            
+            # Replaced chunks keep their row; new chunks take a free row or
+            # one past the end
+            existing = self._rows_for_ids(conn, ids)
+            rows = []
+            reused = []
+            for chunk_id in ids:
+                if chunk_id in existing:
+                    rows.append(existing[chunk_id])
+                elif self._free_rows:
+                    row = self._free_rows.pop()
+                    reused.append((row,))
+                    rows.append(row)
+                else:
+                    rows.append(self._next_row)
+                    self._next_row += 1
+                existing[chunk_id] = rows[-1]
+            
+            self._grow(conn, self._next_row)
+            rows = np.array(rows, dtype=np.int64)
+            
+            self._vectors[rows] = vectors.astype(np.float16)
+            self._norms[rows] = np.einsum('ij,ij->i', vectors, vectors)
+            self._assignments[rows] = self._nearest_centroids(vectors) if self._centroids is not None else -1
+            self._encode(rows, vectors)
+            self._valid[rows] = True
+            self._flush()
+            
+            conn.executemany("DELETE FROM free_rows WHERE row = ?", reused)
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)",
+                zip(rows.tolist(), ids, (json.dumps(metadata) for metadata in metadatas))
+            )
+            conn.executemany("DELETE FROM filter_values WHERE row = ?", ((row,) for row in rows.tolist()))
+            conn.executemany(
+                "INSERT OR IGNORE INTO filter_values VALUES (?, ?, ?)",
+                (
+                    (key, value, row)
+                    for row, metadata in zip(rows.tolist(), metadatas)
+                    for key, value in indexed_values(metadata)
+                )
+            )
+            self._set_info(conn, next_row=self._next_row)
+            
+            self._lists = None
+            self._maybe_train(conn)
+    
+    def delete(self, ids: List[str]) -> None:
+        """Delete chunks by ID; unknown IDs are ignored."""
+        with self._lock, closing(self._connect()) as conn, conn:
+            rows = list(self._rows_for_ids(conn, ids).values())
+            if not rows:
+                return
+            
+            self._valid[rows] = False
+            self._assignments[rows] = -1
+            self._assignments.flush()
+            
+            conn.executemany("DELETE FROM chunks WHERE row = ?", ((row,) for row in rows))
+            conn.executemany("DELETE FROM filter_values WHERE row = ?", ((row,) for row in rows))
+            conn.executemany("INSERT OR IGNORE INTO free_rows VALUES (?)", ((row,) for row in rows))
+            self._free_rows = sorted(set(self._free_rows) | set(rows), reverse=True)
+            self._lists = None
+    
+    def _rows_for_ids(self, conn: sqlite3.Connection, ids: List[str]) -> Dict[str, int]:
+        """Look up the rows of stored chunk IDs."""
+        return dict(select_in(conn, "SELECT chunk_id, row FROM chunks WHERE chunk_id IN ({placeholders})", ids))
+    
+    def _flush(self) -> None:
+        """Write mapped pages back to disk."""
+        for attribute, _, _, _ in self._data_files():
+            getattr(self, attribute).flush()
+    
+    def query(self,
+              query_embeddings: List[List[float]],
+              top_k: int,
+              filters: Optional[Dict[str, Any]] = None,
+              ids: Optional[List[str]] = None) -> List[QueryResult]:
+        """Return the ``top_k`` nearest chunks for each query embedding.
+        
+        A search limited to ``ids`` scans just those chunks, without the
+        IVF index.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        
+        with self._lock:
+            if not self.count():
+                return [([], [], []) for _ in queries]
+            
+            # Rows allowed by the filters, or None for all rows
+            allowed = self._filter_rows(filters)
+            
+            if ids is not None:
+                with closing(self._connect()) as conn:
+                    rows = np.sort(np.array(list(self._rows_for_ids(conn, ids).values()), dtype=np.int64))
+                if allowed is not None:
+                    rows = np.intersect1d(rows, allowed, assume_unique=True)
+                hits = self._search(queries, rows, top_k)
+            elif self._centroids is not None:
+                lists = self._inverted_lists()
+                hits = [
+                    self._search(query[np.newaxis, :], self._probe(query, lists, allowed), top_k)[0]
+                    for query in queries
+                ]
+            else:
+                rows = np.flatnonzero(self._valid) if allowed is None else allowed
+                hits = self._search(queries, rows, top_k)
+            
+            return [self._resolve(rows, distances) for rows, distances in hits]
+    
+    def measure_recall(self,
+                       query_embeddings: List[List[float]],
+                       top_k: int = 10,
+                       filters: Optional[Dict[str, Any]] = None) -> float:
+        """Return the mean recall@k of searches against an exact scan.
+        
+        The baseline scans every matching row without the IVF index or the
+        quantized codes, so this measures what both approximations lose. A
+        result counts as found when it is no farther from the query than the
+        k-th exact neighbour, which keeps equidistant chunks from being
+        counted as misses.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        
+        with self._lock:
+            if not self.count() or not len(queries):
+                return 1.0
+            
+            rows = self._filter_rows(filters)
+            if rows is None:
+                rows = np.flatnonzero(self._valid)
+            baseline = self._scan_many(queries, rows, top_k)
+            results = self.query(queries, top_k, filters)
+        
+        recalls = []
+        for (expected_rows, expected_distances), (_, _, distances) in zip(baseline, results):
+            if len(expected_rows):
+                # Allow for float32 rounding between scans of different row sets
+                cutoff = expected_distances[-1] + 1e-5
+                recalls.append(sum(1 for distance in distances if distance <= cutoff) / len(expected_rows))
+        return float(np.mean(recalls)) if recalls else 1.0
+    
+    def _search(self, queries: np.ndarray, rows: np.ndarray, top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Search the given rows, through the compact codes if the store is quantized."""
+        if self.quantization == "none":
+            return self._scan_many(queries, rows, top_k)
+        
+        candidates = self._top_k_blocks(queries, rows, top_k * self.rescore_factor, self._approximate_distances)
+        return [
+            self._scan_many(query[np.newaxis, :], np.sort(candidate_rows), top_k)[0]
+            for query, (candidate_rows, _) in zip(queries, candidates)
+        ]
+    
+    def _scan_many(self, queries: np.ndarray, rows: np.ndarray, top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Exact search of several queries over the given rows."""
+        return self._top_k_blocks(queries, rows, top_k, self._exact_distances)
+    
+    def _exact_distances(self, queries: np.ndarray, block_rows: np.ndarray) -> np.ndarray:
+        """Squared distances from each query to a block of float16 vectors."""
+        block = np.asarray(self._vectors[block_rows], dtype=np.float32)
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        # ||q - v||^2 = ||q||^2 + ||v||^2 - 2 q.v
+        return query_norms[:, np.newaxis] + self._norms[block_rows][np.newaxis, :] - 2 * (queries @ block.T)
+    
+    def _approximate_distances(self, queries: np.ndarray, block_rows: np.ndarray) -> np.ndarray:
+        """Rank-preserving distance estimates from the compact codes.
+        
+        The constant ``||q||^2`` term is left out of int8 estimates; binary
+        codes are compared by Hamming distance to the query's sign bits.
+        """
+        codes = np.asarray(self._codes[block_rows])
+        if self.quantization == "int8":
+            dots = (queries @ codes.astype(np.float32).T) * self._scales[block_rows][np.newaxis, :]
+            return self._norms[block_rows][np.newaxis, :] - 2 * dots
+        
+        query_bits = np.packbits(queries > self._center, axis=1)
+        return np.stack([
+            _popcount(np.bitwise_xor(codes, bits)).sum(axis=1, dtype=np.int32)
+            for bits in query_bits
+        ]).astype(np.float32)
+    
+    def _top_k_blocks(self,
+                      queries: np.ndarray,
+                      rows: np.ndarray,
+                      top_k: int,
+                      distance) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Find the ``top_k`` rows closest to each query under ``distance``.
+        
+        Rows are scanned in blocks; only the best ``top_k`` of each block are
+        kept, so memory use does not depend on the store size.
+        """
+        best_rows = [np.empty(0, dtype=np.int64) for _ in queries]
+        best_distances = [np.empty(0, dtype=np.float32) for _ in queries]
+        
+        for start in range(0, len(rows), self._SCAN_BLOCK_ROWS):
+            block_rows = rows[start:start + self._SCAN_BLOCK_ROWS]
+            distances = distance(queries, block_rows)
+            
+            for i in range(len(queries)):
+                merged_rows = np.concatenate([best_rows[i], block_rows])
+                merged_distances = np.concatenate([best_distances[i], distances[i]])
+                keep = self._top_k_indices(merged_distances, top_k)
+                best_rows[i] = merged_rows[keep]
+                best_distances[i] = merged_distances[keep]
+        
+        return list(zip(best_rows, best_distances))
+    
+    @staticmethod
+    def _top_k_indices(distances: np.ndarray, top_k: int) -> np.ndarray:
+        """Indices of the ``top_k`` smallest distances, in ascending order."""
+        if len(distances) > top_k:
+            candidates = np.argpartition(distances, top_k)[:top_k]
+        else:
+            candidates = np.arange(len(distances))
+        return candidates[np.argsort(distances[candidates], kind='stable')]
+    
+    def _resolve(self, rows: np.ndarray, distances: np.ndarray) -> QueryResult:
+        """Turn result rows into chunk IDs and metadata.
+        
+        Rows another process deleted after this store loaded its vectors
+        are left out.
+        """
+        row_list = rows.tolist()
+        with closing(self._connect()) as conn:
+            found = {
+                row: (chunk_id, json.loads(metadata))
+                for row, chunk_id, metadata in select_in(
+                    conn, "SELECT row, chunk_id, metadata FROM chunks WHERE row IN ({placeholders})", row_list
+                )
+            }
+        
+        hits = [(row, float(distance)) for row, distance in zip(row_list, distances) if row in found]
+        return (
+            [found[row][0] for row, _ in hits],
+            [found[row][1] for row, _ in hits],
+            [distance for _, distance in hits]
+        )
+    
+    def _filter_rows(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Return the stored rows whose metadata matches every filter, or None without filters.
+        
+        Each condition on an indexed key selects its rows from the filter
+        index, and the selections are intersected in SQLite; conditions on
+        other keys are checked against the stored metadata.
+        """
+        conditions = parse_filters(filters)
+        if not conditions:
+            return None
+        
+        selects = []
+        params = []
+        unindexed: List[Condition] = []
+        for key, op, value in conditions:
+            if not is_indexed_key(key):
+                unindexed.append((key, op, value))
+            elif op == "$in":
+                placeholders = ", ".join("?" * len(value))
+                selects.append(f"SELECT row FROM filter_values WHERE key = ? AND value IN ({placeholders})")
+                params.extend([key, *value])
+            else:
+                selects.append(f"SELECT row FROM filter_values WHERE key = ? AND value {SQL_OPERATORS[op]} ?")
+                params.extend([key, value])
+        
+        if unindexed:
+            sql, unindexed_params = sql_conditions(unindexed, "metadata")
+            selects.append(f"SELECT row FROM chunks WHERE 1{sql}")
+            params.extend(unindexed_params)
+        
+        with closing(self._connect()) as conn:
+            rows = [row[0] for row in conn.execute(" INTERSECT ".join(selects), params)]
+        return np.sort(np.array(rows, dtype=np.int64))
+    
+    def _probe(self, query: np.ndarray, lists: List[np.ndarray], allowed: Optional[np.ndarray]) -> np.ndarray:
+        """Return the rows in the clusters closest to a query, limited to ``allowed``."""
+        centroid_distances = np.einsum('ij,ij->i', self._centroids, self._centroids) - 2 * (self._centroids @ query)
+        probed = self._top_k_indices(centroid_distances, self.ivf_nprobe)
+        rows = np.concatenate([lists[i] for i in probed] + [lists[-1]])
+        return rows if allowed is None else np.intersect1d(rows, allowed, assume_unique=True)
+    
+    def _inverted_lists(self) -> List[np.ndarray]:
+        """Group valid rows by cluster; the last list holds unassigned rows."""
+        if self._lists is None:
+            rows = np.flatnonzero(self._valid)
+            assignments = np.asarray(self._assignments[rows])
+            order = np.argsort(assignments, kind='stable')
+            rows, assignments = rows[order], assignments[order]
+            bounds = np.searchsorted(assignments, np.arange(-1, len(self._centroids) + 1))
+            
+            unassigned = rows[bounds[0]:bounds[1]]
+            self._lists = [rows[bounds[i + 1]:bounds[i + 2]] for i in range(len(self._centroids))] + [unassigned]
+        
+        return self._lists
+    
+    def _nearest_centroids(self, vectors: np.ndarray) -> np.ndarray:
+        """Assign vectors to their closest centroid."""
+        centroid_norms = np.einsum('ij,ij->i', self._centroids, self._centroids)
+        return np.argmin(centroid_norms[np.newaxis, :] - 2 * (vectors @ self._centroids.T), axis=1).astype(np.int32)
+    
+    def _maybe_train(self, conn: sqlite3.Connection) -> None:
+        """Train the IVF index once the store is large, and retrain as it doubles."""
+        count = self.count()
+        if count < self.ivf_min_vectors or (self._trained_count and count < self._trained_count * 2):
+            return
+        self.train_ivf(conn)
+    
+    def train_ivf(self, conn: Optional[sqlite3.Connection] = None, iterations: int = 10) -> None:
+        """Cluster the stored vectors with k-means and assign every row to a cluster."""
+        with self._lock:
+            rows = np.flatnonzero(self._valid)
+            n_lists = max(1, int(4 * np.sqrt(len(rows))))
+            logger.info(f"Training IVF index with {n_lists} clusters over {len(rows)} vectors")
+            
+            # Train on a sample; assigning every row afterwards is one more scan
+            rng = np.random.default_rng(0)
+            sample_rows = np.sort(rng.choice(rows, size=min(len(rows), n_lists * 32), replace=False))
+            sample = np.asarray(self._vectors[sample_rows], dtype=np.float32)
+            centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+            
+            for _ in range(iterations):
+                self._centroids = centroids
+                labels = self._nearest_centroids(sample)
+                order = np.argsort(labels, kind='stable')
+                counts = np.bincount(labels, minlength=n_lists)
+                # Sum each cluster's members as one contiguous run of the sorted sample
+                sums = np.zeros_like(centroids)
+                present = np.flatnonzero(counts)
+                sums[present] = np.add.reduceat(sample[order], np.cumsum(counts)[present] - counts[present])
+                # Empty clusters keep their previous centroid
+                centroids = np.where(counts[:, np.newaxis] > 0, sums / np.maximum(counts, 1)[:, np.newaxis], centroids)
+            
+            self._centroids = centroids.astype(np.float32)
+            for start in range(0, len(rows), self._SCAN_BLOCK_ROWS):
+                block_rows = rows[start:start + self._SCAN_BLOCK_ROWS]
+                self._assignments[block_rows] = self._nearest_centroids(
+                    np.asarray(self._vectors[block_rows], dtype=np.float32)
+                )
+            self._assignments.flush()
+            np.save(self.directory / "centroids.npy", self._centroids)
+            
+            self._trained_count = len(rows)
+            self._lists = None
+            if conn is not None:
+                self._set_info(conn, trained_count=self._trained_count)
+            else:
+                with closing(self._connect()) as own_conn, own_conn:
+                    self._set_info(own_conn, trained_count=self._trained_count)
+    
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Return the stored embeddings of chunks by ID; unknown IDs are left out."""
+        with self._lock, closing(self._connect()) as conn:
+            rows = self._rows_for_ids(conn, ids)
+            if not rows:
+                return {}
+            vectors = np.asarray(self._vectors[list(rows.values())], dtype=np.float32)
+        return dict(zip(rows, vectors))
+    
+    def get_page(self, limit: int, offset: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Return the IDs and metadata of a page of stored chunks."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT chunk_id, metadata FROM chunks ORDER BY row LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return [row[0] for row in rows], [json.loads(row[1]) for row in rows]
+    
+    def count(self) -> int:
+        """Return the number of stored chunks."""
+        return int(self._valid.sum())
+    
+    def reset(self) -> None:
+        """Delete every chunk and the data files."""
+        with self._lock:
+            self._vectors = self._norms = self._assignments = self._codes = self._scales = None
+            for name in ("vectors.f16", "norms.f32", "assignments.i32", "codes.i8", "scales.f32", "codes.bits",
+                         "binary_center.npy", "centroids.npy"):
+                (self.directory / name).unlink(missing_ok=True)
+            
+            with closing(self._connect()) as conn, conn:
+                conn.execute("DELETE FROM chunks")
+                conn.execute("DELETE FROM free_rows")
+                conn.execute("DELETE FROM info")
+                self._index_filter_values(conn)
+            
+            self._load()